@@ -2,15 +2,22 @@
 
 from __future__ import annotations
 
+import asyncio
+import dataclasses
 import sys
 from pathlib import Path
 
 import click
 
+from agent_runner.cache import MODES as LLM_CACHE_MODES
 from agent_runner.config import Config
-from agent_runner.graph import build_graph
+from agent_runner.depgraph import DependencyError, DependencyGraph
+from agent_runner.graph import abuild_graph, asave_failed_usage, build_graph, save_failed_usage
 from agent_runner.logger import setup_logging
+from agent_runner.models import OPEN, HealthRegistry, health_path
 from agent_runner.parser import parse_orchestration
+from agent_runner.routing import TierPolicy, routing_stats_path
+from agent_runner.usage import BudgetExceeded, total_cost
 
 
 def _initial_state(config: Config) -> dict:
@@ -30,6 +37,15 @@ def _initial_state(config: Config) -> dict:
     total = len(tasks)
     click.echo(f"Loaded {total} tasks ({done_count} done, {total - done_count} remaining)")
 
+    deps = DependencyGraph(tasks, task_status)
+    try:
+        deps.check()
+    except DependencyError as e:
+        click.echo(f"Error: {e}", err=True)
+        sys.exit(1)
+    for task_id, unknown in deps.missing.items():
+        click.echo(f"Warning: {task_id} depends on unknown task(s) {', '.join(unknown)}; it will stay blocked", err=True)
+
     return {
         "tasks": tasks,
         "current_task": None,
@@ -39,8 +55,12 @@ def _initial_state(config: Config) -> dict:
         "retry_count": 0,
         "current_llm": "",
         "error": None,
+        "review_feedback": None,
+        "model_tier": None,
         "phase": tasks[0].phase if tasks else "",
         "token_usage": {},
+        "task_cost": 0.0,
+        "review_rounds": {},
     }
 
 
@@ -53,16 +73,40 @@ def cli(ctx: click.Context, config_path: str | None) -> None:
     ctx.obj["config_path"] = config_path
 
 
+ASYNC_OPTION = click.option(
+    "--async", "use_async", is_flag=True,
+    help="Run nodes as coroutines so LLM calls and tool subprocesses overlap.",
+)
+PARALLEL_OPTION = click.option(
+    "--parallel", type=int, default=None,
+    help="Run up to N unblocked tasks at once, each in its own git worktree "
+         "(default: parallel.max_tasks from config). Resume with the same value.",
+)
+LLM_CACHE_OPTION = click.option(
+    "--llm-cache", type=click.Choice(LLM_CACHE_MODES), default=None,
+    help="Response cache mode (default: llm_cache.mode from config). "
+         "'replay' serves recorded responses only and never calls a provider.",
+)
+
+
+def _load_config(ctx: click.Context, llm_cache: str | None = None) -> Config:
+    """Load config.yaml, applying command-line overrides."""
+    config = Config.load(ctx.obj.get("config_path"))
+    if llm_cache is not None:
+        config = dataclasses.replace(config, llm_cache=dataclasses.replace(config.llm_cache, mode=llm_cache))
+    return config
+
+
 @cli.command()
+@ASYNC_OPTION
+@PARALLEL_OPTION
+@LLM_CACHE_OPTION
 @click.pass_context
-def run(ctx: click.Context) -> None:
+def run(ctx: click.Context, use_async: bool, parallel: int | None, llm_cache: str | None) -> None:
     """Start the orchestrator. Executes all unblocked tasks."""
-    config = Config.load(ctx.obj.get("config_path"))
+    config = _load_config(ctx, llm_cache)
     logger = setup_logging(config.log_dir, config.project_dir)
 
-    click.echo("Building agent graph...")
-    compiled_graph, memory = build_graph(config)
-
     click.echo("Parsing ORCHESTRATION.md...")
     state = _initial_state(config)
 
@@ -70,11 +114,15 @@ def run(ctx: click.Context) -> None:
 
     click.echo("Starting orchestration loop...\n")
     try:
-        result = compiled_graph.invoke(state, config=thread_config)
+        result = _invoke_graph(config, state, thread_config, use_async=use_async, parallel=parallel)
         click.echo("\nOrchestration complete.")
         _print_summary(result)
     except KeyboardInterrupt:
         click.echo("\nInterrupted. State saved to checkpoint. Resume with: python agent.py resume")
+    except BudgetExceeded as e:
+        click.echo(f"\nBudget exhausted: {e}", err=True)
+        click.echo("Raise budgets in config.yaml, then resume with: python agent.py resume")
+        sys.exit(1)
     except Exception as e:
         logger.exception("Orchestration failed")
         click.echo(f"\nError: {e}", err=True)
@@ -83,16 +131,20 @@ def run(ctx: click.Context) -> None:
 
 
 @cli.command()
+@ASYNC_OPTION
+@PARALLEL_OPTION
+@LLM_CACHE_OPTION
 @click.pass_context
-def resume(ctx: click.Context) -> None:
+def resume(ctx: click.Context, use_async: bool, parallel: int | None, llm_cache: str | None) -> None:
     """Resume from the last checkpoint."""
-    config = Config.load(ctx.obj.get("config_path"))
+    config = _load_config(ctx, llm_cache)
     logger = setup_logging(config.log_dir, config.project_dir)
 
-    compiled_graph, memory = build_graph(config)
     thread_config = {"configurable": {"thread_id": "lomito-main"}}
 
-    last_state = compiled_graph.get_state(thread_config)
+    compiled_graph, memory, cleanup = build_graph(config)
+    with cleanup:
+        last_state = compiled_graph.get_state(thread_config)
     if last_state is None or not last_state.values:
         click.echo("No checkpoint found. Use 'run' to start fresh.")
         return
@@ -101,26 +153,66 @@ def resume(ctx: click.Context) -> None:
     click.echo(f"Current task: {last_state.values.get('current_task')}")
 
     try:
-        result = compiled_graph.invoke(None, config=thread_config)
+        result = _invoke_graph(config, None, thread_config, use_async=use_async, parallel=parallel)
         click.echo("\nOrchestration complete.")
         _print_summary(result)
     except KeyboardInterrupt:
         click.echo("\nInterrupted. State saved.")
+    except BudgetExceeded as e:
+        click.echo(f"\nBudget exhausted: {e}", err=True)
+        sys.exit(1)
     except Exception as e:
         logger.exception("Resume failed")
         click.echo(f"\nError: {e}", err=True)
         sys.exit(1)
 
 
+def _invoke_graph(
+    config: Config,
+    graph_input: dict | None,
+    thread_config: dict,
+    *,
+    use_async: bool,
+    parallel: int | None,
+) -> dict:
+    """Run the graph to completion in sync or async mode, then release resources."""
+    if parallel is None:
+        parallel = config.max_parallel_tasks
+    if parallel > 1:
+        click.echo(f"Building agent graph ({parallel} parallel worktrees)...")
+    else:
+        click.echo("Building agent graph...")
+    if use_async:
+        return asyncio.run(_ainvoke_graph(config, graph_input, thread_config, parallel))
+
+    compiled_graph, memory, cleanup = build_graph(config, parallel=parallel)
+    with cleanup:
+        try:
+            return compiled_graph.invoke(graph_input, config=thread_config)
+        except BaseException as e:
+            save_failed_usage(compiled_graph, thread_config, e)
+            raise
+
+
+async def _ainvoke_graph(config: Config, graph_input: dict | None, thread_config: dict, parallel: int) -> dict:
+    async with abuild_graph(config, parallel=parallel) as (compiled_graph, memory):
+        try:
+            return await compiled_graph.ainvoke(graph_input, config=thread_config)
+        except BaseException as e:
+            await asave_failed_usage(compiled_graph, thread_config, e)
+            raise
+
+
 @cli.command()
 @click.pass_context
 def status(ctx: click.Context) -> None:
     """Show current orchestration state."""
     config = Config.load(ctx.obj.get("config_path"))
-    compiled_graph, memory = build_graph(config)
+    compiled_graph, memory, cleanup = build_graph(config)
     thread_config = {"configurable": {"thread_id": "lomito-main"}}
 
-    last_state = compiled_graph.get_state(thread_config)
+    with cleanup:
+        last_state = compiled_graph.get_state(thread_config)
     if last_state is None or not last_state.values:
         click.echo("No checkpoint found. Run 'python agent.py run' to start.")
         return
@@ -140,15 +232,49 @@ def status(ctx: click.Context) -> None:
     click.echo(f"Current LLM: {values.get('current_llm', 'N/A')}")
     click.echo(f"Git dirty: {values.get('git_dirty', False)}")
     click.echo(f"Retry count: {values.get('retry_count', 0)}")
+    if values.get("model_tier") is not None:
+        click.echo(f"Model tier: {values['model_tier']}")
 
     if values.get("error"):
         click.echo(f"Last error: {values['error']}")
 
+    if values.get("tasks"):
+        deps = DependencyGraph(values["tasks"], task_status)
+        ready = deps.ready()
+        click.echo(f"\nReady: {len(ready)} tasks, blocked: {len(deps.blocked())}")
+        for task in ready[:5]:
+            rank = deps.ranks[task.id]
+            click.echo(f"  next: {task.id} (critical path {rank.critical_path}, fan-out {rank.fan_out})")
+        for task_id, unknown in deps.missing.items():
+            click.echo(f"  {task_id} waits on unknown task(s): {', '.join(unknown)}")
+        if deps.cycle:
+            click.echo(f"  dependency cycle: {', '.join(deps.cycle)}")
+
     token_usage = values.get("token_usage", {})
     if token_usage:
-        click.echo("\nToken Usage:")
+        click.echo(f"\nToken Usage (${total_cost(token_usage):.4f} total, ${values.get('task_cost') or 0.0:.4f} on current task):")
         for provider, usage in token_usage.items():
-            click.echo(f"  {provider}: {usage.get('input', 0)} in / {usage.get('output', 0)} out")
+            click.echo(f"  {provider}: {_format_usage(usage)}")
+    _echo_budgets(config, token_usage, values.get("task_cost") or 0.0)
+    if values.get("review_rounds"):
+        click.echo(f"Review rounds: {_format_review_rounds(values['review_rounds'])}")
+
+    breakers = HealthRegistry(config.circuit_breaker, health_path(config)).snapshot()
+    if breakers:
+        click.echo("\nProvider Health:")
+        for provider, health in breakers.items():
+            line = f"  {provider}: {health['state']}"
+            if health["state"] == OPEN:
+                line += f" (probe in {health['retry_in']:.0f}s)"
+            if health["last_error"]:
+                line += f" - last error: {health['last_error']}"
+            click.echo(line)
+
+    tiers = TierPolicy(config.routing, routing_stats_path(config)).snapshot()
+    if tiers:
+        click.echo("\nModel Tiers:")
+        for model, stats in tiers.items():
+            click.echo(f"  {model}: {stats['approved']}/{stats['reviews']} attempts approved ({stats['success_rate']:.0%})")
 
     click.echo("\nTask Details:")
     for tid, s in sorted(task_status.items()):
@@ -173,6 +299,28 @@ def reset(ctx: click.Context) -> None:
     click.echo("State cleared. Run 'python agent.py run' to start fresh.")
 
 
+def _format_usage(usage: dict) -> str:
+    line = f"{usage.get('input', 0)} in / {usage.get('output', 0)} out"
+    if usage.get("cache_read") or usage.get("cache_write"):
+        line += f" (cache: {usage.get('cache_read', 0)} read / {usage.get('cache_write', 0)} written)"
+    return line + f", ${usage.get('cost', 0.0):.4f}"
+
+
+def _format_review_rounds(review_rounds: dict[str, int]) -> str:
+    reviews = sum(review_rounds.values())
+    rounds = sum(int(n) * count for n, count in review_rounds.items())
+    spread = ", ".join(f"{n}: {count}" for n, count in sorted(review_rounds.items(), key=lambda item: int(item[0])))
+    return f"{reviews} reviews, {rounds / reviews:.1f} rounds on average ({spread})"
+
+
+def _echo_budgets(config: Config, token_usage: dict, task_cost: float) -> None:
+    budgets = config.budgets
+    if budgets.run_usd is not None:
+        click.echo(f"Run budget: ${total_cost(token_usage):.2f} of ${budgets.run_usd:.2f} ({budgets.on_run_exceeded} when spent)")
+    if budgets.task_usd is not None:
+        click.echo(f"Task budget: ${task_cost:.2f} of ${budgets.task_usd:.2f} ({budgets.on_task_exceeded} when spent)")
+
+
 def _print_summary(result: dict) -> None:
     """Print a summary of the orchestration run."""
     task_status = result.get("task_status", {})
@@ -184,9 +332,11 @@ def _print_summary(result: dict) -> None:
 
     token_usage = result.get("token_usage", {})
     if token_usage:
-        click.echo("\nToken usage:")
+        click.echo(f"\nToken usage (${total_cost(token_usage):.4f}):")
         for provider, usage in token_usage.items():
-            click.echo(f"  {provider}: {usage.get('input', 0)} in / {usage.get('output', 0)} out")
+            click.echo(f"  {provider}: {_format_usage(usage)}")
+    if result.get("review_rounds"):
+        click.echo(f"Review rounds: {_format_review_rounds(result['review_rounds'])}")
 
 
 if __name__ == "__main__":
@@ -4,12 +4,16 @@ from __future__ import annotations
 
 import logging
 import subprocess
+from pathlib import Path
 from typing import Any
 
-from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
 
+from agent_runner.depgraph import DependencyGraph
 from agent_runner.models import ModelRouter
-from agent_runner.state import AgentState
+from agent_runner.state import AgentState, Task
+from agent_runner.tools import arun_subprocess
+from agent_runner.transcripts import archive_transcript, clear_messages
 
 logger = logging.getLogger("agent_runner")
 
@@ -24,52 +28,119 @@ Rules:
 
 Respond with ONLY the commit message, nothing else."""
 
+GIT_TIMEOUT_SECONDS = 120
 
-def committer_node(state: AgentState, *, router: ModelRouter, app_config: Any) -> dict:
+
+def committer_node(
+    state: AgentState,
+    *,
+    router: ModelRouter,
+    app_config: Any,
+    deps: DependencyGraph | None = None,
+) -> dict:
     """Stage changes and create a git commit."""
     task = state["current_task"]
     if task is None:
         return {"error": "No task to commit"}
 
-    working_dir = str(app_config.project_dir)
+    working_dir = app_config.project_dir
+
+    status_out, _, _ = _git(["status", "--porcelain"], working_dir)
+    if not status_out.strip():
+        logger.info("No changes to commit for task %s", task.id)
+        return {"git_dirty": False, "error": None, **_finish_task(state, app_config)}
+
+    diff_out, _, _ = _git(["diff", "--stat"], working_dir)
+
+    if task.commit_message:
+        commit_msg = task.commit_message
+    else:
+        response = router.invoke_with_fallback("committer", _message_prompt(task, diff_out, status_out))
+        commit_msg = _clean_message(response.content)
+
+    _, stderr, returncode = _git(["add", "-A"], working_dir)
+    if returncode == 0:
+        _, stderr, returncode = _git(["commit", "-m", commit_msg], working_dir)
+    return _commit_result(state, commit_msg, stderr, returncode, deps, app_config)
+
+
+async def committer_node_async(
+    state: AgentState,
+    *,
+    router: ModelRouter,
+    app_config: Any,
+    deps: DependencyGraph | None = None,
+) -> dict:
+    """Async variant of committer_node."""
+    task = state["current_task"]
+    if task is None:
+        return {"error": "No task to commit"}
+
+    working_dir = app_config.project_dir
 
-    status_result = subprocess.run(
-        ["git", "status", "--porcelain"],
-        capture_output=True, text=True, cwd=working_dir,
-    )
-    if not status_result.stdout.strip():
+    status_out, _, _ = await _agit(["status", "--porcelain"], working_dir)
+    if not status_out.strip():
         logger.info("No changes to commit for task %s", task.id)
-        return {"git_dirty": False, "error": None}
+        return {"git_dirty": False, "error": None, **_finish_task(state, app_config)}
 
-    diff_result = subprocess.run(
-        ["git", "diff", "--stat"],
-        capture_output=True, text=True, cwd=working_dir,
-    )
+    diff_out, _, _ = await _agit(["diff", "--stat"], working_dir)
 
     if task.commit_message:
         commit_msg = task.commit_message
     else:
-        messages = [
-            SystemMessage(content=COMMITTER_SYSTEM),
-            HumanMessage(content=f"Task: {task.id} - {task.title}\n\nGit diff stat:\n{diff_result.stdout[:3000]}\n\nFiles changed:\n{status_result.stdout[:3000]}\n\nGenerate the commit message."),
-        ]
-        response = router.invoke_with_fallback("committer", messages)
-        commit_msg = response.content.strip().strip('"').strip("'")
-
-    subprocess.run(["git", "add", "-A"], cwd=working_dir, check=True)
-
-    try:
-        subprocess.run(
-            ["git", "commit", "-m", commit_msg],
-            cwd=working_dir, capture_output=True, text=True, check=True,
-        )
-        logger.info("Committed: %s", commit_msg)
-
-        # Update task status to done
-        task_status = dict(state["task_status"])
-        task_status[task.id] = "done"
-
-        return {"git_dirty": False, "error": None, "task_status": task_status}
-    except subprocess.CalledProcessError as e:
-        logger.error("Git commit failed: %s", e.stderr)
-        return {"git_dirty": True, "error": f"commit_failed: {e.stderr}"}
+        response = await router.ainvoke_with_fallback("committer", _message_prompt(task, diff_out, status_out))
+        commit_msg = _clean_message(response.content)
+
+    _, stderr, returncode = await _agit(["add", "-A"], working_dir)
+    if returncode == 0:
+        _, stderr, returncode = await _agit(["commit", "-m", commit_msg], working_dir)
+    return _commit_result(state, commit_msg, stderr, returncode, deps, app_config)
+
+
+def _git(args: list[str], cwd: Path) -> tuple[str, str, int]:
+    result = subprocess.run(["git", *args], capture_output=True, text=True, cwd=str(cwd))
+    return result.stdout, result.stderr, result.returncode
+
+
+async def _agit(args: list[str], cwd: Path) -> tuple[str, str, int]:
+    return await arun_subprocess(["git", *args], cwd=cwd, timeout=GIT_TIMEOUT_SECONDS)
+
+
+def _message_prompt(task: Task, diff_stat: str, status: str) -> list[BaseMessage]:
+    return [
+        SystemMessage(content=COMMITTER_SYSTEM),
+        HumanMessage(content=f"Task: {task.id} - {task.title}\n\nGit diff stat:\n{diff_stat[:3000]}\n\nFiles changed:\n{status[:3000]}\n\nGenerate the commit message."),
+    ]
+
+
+def _clean_message(content: str) -> str:
+    return content.strip().strip('"').strip("'")
+
+
+def _commit_result(
+    state: AgentState,
+    commit_msg: str,
+    stderr: str,
+    returncode: int,
+    deps: DependencyGraph | None,
+    app_config: Any,
+) -> dict:
+    if returncode != 0:
+        logger.error("Git commit failed: %s", stderr)
+        return {"git_dirty": True, "error": f"commit_failed: {stderr}"}
+
+    logger.info("Committed: %s", commit_msg)
+
+    # Update task status to done
+    task_status = dict(state["task_status"])
+    task_status[state["current_task"].id] = "done"
+    if deps is not None:
+        deps.mark(state["current_task"].id, "done")
+
+    return {"git_dirty": False, "error": None, "task_status": task_status, **_finish_task(state, app_config)}
+
+
+def _finish_task(state: AgentState, app_config: Any) -> dict:
+    """Archive the task's transcript and drop it from checkpointed state."""
+    archive_transcript(app_config, state["current_task"].id, state.get("messages", []))
+    return {"messages": clear_messages(), "review_feedback": None}
@@ -0,0 +1,163 @@
+"""Pre-review gate: deterministic checks that send an attempt back before the LLM reviewer sees it."""
+
+from __future__ import annotations
+
+import asyncio
+import glob
+import logging
+import re
+import shlex
+import subprocess
+from pathlib import Path
+
+from agent_runner.agents.reviewer import record_review_outcome
+from agent_runner.commands import CommandResult, OutputBuffer, command_runner
+from agent_runner.config import Config, GateConfig
+from agent_runner.diagnostics import LINT_SUFFIXES, changed_files
+from agent_runner.models import ModelRouter
+from agent_runner.review import diff_base
+from agent_runner.state import AgentState, Task
+
+logger = logging.getLogger("agent_runner")
+
+COMMAND_NOT_FOUND = 127
+MAX_PATTERN_HITS = 50
+
+_HUNK = re.compile(r"^@@ -\d+(?:,\d+)? \+(\d+)(?:,\d+)? @@")
+
+
+def gate_node(state: AgentState, *, router: ModelRouter, app_config: Config) -> dict:
+    """Check deliverables, forbidden patterns and the configured checks; reject on any failure."""
+    task = state["current_task"]
+    if task is None:
+        return {"error": "No task to review"}
+    project_dir = Path(app_config.project_dir)
+    failures = _static_failures(task, project_dir, app_config.gate)
+    runner = command_runner(project_dir, app_config.commands)
+    for command in _check_commands(project_dir, app_config.gate):
+        failures.extend(_check_failure(command, runner.run(command), app_config.gate))
+    return _outcome(state, router, failures)
+
+
+async def gate_node_async(state: AgentState, *, router: ModelRouter, app_config: Config) -> dict:
+    """Async variant of gate_node."""
+    task = state["current_task"]
+    if task is None:
+        return {"error": "No task to review"}
+    project_dir = Path(app_config.project_dir)
+    failures = await asyncio.to_thread(_static_failures, task, project_dir, app_config.gate)
+    runner = command_runner(project_dir, app_config.commands)
+    for command in await asyncio.to_thread(_check_commands, project_dir, app_config.gate):
+        failures.extend(_check_failure(command, await runner.arun(command), app_config.gate))
+    return _outcome(state, router, failures)
+
+
+def missing_deliverables(task: Task, project_dir: Path) -> list[str]:
+    """Deliverable paths (files, directories or globs) with nothing at them."""
+    missing = []
+    for path in task.deliverable_paths:
+        if "/" not in path and "." not in path:
+            continue  # not a path, e.g. "Tests"
+        if (project_dir / path).exists():
+            continue  # checked first: Expo routes like app/case/[id].tsx look like globs
+        if not glob.has_magic(path) or not glob.glob(path, root_dir=project_dir, recursive=True):
+            missing.append(path)
+    return missing
+
+
+def added_lines(project_dir: Path) -> list[tuple[str, int, str]]:
+    """(path, line number, text) of every line added since HEAD, untracked files included."""
+    def git(*args: str) -> subprocess.CompletedProcess:
+        return subprocess.run(["git", *args], cwd=str(project_dir), capture_output=True, text=True, timeout=60)
+
+    base = diff_base(project_dir)
+    lines: list[tuple[str, int, str]] = []
+    path, number = None, 0
+    for line in git("diff", base, "--no-color", "--no-ext-diff", "-U0").stdout.splitlines():
+        if line.startswith("+++ "):
+            path = line[6:] if line.startswith("+++ b/") else None
+        elif hunk := _HUNK.match(line):
+            number = int(hunk.group(1))
+        elif line.startswith("+") and path is not None:
+            lines.append((path, number, line[1:]))
+            number += 1
+    for path in git("ls-files", "--others", "--exclude-standard", "-z").stdout.split("\0"):
+        if not path:
+            continue
+        try:
+            text = (project_dir / path).read_text(encoding="utf-8")
+        except (OSError, UnicodeDecodeError):
+            continue
+        lines.extend((path, n, line) for n, line in enumerate(text.splitlines(), start=1))
+    return lines
+
+
+def forbidden_pattern_hits(project_dir: Path, config: GateConfig) -> list[str]:
+    """Added lines matching a forbidden pattern, as `path:line: reason: text`."""
+    if not config.forbidden_patterns:
+        return []
+    patterns = [(re.compile(pattern), reason) for pattern, reason in config.forbidden_patterns.items()]
+    suffixes = tuple(config.pattern_suffixes)
+    hits = []
+    for path, number, text in added_lines(project_dir):
+        if not path.endswith(suffixes):
+            continue
+        for pattern, reason in patterns:
+            if pattern.search(text):
+                hits.append(f"{path}:{number}: {reason}: {text.strip()[:200]}")
+                break
+    return hits
+
+
+def _static_failures(task: Task, project_dir: Path, config: GateConfig) -> list[str]:
+    failures = []
+    missing = missing_deliverables(task, project_dir)
+    if missing:
+        failures.append("Missing deliverables:\n" + "\n".join(f"- {path}" for path in missing))
+    hits = forbidden_pattern_hits(project_dir, config)
+    if hits:
+        shown = hits[:MAX_PATTERN_HITS]
+        more = f"\n... and {len(hits) - len(shown)} more" if len(hits) > len(shown) else ""
+        failures.append("Forbidden patterns in added lines:\n" + "\n".join(shown) + more)
+    return failures
+
+
+def _check_commands(project_dir: Path, config: GateConfig) -> list[str]:
+    """The configured checks, with {files} filled in; checks needing files are dropped when none changed."""
+    commands = []
+    files: list[str] | None = None
+    for command in config.checks:
+        if "{files}" in command:
+            if files is None:
+                files = [f for f in changed_files(project_dir) if f.endswith(LINT_SUFFIXES)]
+            if not files:
+                continue
+            command = command.replace("{files}", " ".join(shlex.quote(f) for f in files))
+        commands.append(command)
+    return commands
+
+
+def _check_failure(command: str, result: CommandResult, config: GateConfig) -> list[str]:
+    """The feedback for a failed check. A check that timed out or could not run is left to the reviewer."""
+    if result.returncode == 0:
+        return []
+    if result.timed_out or result.returncode == COMMAND_NOT_FOUND:
+        logger.warning("Gate check `%s` could not run to completion; skipping it", command)
+        return []
+    output = OutputBuffer(config.max_output_chars)
+    output.write(result.format().encode("utf-8"))
+    return [f"`{command}` failed:\n{output.text()}"]
+
+
+def _outcome(state: AgentState, router: ModelRouter, failures: list[str]) -> dict:
+    task = state["current_task"]
+    if not failures:
+        logger.info("Task %s passed the pre-review gate", task.id)
+        return {"error": None}
+    logger.info("Pre-review gate rejected task %s: %d failed checks", task.id, len(failures))
+    update = {
+        "error": "review_rejected",
+        "review_feedback": "Automated pre-review checks failed:\n\n" + "\n\n".join(failures),
+        "retry_count": state.get("retry_count", 0) + 1,
+    }
+    return record_review_outcome(state, router, update)
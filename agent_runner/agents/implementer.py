@@ -2,24 +2,28 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
-from typing import Any
 
-from langchain_core.messages import HumanMessage, SystemMessage, ToolMessage
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
 
+from agent_runner.compaction import compact_messages, pinned_prefix
+from agent_runner.config import Config
 from agent_runner.models import ModelRouter
-from agent_runner.state import AgentState
+from agent_runner.state import AgentState, Task
+from agent_runner.symbols import symbol_index
+from agent_runner.tools import AsyncToolPrefetch, ToolPrefetch, arun_tool_calls, is_tool_error, run_tool_calls
 
 logger = logging.getLogger("agent_runner")
 
 IMPLEMENTER_SYSTEM = """You are the Implementer agent for the Lomito project.
 
-You have access to tools for reading, writing, and editing files, searching code, and running shell commands.
+You have access to tools for reading, writing, and editing files, searching code, looking up exported symbols, and running shell commands.
 
 Your job is to implement the assigned task by:
 1. Reading relevant existing code to understand the codebase
 2. Writing or modifying files to implement the deliverables
-3. Running typecheck (npx tsc --noEmit) and lint (npx eslint) to verify your changes
+3. Checking your changes for type and lint errors: with check_diagnostics after each edit when you have it, otherwise typecheck (npx tsc --noEmit) and lint (npx eslint)
 4. Ensuring all deliverables listed in the task are created/modified
 
 Project conventions:
@@ -34,61 +38,163 @@ Do NOT commit — the Committer agent handles that.
 """
 
 MAX_TOOL_ROUNDS = 30
+_REPO_MAP_HEADER = "Repo map (exports of the files most relevant to this task; find_symbol looks up others):\n"
 
 
-def implementer_node(state: AgentState, *, router: ModelRouter, tools: list) -> dict:
+def implementer_node(state: AgentState, *, router: ModelRouter, tools: list, app_config: Config) -> dict:
     """Execute the current task using tool-calling LLM."""
     task = state["current_task"]
     if task is None:
         return {"error": "No task selected"}
 
-    deliverables_str = "\n".join(f"- {d}" for d in task.deliverables) if task.deliverables else "See spec for details."
+    messages = _initial_messages(state, _repo_map(state, app_config))
+    pinned = len(messages)
+    transcript: list[BaseMessage] = []  # uncompacted, for the task's archive
+    tier = _task_tier(state, router, app_config)
+    tool_errors = 0
 
-    messages = [
-        SystemMessage(content=IMPLEMENTER_SYSTEM),
-        HumanMessage(content=f"""Task: {task.id} - {task.title}
+    for round_num in range(MAX_TOOL_ROUNDS):
+        messages = _compact(messages, pinned, app_config, round_num)
+        prefetch = ToolPrefetch(tools) if app_config.streaming else None
+        response = router.invoke_with_fallback(
+            "implementer", messages, tools=tools, on_tool_call=prefetch, model=router.tier_model("implementer", tier),
+        )
+        messages.append(response)
+        transcript.append(response)
 
-Deliverables:
-{deliverables_str}
+        if not response.tool_calls:
+            logger.info("Implementer finished task %s after %d rounds", task.id, round_num + 1)
+            break
 
-{"Spec reference: " + task.spec if task.spec else ""}
+        if prefetch:
+            results = prefetch.run(response.tool_calls)
+        else:
+            results = run_tool_calls(tools, response.tool_calls)
+        messages.extend(results)
+        transcript.extend(results)
+        tool_errors += sum(1 for m in results if is_tool_error(m))
+        tier, tool_errors = _escalate_on_errors(router, task, tier, tool_errors)
+        logger.debug("Tools %s called (round %d)", [tc["name"] for tc in response.tool_calls], round_num + 1)
+    else:
+        logger.warning("Implementer hit max rounds (%d) for task %s", MAX_TOOL_ROUNDS, task.id)
+
+    return {"messages": transcript, "git_dirty": True, "error": None, "model_tier": tier}
 
-Implement this task now. Use the available tools to read existing code, write new files, and verify your changes."""),
-    ]
 
-    context_messages = state.get("messages", [])
-    if context_messages:
-        messages.extend(context_messages)
+async def implementer_node_async(state: AgentState, *, router: ModelRouter, tools: list, app_config: Config) -> dict:
+    """Async variant of implementer_node."""
+    task = state["current_task"]
+    if task is None:
+        return {"error": "No task selected"}
+
+    repo_map = await asyncio.to_thread(_repo_map, state, app_config)
+    messages = _initial_messages(state, repo_map)
+    pinned = len(messages)
+    transcript: list[BaseMessage] = []  # uncompacted, for the task's archive
+    tier = _task_tier(state, router, app_config)
+    tool_errors = 0
 
     for round_num in range(MAX_TOOL_ROUNDS):
-        response = router.invoke_with_fallback("implementer", messages, tools=tools)
+        messages = _compact(messages, pinned, app_config, round_num)
+        prefetch = AsyncToolPrefetch(tools) if app_config.streaming else None
+        response = await router.ainvoke_with_fallback(
+            "implementer", messages, tools=tools, on_tool_call=prefetch, model=router.tier_model("implementer", tier),
+        )
         messages.append(response)
+        transcript.append(response)
 
         if not response.tool_calls:
             logger.info("Implementer finished task %s after %d rounds", task.id, round_num + 1)
             break
 
-        for tool_call in response.tool_calls:
-            tool_fn = _find_tool(tools, tool_call["name"])
-            if tool_fn is None:
-                tool_result = f"Error: Unknown tool '{tool_call['name']}'"
-            else:
-                try:
-                    tool_result = tool_fn.invoke(tool_call["args"])
-                except Exception as e:
-                    tool_result = f"Error executing {tool_call['name']}: {e}"
-
-            messages.append(ToolMessage(content=str(tool_result), tool_call_id=tool_call["id"]))
-            logger.debug("Tool %s called (round %d)", tool_call["name"], round_num + 1)
+        if prefetch:
+            results = await prefetch.arun(response.tool_calls)
+        else:
+            results = await arun_tool_calls(tools, response.tool_calls)
+        messages.extend(results)
+        transcript.extend(results)
+        tool_errors += sum(1 for m in results if is_tool_error(m))
+        tier, tool_errors = _escalate_on_errors(router, task, tier, tool_errors)
+        logger.debug("Tools %s called (round %d)", [tc["name"] for tc in response.tool_calls], round_num + 1)
     else:
         logger.warning("Implementer hit max rounds (%d) for task %s", MAX_TOOL_ROUNDS, task.id)
 
-    return {"messages": messages, "git_dirty": True, "error": None}
+    return {"messages": transcript, "git_dirty": True, "error": None, "model_tier": tier}
+
+
+def _task_tier(state: AgentState, router: ModelRouter, app_config: Config) -> int | None:
+    """The task's model tier: kept from an earlier attempt, else picked from its difficulty."""
+    if router.routing is None:
+        return None
+    tier = state.get("model_tier")
+    if tier is None:
+        tier = router.routing.start_tier(state["current_task"], app_config.project_dir)
+    return tier
+
+
+def _escalate_on_errors(router: ModelRouter, task: Task, tier: int | None, tool_errors: int) -> tuple[int | None, int]:
+    """Move up a tier once the attempt has hit escalate_after_tool_errors failed tool calls."""
+    if router.routing is None or tier is None or tool_errors < router.routing.config.escalate_after_tool_errors:
+        return tier, tool_errors
+    return router.routing.escalate(tier, task, f"{tool_errors} failed tool calls"), 0
+
+
+def _compact(messages: list[BaseMessage], pinned: int, app_config: Config, round_num: int) -> list[BaseMessage]:
+    """Keep the transcript within the compaction budget, logging what it saved."""
+    compacted, saved = compact_messages(messages, pinned=pinned, config=app_config.compaction)
+    if saved > 0:
+        logger.info(
+            "Compacted implementer context before round %d: ~%d tokens saved (%d -> %d messages)",
+            round_num + 1, saved, len(messages), len(compacted),
+        )
+    return compacted
+
+
+def _repo_map(state: AgentState, app_config: Config) -> str:
+    """Exports of the files most relevant to the task, so the first rounds needn't explore."""
+    if not app_config.repo_map.enabled:
+        return ""
+    context = state.get("messages", [])
+    spec = "\n".join(str(m.content) for m in context[:pinned_prefix(context)])
+    try:
+        return symbol_index(app_config.project_dir).repo_map(
+            state["current_task"], spec, max_files=app_config.repo_map.max_files,
+        )
+    except Exception as e:
+        logger.warning("Could not build the repo map: %s", e)
+        return ""
+
+
+def _initial_messages(state: AgentState, repo_map: str = "") -> list[BaseMessage]:
+    """System prompt, task brief (with the repo map) and spec; on a retry, the reviewer's feedback.
+
+    Earlier attempts' transcripts stay out of the prompt: their edits are
+    already in the working tree.
+    """
+    task = state["current_task"]
+    deliverables_str = "\n".join(f"- {d}" for d in task.deliverables) if task.deliverables else "See spec for details."
+
+    messages: list[BaseMessage] = [
+        SystemMessage(content=IMPLEMENTER_SYSTEM),
+        HumanMessage(content=f"""Task: {task.id} - {task.title}
+
+Deliverables:
+{deliverables_str}
+
+{"Spec reference: " + task.spec if task.spec else ""}
+{_REPO_MAP_HEADER + repo_map if repo_map else ""}
 
+Implement this task now. Use the available tools to read existing code, write new files, and verify your changes."""),
+    ]
 
-def _find_tool(tools: list, name: str):
-    """Find a tool by name."""
-    for t in tools:
-        if t.name == name:
-            return t
-    return None
+    # The planner's spec messages lead the task-scoped channel, ahead of any transcript
+    context = state.get("messages", [])
+    messages.extend(context[:pinned_prefix(context)])
+
+    feedback = state.get("review_feedback")
+    if feedback:
+        messages.append(HumanMessage(
+            content=f"The reviewer rejected the previous attempt. Its changes are still in the working tree. "
+                    f"Fix these issues:\n\n{feedback}",
+        ))
+    return messages
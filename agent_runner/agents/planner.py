@@ -1,4 +1,8 @@
-"""Planner agent: selects the next unblocked task."""
+"""Planner agent: selects the next unblocked task.
+
+Selection is deterministic (see scheduler.py and depgraph.py); the LLM is only consulted to
+break exact ties when planner.llm_tiebreak is enabled.
+"""
 
 from __future__ import annotations
 
@@ -6,17 +10,19 @@ import logging
 from pathlib import Path
 from typing import Any
 
-from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
 
 from agent_runner.models import ModelRouter
-from agent_runner.parser import get_unblocked_tasks
-from agent_runner.state import AgentState
+from agent_runner.depgraph import DependencyGraph
+from agent_runner.state import AgentState, Task
+from agent_runner.transcripts import archive_transcript, clear_messages
 
 logger = logging.getLogger("agent_runner")
 
 PLANNER_SYSTEM = """You are the Planner agent for the Lomito project orchestrator.
 
 Your job is to analyze the list of tasks and their dependencies, then select the best next task to work on.
+The unblocked tasks you are given are tied on critical-path length, downstream fan-out and phase.
 
 You will receive:
 1. The full task list with dependency info and completion status
@@ -31,48 +37,98 @@ Selection criteria:
 """
 
 
-def planner_node(state: AgentState, *, router: ModelRouter, app_config: Any) -> dict:
+def planner_node(state: AgentState, *, router: ModelRouter, app_config: Any, deps: DependencyGraph) -> dict:
     """Select the next task to execute."""
-    tasks = state["tasks"]
-    task_status = state["task_status"]
-
-    unblocked = get_unblocked_tasks(tasks, task_status)
-
-    if not unblocked:
-        pending = [t for t in tasks if task_status.get(t.id, "pending") == "pending"]
-        if not pending:
-            logger.info("All tasks completed!")
-            return {"current_task": None, "error": None}
-        else:
-            logger.info("No unblocked tasks. %d tasks still blocked.", len(pending))
-            return {"current_task": None, "error": "blocked"}
-
-    if len(unblocked) == 1:
-        selected = unblocked[0]
+    update = _record_abandoned(state, deps, app_config)
+    selected, ties = deps.next_with_ties()
+
+    if selected is None:
+        return {**no_task_result(state, deps), **update}
+
+    if len(ties) > 1 and app_config.planner_llm_tiebreak:
+        response = router.invoke_with_fallback("planner", _selection_messages(state, ties))
+        selected = _match_task(response.content.strip(), ties)
+
+    return {**update, **select_task(selected, app_config)}
+
+
+async def planner_node_async(state: AgentState, *, router: ModelRouter, app_config: Any, deps: DependencyGraph) -> dict:
+    """Async variant of planner_node."""
+    update = _record_abandoned(state, deps, app_config)
+    selected, ties = deps.next_with_ties()
+
+    if selected is None:
+        return {**no_task_result(state, deps), **update}
+
+    if len(ties) > 1 and app_config.planner_llm_tiebreak:
+        response = await router.ainvoke_with_fallback("planner", _selection_messages(state, ties))
+        selected = _match_task(response.content.strip(), ties)
+
+    return {**update, **select_task(selected, app_config)}
+
+
+def _record_abandoned(state: AgentState, deps: DependencyGraph, app_config: Any) -> dict:
+    """Sync the dependency graph; fail a task that ran out of review retries.
+
+    Without this the rejected task would still be pending and get picked again.
+    Its transcript is archived and cleared, as the committer does for finished tasks.
+    """
+    deps.sync(state["tasks"], state["task_status"])
+    task = state.get("current_task")
+    if task is None or state.get("error") != "review_rejected":
+        return {}
+
+    logger.warning("Task %s failed review %d times; marking failed", task.id, state.get("retry_count", 0))
+    deps.mark(task.id, "failed")
+    archive_transcript(app_config, task.id, state.get("messages", []))
+    task_status = dict(state["task_status"])
+    task_status[task.id] = "failed"
+    return {"task_status": task_status, "messages": clear_messages(), "review_feedback": None}
+
+
+def no_task_result(state: AgentState, deps: DependencyGraph | None = None) -> dict:
+    """State update for when nothing can be scheduled: finished or blocked."""
+    if deps is not None:
+        pending = deps.pending()
+    else:
+        task_status = state["task_status"]
+        pending = [t for t in state["tasks"] if task_status.get(t.id, "pending") == "pending"]
+    if not pending:
+        logger.info("All tasks completed!")
+        return {"current_task": None, "error": None}
     else:
-        task_summary = "\n".join(
-            f"- {t.id}: {t.title} (depends on: {', '.join(t.depends_on) or 'nothing'})"
-            for t in tasks
-        )
-        status_summary = "\n".join(
-            f"- {tid}: {status}" for tid, status in task_status.items()
-        )
-        unblocked_summary = "\n".join(f"- {t.id}: {t.title}" for t in unblocked)
-
-        messages = [
-            SystemMessage(content=PLANNER_SYSTEM),
-            HumanMessage(content=f"Tasks:\n{task_summary}\n\nStatus:\n{status_summary}\n\nUnblocked tasks:\n{unblocked_summary}\n\nWhich task should we execute next?"),
-        ]
-
-        response = router.invoke_with_fallback("planner", messages)
-        response_text = response.content.strip()
-
-        selected = unblocked[0]
-        for task in unblocked:
-            if task.id in response_text:
-                selected = task
-                break
+        logger.info("No unblocked tasks. %d tasks still blocked.", len(pending))
+        return {"current_task": None, "error": "blocked"}
+
+
+def _selection_messages(state: AgentState, unblocked: list[Task]) -> list[BaseMessage]:
+    task_summary = "\n".join(
+        f"- {t.id}: {t.title} (depends on: {', '.join(t.depends_on) or 'nothing'})"
+        for t in state["tasks"]
+    )
+    status_summary = "\n".join(
+        f"- {tid}: {status}" for tid, status in state["task_status"].items()
+    )
+    unblocked_summary = "\n".join(f"- {t.id}: {t.title}" for t in unblocked)
+
+    return [
+        SystemMessage(content=PLANNER_SYSTEM),
+        HumanMessage(content=f"Tasks:\n{task_summary}\n\nStatus:\n{status_summary}\n\nUnblocked tasks:\n{unblocked_summary}\n\nWhich task should we execute next?"),
+    ]
+
+
+def _match_task(response_text: str, unblocked: list[Task]) -> Task:
+    for task in unblocked:
+        if task.id in response_text:
+            return task
+    return unblocked[0]
+
+
+def select_task(selected: Task, app_config: Any) -> dict:
+    """State update that makes `selected` the current task, with its spec as context.
 
+    `messages` is reset so it only ever holds the current task's spec and transcripts.
+    """
     logger.info("Planner selected task: %s - %s", selected.id, selected.title)
 
     spec_content = ""
@@ -88,8 +144,12 @@ def planner_node(state: AgentState, *, router: ModelRouter, app_config: Any) ->
         "current_task": selected,
         "retry_count": 0,
         "error": None,
+        "review_feedback": None,
+        "task_cost": None,
+        "model_tier": None,
         "messages": [
-            SystemMessage(content=f"Working on task {selected.id}: {selected.title}"),
-            HumanMessage(content=f"Spec:\n{spec_content}" if spec_content else "No spec file available."),
+            *clear_messages(),
+            HumanMessage(content=f"Working on task {selected.id}: {selected.title}\n\n"
+                         + (f"Spec:\n{spec_content}" if spec_content else "No spec file available.")),
         ],
     }
@@ -2,12 +2,17 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
+from typing import Any
 
-from langchain_core.messages import HumanMessage, SystemMessage, ToolMessage
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
 
+from agent_runner.config import Config
 from agent_runner.models import ModelRouter
-from agent_runner.state import AgentState
+from agent_runner.review import build_review_bundle
+from agent_runner.state import AgentState, Task
+from agent_runner.tools import arun_tool_calls, run_tool_calls
 
 logger = logging.getLogger("agent_runner")
 
@@ -24,11 +29,10 @@ Review criteria:
 6. No security issues (no exposed secrets, proper input sanitization)
 7. Code follows project conventions (camelCase, PascalCase, kebab-case files)
 
-You have access to tools to:
-- Read files to review the changes
-- Run `git diff` to see what changed
-- Run `npx tsc --noEmit` to typecheck
-- Run `npx eslint` to lint
+The review request lists the changed files and carries their diff. You have access to tools to:
+- Read files for context the diff doesn't show, or whose diff was left out
+- Run `git diff` when the request has no diff
+- Run `npx tsc --noEmit` to typecheck and `npx eslint` to lint, or use check_diagnostics when you have it
 
 After reviewing, respond with either:
 - APPROVED: followed by a brief summary of the changes
@@ -38,63 +42,125 @@ Be constructive but strict. Only reject for real issues, not style preferences.
 """
 
 MAX_REVIEW_ROUNDS = 15
+PROMPT_MESSAGES = 2  # system prompt + review request; only what follows goes into state
 
 
-def reviewer_node(state: AgentState, *, router: ModelRouter, tools: list) -> dict:
+def reviewer_node(state: AgentState, *, router: ModelRouter, tools: list, app_config: Config) -> dict:
     """Review changes and approve or reject."""
     task = state["current_task"]
     if task is None:
         return {"error": "No task to review"}
 
+    messages = _initial_messages(task, _review_bundle(task, app_config))
+    model = router.tier_model("reviewer", state.get("model_tier"))
+
+    for round_num in range(MAX_REVIEW_ROUNDS):
+        response = router.invoke_with_fallback("reviewer", messages, tools=tools, model=model)
+        messages.append(response)
+
+        if not response.tool_calls:
+            update = _verdict(state, response, messages[PROMPT_MESSAGES:])
+            return record_review_outcome(state, router, _with_rounds(task, update, round_num + 1))
+
+        messages.extend(run_tool_calls(tools, response.tool_calls))
+
+    logger.warning("Reviewer hit max rounds for task %s, auto-approving", task.id)
+    update = {"messages": messages[PROMPT_MESSAGES:], "error": None, "review_feedback": None}
+    return _with_rounds(task, update, MAX_REVIEW_ROUNDS)
+
+
+async def reviewer_node_async(state: AgentState, *, router: ModelRouter, tools: list, app_config: Config) -> dict:
+    """Async variant of reviewer_node."""
+    task = state["current_task"]
+    if task is None:
+        return {"error": "No task to review"}
+
+    messages = _initial_messages(task, await asyncio.to_thread(_review_bundle, task, app_config))
+    model = router.tier_model("reviewer", state.get("model_tier"))
+
+    for round_num in range(MAX_REVIEW_ROUNDS):
+        response = await router.ainvoke_with_fallback("reviewer", messages, tools=tools, model=model)
+        messages.append(response)
+
+        if not response.tool_calls:
+            update = _verdict(state, response, messages[PROMPT_MESSAGES:])
+            return record_review_outcome(state, router, _with_rounds(task, update, round_num + 1))
+
+        messages.extend(await arun_tool_calls(tools, response.tool_calls))
+
+    logger.warning("Reviewer hit max rounds for task %s, auto-approving", task.id)
+    update = {"messages": messages[PROMPT_MESSAGES:], "error": None, "review_feedback": None}
+    return _with_rounds(task, update, MAX_REVIEW_ROUNDS)
+
+
+def _review_bundle(task: Task, app_config: Config) -> str:
+    """The changed files and their diff, so the first rounds needn't fetch them."""
+    if not app_config.review.bundle:
+        return ""
+    try:
+        return build_review_bundle(app_config.project_dir, task, app_config.review)
+    except Exception as e:
+        logger.warning("Could not build the review bundle: %s", e)
+        return ""
+
+
+def _initial_messages(task: Task, bundle: str = "") -> list[BaseMessage]:
     deliverables_str = "\n".join(f"- {d}" for d in task.deliverables) if task.deliverables else "See task description."
 
-    messages = [
+    if bundle:
+        instructions = f"""{bundle}
+
+Review the diff above. Read files only for context it doesn't show, and run typecheck/lint
+to verify quality. Then approve or reject."""
+    else:
+        instructions = """Use `git diff` and `git diff --cached` to see changes, read files to review them,
+and run typecheck/lint to verify quality. Then approve or reject."""
+
+    return [
         SystemMessage(content=REVIEWER_SYSTEM),
         HumanMessage(content=f"""Review the changes for task {task.id}: {task.title}
 
 Expected deliverables:
 {deliverables_str}
 
-Use `git diff` and `git diff --cached` to see changes, read files to review them,
-and run typecheck/lint to verify quality. Then approve or reject."""),
+{instructions}"""),
     ]
 
-    for round_num in range(MAX_REVIEW_ROUNDS):
-        response = router.invoke_with_fallback("reviewer", messages, tools=tools)
-        messages.append(response)
 
-        if not response.tool_calls:
-            content = response.content.upper()
-            if "APPROVED" in content:
-                logger.info("Reviewer approved task %s", task.id)
-                return {"messages": messages, "error": None}
-            elif "REJECTED" in content:
-                logger.info("Reviewer rejected task %s", task.id)
-                return {
-                    "messages": messages,
-                    "error": "review_rejected",
-                    "retry_count": state.get("retry_count", 0) + 1,
-                }
-            else:
-                logger.info("Reviewer gave ambiguous response for %s, treating as approved", task.id)
-                return {"messages": messages, "error": None}
-
-        for tool_call in response.tool_calls:
-            tool_fn = None
-            for t in tools:
-                if t.name == tool_call["name"]:
-                    tool_fn = t
-                    break
-
-            if tool_fn is None:
-                tool_result = f"Error: Unknown tool '{tool_call['name']}'"
-            else:
-                try:
-                    tool_result = tool_fn.invoke(tool_call["args"])
-                except Exception as e:
-                    tool_result = f"Error: {e}"
-
-            messages.append(ToolMessage(content=str(tool_result), tool_call_id=tool_call["id"]))
+def _with_rounds(task: Task, update: dict, rounds: int) -> dict:
+    """Count the rounds this review took toward the run's review_rounds metric."""
+    logger.info("Review of task %s took %d rounds", task.id, rounds)
+    update["review_rounds"] = {str(rounds): 1}
+    return update
 
-    logger.warning("Reviewer hit max rounds for task %s, auto-approving", task.id)
-    return {"messages": messages, "error": None}
+
+def _verdict(state: AgentState, response: Any, transcript: list[BaseMessage]) -> dict:
+    """Turn the reviewer's final answer into a state update."""
+    task = state["current_task"]
+    content = response.content.upper()
+    if "APPROVED" in content:
+        logger.info("Reviewer approved task %s", task.id)
+        return {"messages": transcript, "error": None, "review_feedback": None}
+    elif "REJECTED" in content:
+        logger.info("Reviewer rejected task %s", task.id)
+        return {
+            "messages": transcript,
+            "error": "review_rejected",
+            "review_feedback": response.content.strip(),
+            "retry_count": state.get("retry_count", 0) + 1,
+        }
+    else:
+        logger.info("Reviewer gave ambiguous response for %s, treating as approved", task.id)
+        return {"messages": transcript, "error": None, "review_feedback": None}
+
+
+def record_review_outcome(state: AgentState, router: ModelRouter, update: dict) -> dict:
+    """Count the verdict toward the task's tier and escalate the tier after a rejection."""
+    tier = state.get("model_tier")
+    if router.routing is None or tier is None:
+        return update
+    rejected = update.get("error") == "review_rejected"
+    router.routing.record_review(tier, approved=not rejected)
+    if rejected:
+        update["model_tier"] = router.routing.escalate(tier, state["current_task"], "review rejected")
+    return update
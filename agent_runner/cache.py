@@ -0,0 +1,194 @@
+"""Content-addressed on-disk cache of LLM responses, with record and replay modes."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any
+
+from langchain_core.messages import AIMessage, BaseMessage, message_to_dict, messages_from_dict
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from agent_runner.config import CacheConfig, Config, ModelConfig
+
+logger = logging.getLogger("agent_runner")
+
+OFF = "off"
+RECORD = "record"  # serve hits, call the provider and store the response on a miss
+REPLAY = "replay"  # serve hits only; a miss is an error, never a network call
+MODES = (OFF, RECORD, REPLAY)
+
+
+class CacheMiss(LookupError):
+    """Raised in replay mode when a call was never recorded."""
+
+
+def _message_fingerprint(message: BaseMessage) -> dict[str, Any]:
+    """The parts of a message the model sees; ids and metadata vary run to run."""
+    data: dict[str, Any] = {"type": message.type, "content": message.content}
+    if message.name:
+        data["name"] = message.name
+    if isinstance(message, AIMessage) and message.tool_calls:
+        data["tool_calls"] = [{"name": tc["name"], "args": tc["args"], "id": tc["id"]} for tc in message.tool_calls]
+    tool_call_id = getattr(message, "tool_call_id", None)
+    if tool_call_id:
+        data["tool_call_id"] = tool_call_id
+    return data
+
+
+def content_digest(
+    messages: list[BaseMessage],
+    tools: list[Any] | None = None,
+    params: dict[str, Any] | None = None,
+) -> str:
+    """sha256 over messages, bound tool schemas and call parameters."""
+    payload = {
+        "messages": [_message_fingerprint(m) for m in messages],
+        "tools": [convert_to_openai_tool(t) for t in tools or []],
+        "params": params or {},
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def cache_key(model_config: ModelConfig, digest: str) -> str:
+    """Key of one call: the model plus the content digest of what it was sent."""
+    return hashlib.sha256(f"{model_config.provider}/{model_config.model}:{digest}".encode()).hexdigest()
+
+
+class ResponseCache:
+    """One JSON file per response under <dir>/<key[:2]>/<key>.json.
+
+    A file's mtime doubles as its last-access time: hits touch it, and when
+    the cache grows past max_bytes the least recently used files are
+    deleted until it is back under 90% of the limit.
+    """
+
+    def __init__(self, directory: Path, *, mode: str = RECORD, max_bytes: int = 512 * 1024 * 1024) -> None:
+        if mode not in MODES:
+            raise ValueError(f"Unknown LLM cache mode: {mode} (expected one of {', '.join(MODES)})")
+        self.directory = directory
+        self.mode = mode
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._size: int | None = None  # computed on first write
+        self._occurrences: Counter[str] = Counter()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: Config) -> ResponseCache | None:
+        settings: CacheConfig = config.llm_cache
+        if settings.mode == OFF:
+            return None
+        directory = settings.dir or Path(config.checkpoint_dir) / "llm_cache"
+        return cls(directory, mode=settings.mode, max_bytes=settings.max_size_mb * 1024 * 1024)
+
+    def call_digest(
+        self,
+        messages: list[BaseMessage],
+        tools: list[Any] | None = None,
+        params: dict[str, Any] | None = None,
+    ) -> str:
+        """Content digest plus how many identical calls this run has made before.
+
+        A retry that sends the same prompt again (e.g. the reviewer's opening
+        turn after a rejection) must not be answered with the first reply, and
+        replay has to hand out recorded replies in the order they happened.
+        """
+        digest = content_digest(messages, tools, params)
+        with self._lock:
+            ordinal = self._occurrences[digest]
+            self._occurrences[digest] += 1
+        return f"{digest}:{ordinal}"
+
+    def get(self, key: str) -> AIMessage | None:
+        path = self._path(key)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return messages_from_dict([entry["response"]])[0]
+
+    def put(self, model_config: ModelConfig, digest: str, response: BaseMessage) -> None:
+        """Store a response; written atomically so a crash never leaves a torn entry."""
+        key = cache_key(model_config, digest)
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        entry = {
+            "key": key,
+            "model": f"{model_config.provider}/{model_config.model}",
+            "created": time.time(),
+            "response": message_to_dict(response),
+        }
+        data = json.dumps(entry, default=str).encode("utf-8")
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+        with self._lock:
+            if self._size is None:
+                self._size = self._disk_usage()
+            else:
+                self._size += len(data)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def lookup(self, chain: list[ModelConfig], digest: str) -> tuple[AIMessage, ModelConfig] | None:
+        """First recorded response for any model in the chain; counts a hit or a miss."""
+        for mc in chain:
+            response = self.get(cache_key(mc, digest))
+            if response is not None:
+                with self._lock:  # the router is shared by threads
+                    self.hits += 1
+                return response, mc
+        with self._lock:
+            self.misses += 1
+        if self.mode == REPLAY:
+            raise CacheMiss(f"No recorded LLM response for this call (tried {len(chain)} model(s)); "
+                            "re-run with --llm-cache record to capture it")
+        return None
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def _entries(self) -> list[tuple[float, int, Path]]:
+        entries = []
+        for path in self.directory.glob("*/*.json"):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def _disk_usage(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self) -> None:
+        """Delete least recently used entries down to 90% of max_bytes."""
+        target = int(self.max_bytes * 0.9)
+        entries = sorted(self._entries())
+        size = sum(s for _, s, _ in entries)
+        removed = 0
+        for _, entry_size, path in entries:
+            if size <= target:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            size -= entry_size
+            removed += 1
+        self._size = size
+        logger.debug("LLM cache evicted %d entries (%d bytes left)", removed, size)
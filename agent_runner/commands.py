@@ -0,0 +1,496 @@
+"""Shell command execution for run_command: per-command timeouts, bounded output, a persistent worker."""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import os
+import secrets
+import select
+import shlex
+import shutil
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+
+from agent_runner.config import CommandsConfig
+
+logger = logging.getLogger("agent_runner")
+
+READ_CHUNK_BYTES = 65536
+KILL_GRACE_SECONDS = 5
+EXIT_POLL_SECONDS = 0.05
+CHECK_CACHE_ENTRIES = 128
+GIT_TIMEOUT_SECONDS = 60
+
+
+class OutputBuffer:
+    """Keeps the first and last bytes of a stream, dropping the middle.
+
+    A quarter of the limit goes to the head (the command's first lines), the
+    rest to the tail, where tsc and eslint print their errors and summary.
+    """
+
+    def __init__(self, limit: int) -> None:
+        self.head_limit = limit // 4
+        self.tail_limit = limit - self.head_limit
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.dropped = 0
+
+    def write(self, data: bytes) -> None:
+        room = self.head_limit - len(self.head)
+        if room > 0:
+            self.head += data[:room]
+            data = data[room:]
+        if not data:
+            return
+        self.tail += data
+        if len(self.tail) > 2 * self.tail_limit:  # trim in bulk, not on every chunk
+            self._trim()
+
+    def text(self) -> str:
+        self._trim()
+        head = self.head.decode("utf-8", errors="replace")
+        tail = self.tail.decode("utf-8", errors="replace")
+        if not self.dropped:
+            return head + tail
+        newline = tail.find("\n")
+        if 0 <= newline < 200:
+            tail = tail[newline + 1:]  # start the tail on a whole line
+        return f"{head}\n... [{self.dropped} bytes omitted] ...\n{tail}"
+
+    def _trim(self) -> None:
+        excess = len(self.tail) - self.tail_limit
+        if excess > 0:
+            del self.tail[:excess]
+            self.dropped += excess
+
+
+@dataclass
+class CommandResult:
+    stdout: str
+    stderr: str
+    returncode: int | None  # None when the command was killed on timeout
+    timeout: float
+    seconds: float
+
+    @property
+    def timed_out(self) -> bool:
+        return self.returncode is None
+
+    def format(self) -> str:
+        """The tool result: stdout, then stderr, then the exit code if non-zero."""
+        output = self.stdout
+        if self.stderr:
+            output += f"\nSTDERR:\n{self.stderr}"
+        if self.timed_out:
+            partial = f"\nOutput before it was killed:\n{output}" if output.strip() else ""
+            return f"Error: Command timed out after {self.timeout:g}s and was killed{partial}"
+        if self.returncode != 0:
+            output += f"\nExit code: {self.returncode}"
+        return output or "(no output)"
+
+
+@contextmanager
+def scratch_index(working_dir: Path) -> Iterator[dict[str, str] | None]:
+    """An environment for git commands that sees every non-ignored change as staged.
+
+    `git add -A` runs against a copy of the index, so the real index is
+    untouched, and the copy's stat data means only changed files are
+    re-hashed. Yields None outside a git checkout.
+    """
+    index = _git(working_dir, "rev-parse", "--git-path", "index")
+    if index.returncode != 0:
+        yield None
+        return
+    with tempfile.TemporaryDirectory(prefix="agent-runner-index-") as tmp:
+        tmp_index = Path(tmp) / "index"
+        real_index = Path(working_dir) / index.stdout.strip()
+        if real_index.exists():
+            shutil.copyfile(real_index, tmp_index)
+        env = {**os.environ, "GIT_INDEX_FILE": str(tmp_index)}
+        yield env if _git(working_dir, "add", "-A", env=env).returncode == 0 else None
+
+
+def tree_hash(working_dir: Path) -> str | None:
+    """Hash of the working tree's content: tracked and untracked, non-ignored files.
+
+    None outside a git checkout.
+    """
+    try:
+        with scratch_index(working_dir) as env:
+            if env is None:
+                return None
+            tree = _git(working_dir, "write-tree", env=env)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        logger.debug("Could not hash the tree at %s: %s", working_dir, e)
+        return None
+    return tree.stdout.strip() if tree.returncode == 0 else None
+
+
+def _git(working_dir: Path, *args: str, env: dict[str, str] | None = None) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        ["git", *args], cwd=str(working_dir), env=env,
+        capture_output=True, text=True, timeout=GIT_TIMEOUT_SECONDS,
+    )
+
+
+class CheckCache:
+    """Results of idempotent check commands, keyed by command and tree hash.
+
+    Shared by every runner, so the reviewer's typecheck of a tree the
+    implementer already checked, in any worktree, is a hit.
+    """
+
+    def __init__(self, max_entries: int = CHECK_CACHE_ENTRIES) -> None:
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, CommandResult] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(command: str, tree: str) -> str:
+        return hashlib.sha256(f"{' '.join(command.split())}\0{tree}".encode()).hexdigest()
+
+    def get(self, key: str) -> CommandResult | None:
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key: str, result: CommandResult) -> None:
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+CHECK_CACHE = CheckCache()
+
+
+def _kill_group(pid: int) -> None:
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _join(threads: list[threading.Thread], timeout: float) -> bool:
+    """Join the threads within one shared timeout; whether they all finished."""
+    deadline = time.monotonic() + timeout
+    for thread in threads:
+        thread.join(max(0.0, deadline - time.monotonic()))
+    return not any(thread.is_alive() for thread in threads)
+
+
+async def _exit_status(proc: asyncio.subprocess.Process) -> int:
+    """The process's exit status, without waiting for its pipes to close.
+
+    Process.wait() also waits for EOF on every pipe, which a background
+    process that inherited stdout can put off until it is killed.
+    """
+    delay = 0.001
+    while proc.returncode is None:
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, EXIT_POLL_SECONDS)
+    return proc.returncode
+
+
+def _pump(stream, buffer: OutputBuffer) -> None:
+    for chunk in iter(lambda: stream.read1(READ_CHUNK_BYTES), b""):
+        buffer.write(chunk)
+
+
+class ShellWorker:
+    """A long-lived bash that runs commands one at a time.
+
+    Each command runs in a subshell of the worker (`( cd dir && eval cmd )`),
+    so it costs a fork instead of a shell exec plus environment setup, and a
+    `cd` or `export` in one command doesn't leak into the next. stdout is
+    read up to a per-worker end marker carrying the exit status; stderr goes
+    through a temporary file. On timeout the whole worker process group is
+    killed and a fresh worker starts with the next command.
+    """
+
+    def __init__(self, working_dir: Path, env: dict[str, str]) -> None:
+        self.working_dir = working_dir
+        self.env = env
+        self.marker = f"__agent_runner_done_{secrets.token_hex(8)}__"
+        self.commands = 0
+        self._proc: subprocess.Popen | None = None
+        self._stderr_path: str | None = None
+        self._lock = threading.Lock()
+
+    def run(self, command: str, timeout: float, limit: int) -> CommandResult:
+        with self._lock:
+            start = time.monotonic()
+            proc = self._ensure_started()
+            stdout, stderr = OutputBuffer(limit), OutputBuffer(limit)
+            script = (
+                f"( cd {shlex.quote(str(self.working_dir))} && eval {shlex.quote(command)} ) "
+                f"</dev/null 2>{shlex.quote(self._stderr_path)}; printf '\\n%s %d\\n' {self.marker} $?\n"
+            )
+            proc.stdin.write(script.encode("utf-8"))
+            proc.stdin.flush()
+            returncode = self._read_until_marker(proc, stdout, start + timeout)
+            with open(self._stderr_path, "rb") as f:
+                _pump(f, stderr)
+            if returncode is None:
+                self._stop()
+            else:
+                self.commands += 1
+            return CommandResult(stdout.text(), stderr.text(), returncode, timeout, time.monotonic() - start)
+
+    def close(self) -> None:
+        with self._lock:
+            self._stop()
+
+    def _ensure_started(self) -> subprocess.Popen:
+        if self._proc is not None and self._proc.poll() is None:
+            return self._proc
+        self._stop()
+        fd, self._stderr_path = tempfile.mkstemp(prefix="agent-runner-stderr-")
+        os.close(fd)
+        self._proc = subprocess.Popen(
+            ["bash", "--noprofile", "--norc"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            cwd=str(self.working_dir), env=self.env, start_new_session=True,
+        )
+        logger.debug("Started shell worker %d for %s", self._proc.pid, self.working_dir)
+        return self._proc
+
+    def _read_until_marker(self, proc: subprocess.Popen, out: OutputBuffer, deadline: float) -> int | None:
+        """Stream stdout into the buffer until the end marker; its exit status, or None on timeout."""
+        sentinel = f"\n{self.marker} ".encode()
+        fd = proc.stdout.fileno()
+        pending = b""
+        while True:
+            end = pending.find(sentinel)
+            if end >= 0:
+                status = pending[end + len(sentinel):]
+                if b"\n" in status:
+                    out.write(pending[:end])
+                    return int(status.split(b"\n", 1)[0])
+            elif len(pending) > len(sentinel):
+                keep = len(pending) - len(sentinel)  # the marker may straddle two reads
+                out.write(pending[:keep])
+                pending = pending[keep:]
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([fd], [], [], remaining)[0]:
+                out.write(pending)
+                return None
+            chunk = os.read(fd, READ_CHUNK_BYTES)
+            if not chunk:  # the worker itself exited; the next command starts a new one
+                out.write(pending)
+                return proc.wait() or 1
+            pending += chunk
+
+    def _stop(self) -> None:
+        if self._proc is not None:
+            _kill_group(self._proc.pid)
+            self._proc.wait()
+            for stream in (self._proc.stdin, self._proc.stdout):
+                stream.close()
+            self._proc = None
+        if self._stderr_path is not None:
+            Path(self._stderr_path).unlink(missing_ok=True)
+            self._stderr_path = None
+
+
+class CommandRunner:
+    """Runs run_command's shell commands in one working tree.
+
+    The timeout is the longest `commands.timeouts` prefix matching the
+    command, else `commands.timeout_seconds`. Output streams into
+    OutputBuffers, so memory stays bounded and a long log keeps its end. A
+    command that times out is killed with its whole process group, which
+    takes down the node or tsc processes npx started too. A command's result
+    is its shell's exit status; background processes still holding its
+    output (`cmd &`) get KILL_GRACE_SECONDS after that, then the group is
+    killed. The sync and async paths both work this way.
+
+    Commands starting with a `commands.cached_commands` prefix are checks
+    whose output only depends on the tree: they are served from
+    CHECK_CACHE while the tree hash is unchanged. A check that changes the
+    tree itself (e.g. `eslint --fix`) is never cached.
+    """
+
+    def __init__(self, working_dir: Path, config: CommandsConfig) -> None:
+        self.working_dir = Path(working_dir)
+        self.config = config
+        self.env = {**os.environ, "PATH": os.environ.get("PATH", "")}
+        self.worker = ShellWorker(self.working_dir, self.env) if config.persistent_worker else None
+
+    def timeout_for(self, command: str) -> float:
+        command = " ".join(command.split())
+        matches = [prefix for prefix in self.config.timeouts if command.startswith(prefix)]
+        return self.config.timeouts[max(matches, key=len)] if matches else self.config.timeout_seconds
+
+    def run(self, command: str) -> CommandResult:
+        key = self._check_key(command)
+        if key is not None:
+            cached = self._cached(command, key)
+            if cached is not None:
+                return cached
+        result = self._execute(command)
+        if key is not None:
+            self._store(command, key, result)
+        return result
+
+    async def arun(self, command: str) -> CommandResult:
+        """Async variant of run; the persistent worker runs in a thread."""
+        if self.worker is not None:
+            return await asyncio.to_thread(self.run, command)
+        key = await asyncio.to_thread(self._check_key, command)
+        if key is not None:
+            cached = self._cached(command, key)
+            if cached is not None:
+                return cached
+        result = await self._aexecute(command)
+        if key is not None:
+            await asyncio.to_thread(self._store, command, key, result)
+        return result
+
+    def _check_key(self, command: str) -> tuple[str, str] | None:
+        """(cache key, tree hash) for a declared check command, else None."""
+        normalized = " ".join(command.split())
+        if not any(normalized.startswith(prefix) for prefix in self.config.cached_commands):
+            return None
+        tree = tree_hash(self.working_dir)
+        return (CHECK_CACHE.key(normalized, tree), tree) if tree else None
+
+    def _cached(self, command: str, key: tuple[str, str]) -> CommandResult | None:
+        result = CHECK_CACHE.get(key[0])
+        if result is not None:
+            logger.info("Check cache hit for `%s` (tree %s, saved %.1fs)", command, key[1][:10], result.seconds)
+        else:
+            logger.info("Check cache miss for `%s` (tree %s)", command, key[1][:10])
+        return result
+
+    def _store(self, command: str, key: tuple[str, str], result: CommandResult) -> None:
+        if result.timed_out:
+            return
+        if tree_hash(self.working_dir) != key[1]:
+            logger.info("`%s` changed the tree; its result is not cached", command)
+            return
+        CHECK_CACHE.put(key[0], result)
+
+    def _execute(self, command: str) -> CommandResult:
+        timeout = self.timeout_for(command)
+        if self.worker is not None:
+            return self.worker.run(command, timeout, self.config.max_output_chars)
+        start = time.monotonic()
+        stdout, stderr = OutputBuffer(self.config.max_output_chars), OutputBuffer(self.config.max_output_chars)
+        proc = subprocess.Popen(
+            command, shell=True, cwd=str(self.working_dir), env=self.env,
+            stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE, start_new_session=True,
+        )
+        pumps = [
+            threading.Thread(target=_pump, args=(proc.stdout, stdout), daemon=True),
+            threading.Thread(target=_pump, args=(proc.stderr, stderr), daemon=True),
+        ]
+        for pump in pumps:
+            pump.start()
+        try:
+            returncode: int | None = proc.wait(timeout)
+        except subprocess.TimeoutExpired:
+            _kill_group(proc.pid)
+            proc.wait()
+            returncode = None
+        if not _join(pumps, KILL_GRACE_SECONDS):
+            self._kill_lingering(command, proc.pid)
+            if not _join(pumps, KILL_GRACE_SECONDS):
+                # Something outside the group holds the pipes: don't close them under a pump's read
+                return CommandResult(stdout.text(), stderr.text(), returncode, timeout, time.monotonic() - start)
+        proc.stdout.close()
+        proc.stderr.close()
+        return CommandResult(stdout.text(), stderr.text(), returncode, timeout, time.monotonic() - start)
+
+    async def _aexecute(self, command: str) -> CommandResult:
+        timeout = self.timeout_for(command)
+        start = time.monotonic()
+        stdout, stderr = OutputBuffer(self.config.max_output_chars), OutputBuffer(self.config.max_output_chars)
+        proc = await asyncio.create_subprocess_shell(
+            command, cwd=str(self.working_dir), env=self.env,
+            stdin=asyncio.subprocess.DEVNULL, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+            start_new_session=True,
+        )
+
+        async def pump(stream: asyncio.StreamReader, buffer: OutputBuffer) -> None:
+            while chunk := await stream.read(READ_CHUNK_BYTES):
+                buffer.write(chunk)
+
+        reading = asyncio.ensure_future(asyncio.gather(pump(proc.stdout, stdout), pump(proc.stderr, stderr)))
+        try:
+            returncode: int | None = await asyncio.wait_for(_exit_status(proc), timeout)
+        except asyncio.TimeoutError:
+            _kill_group(proc.pid)
+            await _exit_status(proc)
+            returncode = None
+        done, _ = await asyncio.wait({reading}, timeout=KILL_GRACE_SECONDS)
+        if not done:
+            self._kill_lingering(command, proc.pid)
+            done, _ = await asyncio.wait({reading}, timeout=KILL_GRACE_SECONDS)
+            if not done:
+                reading.cancel()  # something outside the group holds the pipes
+        return CommandResult(stdout.text(), stderr.text(), returncode, timeout, time.monotonic() - start)
+
+    def _kill_lingering(self, command: str, pgid: int) -> None:
+        logger.info("`%s` left processes holding its output after it exited; killing them", command)
+        _kill_group(pgid)
+
+    def close(self) -> None:
+        if self.worker is not None:
+            if self.worker.commands:
+                logger.debug("Shell worker for %s ran %d commands", self.working_dir, self.worker.commands)
+            self.worker.close()
+
+
+_runners: dict[Path, CommandRunner] = {}
+_runners_lock = threading.Lock()
+
+
+def command_runner(working_dir: Path, config: CommandsConfig) -> CommandRunner:
+    """The shared runner of a working tree, so its shell worker outlives one node."""
+    key = Path(working_dir).resolve()
+    with _runners_lock:
+        runner = _runners.get(key)
+        if runner is None or runner.config != config:
+            if runner is not None:
+                runner.close()
+            runner = _runners[key] = CommandRunner(key, config)
+        return runner
+
+
+def drop_runner(working_dir: Path) -> None:
+    """Close a working tree's runner, e.g. once its worktree is removed."""
+    with _runners_lock:
+        runner = _runners.pop(Path(working_dir).resolve(), None)
+    if runner is not None:
+        runner.close()
+
+
+def close_runners() -> None:
+    """Stop every shell worker; registered on the graph's cleanup."""
+    with _runners_lock:
+        runners = list(_runners.values())
+        _runners.clear()
+    for runner in runners:
+        runner.close()
+    if CHECK_CACHE.hits or CHECK_CACHE.misses:
+        logger.info("Check cache: %d hits, %d misses", CHECK_CACHE.hits, CHECK_CACHE.misses)
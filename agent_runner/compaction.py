@@ -0,0 +1,183 @@
+"""Context-window compaction for long tool-calling transcripts."""
+
+from __future__ import annotations
+
+import json
+import logging
+from typing import Any
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+
+from agent_runner.config import CompactionConfig
+from agent_runner.tools import FILE_CACHE
+
+logger = logging.getLogger("agent_runner")
+
+# Tools whose output describes a file, and tools that change it
+FILE_READ_TOOLS = frozenset({"read_file"})
+FILE_WRITE_TOOLS = frozenset({"write_file", "edit_file"})
+SUMMARY_MARKER = "compaction_summary"
+
+
+def estimate_tokens(messages: list[BaseMessage]) -> int:
+    """Rough token count (~4 chars per token), including tool-call arguments."""
+    chars = 0
+    for m in messages:
+        chars += len(m.content) if isinstance(m.content, str) else len(json.dumps(m.content))
+        if isinstance(m, AIMessage) and m.tool_calls:
+            chars += sum(len(json.dumps(tc["args"])) for tc in m.tool_calls)
+    return chars // 4
+
+
+def pinned_prefix(messages: list[BaseMessage]) -> int:
+    """Length of the leading prompt/task/spec block: everything before the first AI turn or summary."""
+    return next(
+        (i for i, m in enumerate(messages) if isinstance(m, AIMessage) or m.additional_kwargs.get(SUMMARY_MARKER)),
+        len(messages),
+    )
+
+
+def _target(tool_call: dict[str, Any]) -> str | None:
+    """The file or command a tool call is about, for staleness checks."""
+    args = tool_call.get("args", {})
+    if tool_call["name"] in FILE_READ_TOOLS | FILE_WRITE_TOOLS:
+        return f"file:{args.get('file_path')}"
+    if tool_call["name"] == "run_command":
+        return f"command:{args.get('command', '').strip()}"
+    return None
+
+
+def _touch_key(tool_call: dict[str, Any]) -> str | None:
+    """What a later call must repeat to supersede this one: reads of a file also need the same line range."""
+    target = _target(tool_call)
+    if target and tool_call["name"] in FILE_READ_TOOLS:
+        args = tool_call.get("args", {})
+        return f"{target}#{args.get('offset', 1)}:{args.get('limit')}"
+    return target
+
+
+def _changed_on_disk(message: ToolMessage) -> bool:
+    """A read whose file no longer has the (mtime_ns, size) it was read at, however it changed."""
+    artifact = message.artifact if isinstance(message.artifact, dict) else {}
+    if "signature" not in artifact:
+        return False
+    current = FILE_CACHE.signature(artifact["path"])
+    return current is None or list(current) != list(artifact["signature"])
+
+
+def _elide_stale(messages: list[BaseMessage], pinned: int, config: CompactionConfig) -> list[BaseMessage]:
+    """Replace outputs superseded by a later call on the same file (range) or command, or by an edit.
+
+    Reads are also stale once their file changed on disk by other means,
+    e.g. a formatter run through run_command.
+    """
+    calls: dict[str, dict[str, Any]] = {}
+    last_touch: dict[str, int] = {}
+    for i, m in enumerate(messages):
+        if isinstance(m, AIMessage):
+            for tc in m.tool_calls:
+                calls[tc["id"]] = tc
+                key = _touch_key(tc)
+                if key:
+                    last_touch[key] = i
+
+    result = list(messages)
+    for i, m in enumerate(messages[pinned:], start=pinned):
+        if not isinstance(m, ToolMessage) or len(m.content) < config.min_elide_chars:
+            continue
+        tc = calls.get(m.tool_call_id)
+        if tc is None or tc["name"] in FILE_WRITE_TOOLS:
+            continue
+        target = _target(tc)
+        if target and max(last_touch.get(target, -1), last_touch.get(_touch_key(tc), -1)) > i:
+            what = target.split(":", 1)[1]
+            result[i] = ToolMessage(
+                content=f"[stale {tc['name']} output for {what} elided; a later call re-read, edited or re-ran it]",
+                tool_call_id=m.tool_call_id,
+                id=m.id,
+            )
+        elif tc["name"] in FILE_READ_TOOLS and _changed_on_disk(m):
+            result[i] = ToolMessage(
+                content=f"[stale {tc['name']} output for {target.split(':', 1)[1]} elided; "
+                        f"the file has changed since, read it again if needed]",
+                tool_call_id=m.tool_call_id,
+                id=m.id,
+            )
+    return result
+
+
+def _describe_round(ai: AIMessage, outputs: list[ToolMessage]) -> str:
+    results = {m.tool_call_id: m.content for m in outputs}
+    parts = []
+    for tc in ai.tool_calls:
+        target = _target(tc)
+        label = target.split(":", 1)[1] if target else ", ".join(f"{k}={v!r}"[:60] for k, v in tc["args"].items())
+        first_line = str(results.get(tc["id"], "")).strip().split("\n", 1)[0][:120]
+        parts.append(f"{tc['name']}({label}) -> {first_line}")
+    text = ai.content if isinstance(ai.content, str) else ""
+    note = f" Note: {text.strip()[:200]}" if text.strip() else ""
+    return "; ".join(parts) + note
+
+
+def _summarize_old_rounds(
+    messages: list[BaseMessage], pinned: int, config: CompactionConfig,
+) -> list[BaseMessage]:
+    """Fold rounds older than keep_recent_rounds into one summary message.
+
+    Whole rounds (an AI message plus its tool results) are removed together,
+    so every remaining tool result still follows its tool call.
+    """
+    head = messages[:pinned]
+    body = messages[pinned:]
+
+    summary_lines: list[str] = []
+    if body and isinstance(body[0], HumanMessage) and body[0].additional_kwargs.get(SUMMARY_MARKER):
+        summary_lines = body[0].content.split("\n")[1:]
+        body = body[1:]
+
+    round_starts = [i for i, m in enumerate(body) if isinstance(m, AIMessage)]
+    if len(round_starts) <= config.keep_recent_rounds:
+        return messages
+    cut = round_starts[-config.keep_recent_rounds] if config.keep_recent_rounds else len(body)
+
+    i = 0
+    while i < cut:
+        m = body[i]
+        if isinstance(m, AIMessage):
+            j = i + 1
+            outputs = []
+            while j < cut and isinstance(body[j], ToolMessage):
+                outputs.append(body[j])
+                j += 1
+            summary_lines.append(f"- {_describe_round(m, outputs)}")
+            i = j
+        else:
+            text = m.content if isinstance(m.content, str) else ""
+            summary_lines.append(f"- (message) {text.strip()[:200]}")
+            i += 1
+
+    summary = HumanMessage(
+        content="Summary of earlier rounds (compacted to save context):\n" + "\n".join(summary_lines),
+        additional_kwargs={SUMMARY_MARKER: True},
+    )
+    return head + [summary] + body[cut:]
+
+
+def compact_messages(
+    messages: list[BaseMessage], *, pinned: int, config: CompactionConfig,
+) -> tuple[list[BaseMessage], int]:
+    """Shrink a transcript to the token budget; returns (messages, tokens saved).
+
+    The first `pinned` messages (system prompt, task and spec) are never
+    touched. Stale tool outputs are elided first; if the estimate is still
+    over budget, old rounds are replaced by a one-line-per-round summary.
+    """
+    if not config.enabled:
+        return messages, 0
+
+    before = estimate_tokens(messages)
+    compacted = _elide_stale(messages, pinned, config)
+    if estimate_tokens(compacted) > config.token_budget:
+        compacted = _summarize_old_rounds(compacted, pinned, config)
+    saved = before - estimate_tokens(compacted)
+    return compacted, saved
@@ -3,7 +3,7 @@
 from __future__ import annotations
 
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
 
 import yaml
@@ -16,6 +16,113 @@ class ModelConfig:
     model: str
 
 
+@dataclass
+class Price:
+    """USD per million tokens."""
+
+    input: float = 0.0
+    output: float = 0.0
+    cache_read: float | None = None  # Defaults to the input price
+    cache_write: float | None = None  # Defaults to the input price
+
+
+@dataclass
+class BudgetConfig:
+    task_usd: float | None = None
+    run_usd: float | None = None
+    on_task_exceeded: str = "downgrade"  # downgrade | stop
+    on_run_exceeded: str = "stop"  # downgrade | stop
+    downgrade_model: ModelConfig | None = None
+
+
+@dataclass
+class RoutingConfig:
+    enabled: bool = False
+    agents: list[str] = field(default_factory=lambda: ["implementer", "reviewer"])
+    tiers: list[ModelConfig] = field(default_factory=list)  # cheapest first
+    thresholds: list[float] = field(default_factory=lambda: [4.0])  # difficulty where each next tier starts
+    spec_chars_per_point: int = 4000  # Spec size that adds as much difficulty as one deliverable
+    hard_phases: list[str] = field(default_factory=list)  # Phases (substring match) that start on the top tier
+    escalate_after_tool_errors: int = 3
+    min_samples: int = 5  # Reviews of a tier before its approval rate is trusted
+    min_success_rate: float = 0.5  # Tiers approved less often than this are skipped at task start
+
+
+@dataclass
+class RepoMapConfig:
+    enabled: bool = True
+    max_files: int = 25  # Files listed in the implementer's repo map
+
+
+@dataclass
+class CommandsConfig:
+    timeout_seconds: int = 120
+    timeouts: dict[str, int] = field(default_factory=dict)  # command prefix -> seconds; the longest match wins
+    max_output_chars: int = 30000  # Per stream; the head and tail are kept
+    persistent_worker: bool = False  # Run commands in a long-lived bash instead of a new shell each
+    cached_commands: list[str] = field(default_factory=list)  # Prefixes of checks whose output depends only on the tree
+
+
+@dataclass
+class DiagnosticsConfig:
+    enabled: bool = False
+    tsc_command: str = "npx tsc --noEmit --watch --preserveWatchOutput --pretty false"  # Empty: no typecheck
+    eslint: bool = True
+    node: str = "node"
+    timeout_seconds: int = 120  # Longest wait for a build or lint, including the first, cold one
+    settle_seconds: float = 1.5  # How long a change may take to start a tsc rebuild before results count as current
+
+
+@dataclass
+class GateConfig:
+    enabled: bool = False
+    checks: list[str] = field(default_factory=list)  # Commands that must pass; {files} is replaced by the changed source files
+    forbidden_patterns: dict[str, str] = field(default_factory=dict)  # regex -> reason, matched against added lines
+    pattern_suffixes: list[str] = field(default_factory=lambda: [".ts", ".tsx"])
+    max_output_chars: int = 4000  # Of each failing check's output, in the feedback to the implementer
+
+
+@dataclass
+class ReviewConfig:
+    bundle: bool = True  # Put the changed-file list and the diff in the reviewer's first message
+    diff_context: int = 3  # Context lines around each change
+    max_file_chars: int = 12000  # Of one file's diff; the rest is cut
+    token_budget: int = 20000  # Estimated tokens for all the diffs; files past it are only listed
+
+
+@dataclass
+class CircuitBreakerConfig:
+    window_seconds: int = 300
+    min_calls: int = 3
+    failure_rate: float = 0.5
+    cooldown_seconds: int = 120
+    max_cooldown_seconds: int = 900
+    probe_in_background: bool = True
+
+
+@dataclass
+class CompactionConfig:
+    enabled: bool = True
+    token_budget: int = 60000  # Estimated prompt tokens to stay under
+    keep_recent_rounds: int = 4  # Most recent LLM rounds that are never summarized
+    min_elide_chars: int = 400  # Tool outputs shorter than this are left alone
+
+
+@dataclass
+class CacheConfig:
+    mode: str = "off"  # off | record | replay
+    dir: Path | None = None  # Defaults to <checkpoint_dir>/llm_cache
+    max_size_mb: int = 512
+
+
+@dataclass
+class HedgeConfig:
+    budgets: dict[str, int] = field(default_factory=dict)  # agent -> max hedged calls per run; unlisted = off
+    percentile: float = 0.9  # Hedge once the primary is slower than this share of its recent calls
+    min_samples: int = 5  # Until then, hedge after default_delay_seconds
+    default_delay_seconds: float = 3.0
+
+
 @dataclass
 class Config:
     project_dir: Path
@@ -29,6 +136,25 @@ class Config:
     fallback_wait_seconds: int
     request_timeout_seconds: int
     allowed_commands: list[str]
+    commands: CommandsConfig = field(default_factory=CommandsConfig)
+    diagnostics: DiagnosticsConfig = field(default_factory=DiagnosticsConfig)
+    gate: GateConfig = field(default_factory=GateConfig)
+    review: ReviewConfig = field(default_factory=ReviewConfig)
+    circuit_breaker: CircuitBreakerConfig = field(default_factory=CircuitBreakerConfig)
+    compaction: CompactionConfig = field(default_factory=CompactionConfig)
+    llm_cache: CacheConfig = field(default_factory=CacheConfig)
+    prompt_caching: bool = True
+    streaming: bool = False
+    hedging: HedgeConfig = field(default_factory=HedgeConfig)
+    pricing: dict[str, Price] = field(default_factory=dict)  # "provider/model" -> price
+    budgets: BudgetConfig = field(default_factory=BudgetConfig)
+    routing: RoutingConfig = field(default_factory=RoutingConfig)
+    repo_map: RepoMapConfig = field(default_factory=RepoMapConfig)
+    backoff_base_seconds: float = 2.0
+    max_retry_rounds: int = 3
+    planner_llm_tiebreak: bool = False
+    max_parallel_tasks: int = 1
+    worktree_dir: Path = Path("~/.claude/tasks/lomito/worktrees").expanduser()
 
     @classmethod
     def load(cls, config_path: str | Path | None = None) -> Config:
@@ -63,6 +189,21 @@ class Config:
 
         retry = raw.get("retry", {})
         tools = raw.get("tools", {})
+        breaker = raw.get("circuit_breaker", {})
+        parallel = raw.get("parallel", {})
+        planner = raw.get("planner", {})
+        compaction = raw.get("compaction", {})
+        llm_cache = raw.get("llm_cache", {})
+        prompt_cache = raw.get("prompt_cache", {})
+        streaming = raw.get("streaming", {})
+        hedging = raw.get("hedging", {})
+        budgets = raw.get("budgets", {})
+        downgrade = budgets.get("downgrade_model")
+        routing = raw.get("routing", {})
+        repo_map = raw.get("repo_map", {})
+        diagnostics = raw.get("diagnostics", {})
+        gate = raw.get("gate", {})
+        review = raw.get("review", {})
 
         return cls(
             project_dir=project_dir,
@@ -76,4 +217,89 @@ class Config:
             fallback_wait_seconds=retry.get("fallback_wait_seconds", 60),
             request_timeout_seconds=retry.get("request_timeout_seconds", 120),
             allowed_commands=tools.get("allowed_commands", []),
+            commands=CommandsConfig(
+                timeout_seconds=tools.get("command_timeout_seconds", 120),
+                timeouts=dict(tools.get("command_timeouts") or {}),
+                max_output_chars=tools.get("max_output_chars", 30000),
+                persistent_worker=tools.get("persistent_worker", False),
+                cached_commands=list(tools.get("cached_commands") or []),
+            ),
+            diagnostics=DiagnosticsConfig(
+                enabled=diagnostics.get("enabled", False),
+                tsc_command=diagnostics.get("tsc_command", DiagnosticsConfig.tsc_command),
+                eslint=diagnostics.get("eslint", True),
+                node=diagnostics.get("node", "node"),
+                timeout_seconds=diagnostics.get("timeout_seconds", 120),
+                settle_seconds=diagnostics.get("settle_seconds", 1.5),
+            ),
+            gate=GateConfig(
+                enabled=gate.get("enabled", False),
+                checks=list(gate.get("checks") or []),
+                forbidden_patterns=dict(gate.get("forbidden_patterns") or {}),
+                pattern_suffixes=list(gate.get("pattern_suffixes") or [".ts", ".tsx"]),
+                max_output_chars=gate.get("max_output_chars", 4000),
+            ),
+            review=ReviewConfig(
+                bundle=review.get("bundle", True),
+                diff_context=review.get("diff_context", 3),
+                max_file_chars=review.get("max_file_chars", 12000),
+                token_budget=review.get("token_budget", 20000),
+            ),
+            backoff_base_seconds=retry.get("backoff_base_seconds", 2.0),
+            max_retry_rounds=retry.get("max_retry_rounds", 3),
+            planner_llm_tiebreak=planner.get("llm_tiebreak", False),
+            max_parallel_tasks=parallel.get("max_tasks", 1),
+            worktree_dir=Path(os.path.expanduser(
+                parallel.get("worktree_dir") or checkpoint_dir / "worktrees"
+            )),
+            circuit_breaker=CircuitBreakerConfig(
+                window_seconds=breaker.get("window_seconds", 300),
+                min_calls=breaker.get("min_calls", 3),
+                failure_rate=breaker.get("failure_rate", 0.5),
+                cooldown_seconds=breaker.get("cooldown_seconds", 120),
+                max_cooldown_seconds=breaker.get("max_cooldown_seconds", 900),
+                probe_in_background=breaker.get("probe_in_background", True),
+            ),
+            compaction=CompactionConfig(
+                enabled=compaction.get("enabled", True),
+                token_budget=compaction.get("token_budget", 60000),
+                keep_recent_rounds=compaction.get("keep_recent_rounds", 4),
+                min_elide_chars=compaction.get("min_elide_chars", 400),
+            ),
+            prompt_caching=prompt_cache.get("enabled", True),
+            streaming=streaming.get("enabled", False),
+            pricing={key: Price(**price) for key, price in (raw.get("pricing") or {}).items()},
+            budgets=BudgetConfig(
+                task_usd=budgets.get("task_usd"),
+                run_usd=budgets.get("run_usd"),
+                on_task_exceeded=budgets.get("on_task_exceeded", "downgrade"),
+                on_run_exceeded=budgets.get("on_run_exceeded", "stop"),
+                downgrade_model=ModelConfig(*downgrade.split("/", 1)) if downgrade else None,
+            ),
+            repo_map=RepoMapConfig(
+                enabled=repo_map.get("enabled", True),
+                max_files=repo_map.get("max_files", 25),
+            ),
+            routing=RoutingConfig(
+                enabled=routing.get("enabled", False),
+                agents=list(routing.get("agents", ["implementer", "reviewer"])),
+                tiers=[ModelConfig(*tier.split("/", 1)) for tier in routing.get("tiers", [])],
+                thresholds=[float(t) for t in routing.get("thresholds", [4.0])],
+                spec_chars_per_point=routing.get("spec_chars_per_point", 4000),
+                hard_phases=list(routing.get("hard_phases") or []),
+                escalate_after_tool_errors=routing.get("escalate_after_tool_errors", 3),
+                min_samples=routing.get("min_samples", 5),
+                min_success_rate=routing.get("min_success_rate", 0.5),
+            ),
+            hedging=HedgeConfig(
+                budgets=dict(hedging.get("budgets") or {}),
+                percentile=hedging.get("percentile", 0.9),
+                min_samples=hedging.get("min_samples", 5),
+                default_delay_seconds=hedging.get("default_delay_seconds", 3.0),
+            ),
+            llm_cache=CacheConfig(
+                mode=llm_cache.get("mode", "off"),
+                dir=Path(os.path.expanduser(llm_cache["dir"])) if llm_cache.get("dir") else None,
+                max_size_mb=llm_cache.get("max_size_mb", 512),
+            ),
         )
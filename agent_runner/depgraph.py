@@ -0,0 +1,156 @@
+"""Incremental dependency tracking: in-degree counters and a ready heap."""
+
+from __future__ import annotations
+
+import heapq
+import logging
+
+from agent_runner.scheduler import TaskRank, rank_tasks, top_ties
+from agent_runner.state import Task
+
+logger = logging.getLogger("agent_runner")
+
+
+class DependencyError(ValueError):
+    """Raised when the task plan contains a dependency cycle."""
+
+
+class DependencyGraph:
+    """Tracks which pending tasks are ready as tasks get done.
+
+    Built once per task list in O(tasks + deps); afterwards mark() updates
+    in-degrees of the finished task's dependents only, and ready tasks sit
+    in a heap ordered by scheduler rank. Nodes share one instance and call
+    sync() with the state they were given, which rebuilds only when the
+    task list itself changes (e.g. after resuming from a checkpoint).
+    """
+
+    def __init__(self, tasks: list[Task] | None = None, status: dict[str, str] | None = None) -> None:
+        self._tasks: list[Task] | None = None
+        self.by_id: dict[str, Task] = {}
+        self.status: dict[str, str] = {}
+        self.ranks: dict[str, TaskRank] = {}
+        self.missing: dict[str, list[str]] = {}  # task_id -> unknown dependency ids
+        self.cycle: list[str] = []  # task ids that sit on (or behind) a dependency cycle
+        self.topo_index: dict[str, int] = {}
+        self._dependents: dict[str, list[str]] = {}
+        self._in_degree: dict[str, int] = {}
+        self._heap: list[tuple[tuple[int, int, int, int], str]] = []
+        if tasks is not None:
+            self.load(tasks, status or {})
+
+    def load(self, tasks: list[Task], status: dict[str, str]) -> None:
+        """Build the graph from scratch."""
+        self._tasks = tasks
+        self.by_id = {t.id: t for t in tasks}
+        self.status = {t.id: status.get(t.id, "pending") for t in tasks}
+        self.ranks = rank_tasks(tasks, self.status)
+        self.missing = {}
+        self._dependents = {t.id: [] for t in tasks}
+        self._in_degree = {}
+
+        for task in tasks:
+            unknown = [d for d in task.depends_on if d not in self.by_id]
+            if unknown:
+                self.missing[task.id] = unknown
+            for dep in task.depends_on:
+                if dep in self.by_id:
+                    self._dependents[dep].append(task.id)
+            # Unknown dependencies can never complete, so they stay counted
+            self._in_degree[task.id] = sum(
+                1 for d in task.depends_on if self.status.get(d) != "done"
+            )
+
+        self._find_cycle(tasks)
+        self._heap = [
+            (self.ranks[tid].key, tid) for tid, deg in self._in_degree.items()
+            if deg == 0 and self.status[tid] == "pending"
+        ]
+        heapq.heapify(self._heap)
+
+    def sync(self, tasks: list[Task], status: dict[str, str]) -> DependencyGraph:
+        """Make sure the graph describes this task list; cheap when it already does."""
+        if self._tasks is not tasks:
+            logger.debug("Building dependency graph for %d tasks", len(tasks))
+            self.load(tasks, status)
+        return self
+
+    def check(self) -> None:
+        """Raise DependencyError if the plan has a cycle."""
+        if self.cycle:
+            raise DependencyError(f"Dependency cycle among tasks: {', '.join(self.cycle)}")
+
+    def mark(self, task_id: str, status: str) -> None:
+        """Record a status change; newly unblocked dependents join the ready heap."""
+        previous = self.status.get(task_id)
+        if previous is None or previous == status:
+            return
+        self.status[task_id] = status
+        if status == "pending" and self._in_degree[task_id] == 0:
+            heapq.heappush(self._heap, (self.ranks[task_id].key, task_id))
+        if status != "done" and previous != "done":
+            return
+
+        delta = -1 if status == "done" else 1
+        for dependent in self._dependents[task_id]:
+            self._in_degree[dependent] += delta
+            if self._in_degree[dependent] == 0 and self.status[dependent] == "pending":
+                heapq.heappush(self._heap, (self.ranks[dependent].key, dependent))
+
+    def ready(self, limit: int | None = None) -> list[Task]:
+        """Pending tasks with every dependency done, best-ranked first."""
+        self._compact()
+        entries = [e for e in self._heap if self._is_ready(e[1])]
+        if limit is None:
+            entries.sort()
+        else:
+            entries = heapq.nsmallest(limit, entries)
+        return [self.by_id[tid] for _, tid in entries]
+
+    def next_with_ties(self) -> tuple[Task | None, list[Task]]:
+        """The best ready task and every ready task tied with it on rank."""
+        ordered = self.ready()
+        if not ordered:
+            return None, []
+        return ordered[0], top_ties(ordered, self.ranks)
+
+    def blocked(self) -> list[Task]:
+        """Pending tasks still waiting on at least one dependency."""
+        return [
+            self.by_id[tid] for tid, deg in self._in_degree.items()
+            if deg > 0 and self.status[tid] == "pending"
+        ]
+
+    def pending(self) -> list[Task]:
+        return [self.by_id[tid] for tid, s in self.status.items() if s == "pending"]
+
+    def _is_ready(self, task_id: str) -> bool:
+        return self._in_degree[task_id] == 0 and self.status[task_id] == "pending"
+
+    def _compact(self) -> None:
+        """Drop stale heap entries from the top (lazy deletion)."""
+        while self._heap and not self._is_ready(self._heap[0][1]):
+            heapq.heappop(self._heap)
+        if len(self._heap) > 2 * len(self.status) + 16:
+            self._heap = [e for e in set(self._heap) if self._is_ready(e[1])]
+            heapq.heapify(self._heap)
+
+    def _find_cycle(self, tasks: list[Task]) -> None:
+        """Kahn's algorithm over known edges; whatever is left over is cyclic.
+
+        Also records a topological order that follows document order where
+        the dependencies allow it.
+        """
+        order = {t.id: i for i, t in enumerate(tasks)}
+        degree = {t.id: len({d for d in t.depends_on if d in self.by_id}) for t in tasks}
+        queue = [(order[tid], tid) for tid, deg in degree.items() if deg == 0]
+        heapq.heapify(queue)
+        self.topo_index = {}
+        while queue:
+            _, tid = heapq.heappop(queue)
+            self.topo_index[tid] = len(self.topo_index)
+            for dependent in set(self._dependents[tid]):
+                degree[dependent] -= 1
+                if degree[dependent] == 0:
+                    heapq.heappush(queue, (order[dependent], dependent))
+        self.cycle = [t.id for t in tasks if t.id not in self.topo_index]
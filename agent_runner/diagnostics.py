@@ -0,0 +1,362 @@
+"""Warm typecheck and lint: a background `tsc --watch` and a resident ESLint, queried per file."""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+import select
+import signal
+import subprocess
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from agent_runner.config import DiagnosticsConfig
+
+logger = logging.getLogger("agent_runner")
+
+LINT_SUFFIXES = (".ts", ".tsx", ".js", ".jsx", ".mjs", ".cjs")
+MAX_DIAGNOSTICS = 200
+
+_TSC_DIAGNOSTIC = re.compile(
+    r"^(?P<path>[^\s(][^(]*)\((?P<line>\d+),(?P<col>\d+)\): (?P<severity>error|warning) (?P<code>TS\d+): (?P<message>.*)$"
+)
+_TSC_CYCLE_START = re.compile(r"Starting (?:compilation in watch mode|incremental compilation)")
+_TSC_CYCLE_DONE = re.compile(r"Found \d+ errors?\. Watching for file changes")
+
+# Serves lint requests over stdin/stdout, one JSON object per line, with the
+# project's own ESLint (resolved from the working tree) loaded once.
+_ESLINT_SERVER = r"""
+const readline = require("readline");
+const { ESLint } = require(require.resolve("eslint", { paths: [process.cwd()] }));
+const eslint = new ESLint({ cwd: process.cwd() });
+const rl = readline.createInterface({ input: process.stdin });
+rl.on("line", async (line) => {
+  const { id, files } = JSON.parse(line);
+  try {
+    const results = await eslint.lintFiles(files);
+    const messages = results.flatMap((r) =>
+      r.messages.map((m) => ({ path: r.filePath, line: m.line || 0, col: m.column || 0,
+                               severity: m.severity === 2 ? "error" : "warning",
+                               code: m.ruleId || "eslint", message: m.message })));
+    process.stdout.write(JSON.stringify({ id, messages }) + "\n");
+  } catch (e) {
+    process.stdout.write(JSON.stringify({ id, error: String(e && e.message || e) }) + "\n");
+  }
+});
+process.stdout.write(JSON.stringify({ ready: true }) + "\n");
+"""
+
+
+@dataclass(frozen=True)
+class Diagnostic:
+    path: str
+    line: int
+    col: int
+    severity: str  # error | warning
+    code: str  # TS2322, or the ESLint rule id
+    message: str
+
+    def describe(self) -> str:
+        return f"{self.path}:{self.line}:{self.col} - {self.severity} {self.code}: {self.message}"
+
+
+def _start(cmd: list[str] | str, cwd: Path, *, stdin: int | None = None) -> subprocess.Popen:
+    return subprocess.Popen(
+        cmd, shell=isinstance(cmd, str), cwd=str(cwd), stdin=stdin,
+        stdout=subprocess.PIPE, stderr=subprocess.STDOUT, start_new_session=True,
+    )
+
+
+def _stop(proc: subprocess.Popen | None) -> None:
+    if proc is None or proc.poll() is not None:
+        return
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+    proc.wait()
+
+
+class TscWatcher:
+    """A `tsc --watch` whose latest diagnostics are parsed from its output.
+
+    tsc rebuilds incrementally on every file change, so after the first
+    full build a query only waits for the last change's rebuild, usually a
+    fraction of a second.
+    """
+
+    def __init__(self, working_dir: Path, command: str) -> None:
+        self.working_dir = working_dir
+        self.command = command
+        self.cycles = 0
+        self.compiling = False
+        self.built_from = 0.0  # wall-clock start of the last completed build: it saw changes up to then
+        self._cycle_started = 0.0
+        self.exited: str | None = None  # tsc's last output, if it died
+        self._diagnostics: list[Diagnostic] = []
+        self._pending: list[Diagnostic] = []
+        self._tail: list[str] = []
+        self._proc: subprocess.Popen | None = None
+        self._changed = threading.Condition()
+
+    def start(self) -> None:
+        self._proc = _start(self.command, self.working_dir)
+        threading.Thread(target=self._read, args=(self._proc,), name="tsc-watch", daemon=True).start()
+        logger.info("Started `%s` in %s", self.command, self.working_dir)
+
+    def close(self) -> None:
+        _stop(self._proc)
+
+    def diagnostics(self, since: float, *, timeout: float, settle: float) -> list[Diagnostic] | None:
+        """Diagnostics of a build that saw every change up to `since` (a wall-clock time).
+
+        Waits for the build that started after the change or, if none has,
+        for one to start within `settle` seconds: tsc ignores changes to
+        files outside the program, so none may come. None on timeout.
+        """
+        deadline = time.monotonic() + timeout
+        quiet_until = max(since, time.time()) + settle
+        with self._changed:
+            while True:
+                if self.exited is not None:
+                    raise RuntimeError(f"tsc --watch exited: {self.exited}")
+                if self.cycles and not self.compiling and (self.built_from >= since or time.time() >= quiet_until):
+                    return list(self._diagnostics)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                wait = remaining if self.compiling or not self.cycles else min(remaining, quiet_until - time.time())
+                self._changed.wait(max(wait, 0.01))
+
+    def _read(self, proc: subprocess.Popen) -> None:
+        for raw in iter(proc.stdout.readline, b""):
+            line = raw.decode("utf-8", errors="replace").rstrip()
+            self._tail = (self._tail + [line])[-20:]
+            with self._changed:
+                self._handle(line)
+        with self._changed:
+            self.exited = "\n".join(self._tail) or f"exit code {proc.wait()}"
+            self._changed.notify_all()
+
+    def _handle(self, line: str) -> None:
+        if _TSC_CYCLE_START.search(line):
+            self.compiling = True
+            self._cycle_started = time.time()
+            self._pending = []
+            self._changed.notify_all()
+        elif _TSC_CYCLE_DONE.search(line):
+            self._diagnostics, self._pending = self._pending, []
+            self.compiling = False
+            self.cycles += 1
+            self.built_from = self._cycle_started
+            self._changed.notify_all()
+        elif match := _TSC_DIAGNOSTIC.match(line):
+            self._pending.append(Diagnostic(
+                os.path.normpath(match["path"]), int(match["line"]), int(match["col"]),
+                match["severity"], match["code"], match["message"],
+            ))
+        elif line.startswith("  ") and self._pending:
+            last = self._pending[-1]  # a wrapped message continues on indented lines
+            self._pending[-1] = Diagnostic(
+                last.path, last.line, last.col, last.severity, last.code, f"{last.message} {line.strip()}",
+            )
+
+
+class EslintServer:
+    """A node process holding one ESLint instance, so plugins and parsers load once."""
+
+    def __init__(self, working_dir: Path, node: str = "node") -> None:
+        self.working_dir = working_dir
+        self.node = node
+        self._proc: subprocess.Popen | None = None
+        self._buffer = b""
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def lint(self, files: list[str], timeout: float) -> list[Diagnostic]:
+        with self._lock:
+            deadline = time.monotonic() + timeout
+            if self._proc is None or self._proc.poll() is not None:
+                self._proc = _start([self.node, "-e", _ESLINT_SERVER], self.working_dir, stdin=subprocess.PIPE)
+                self._buffer = b""
+                self._reply(deadline)  # {"ready": true} once ESLint is loaded
+            self._next_id += 1
+            request = {"id": self._next_id, "files": files}
+            self._proc.stdin.write((json.dumps(request) + "\n").encode())
+            self._proc.stdin.flush()
+            while True:
+                reply = self._reply(deadline)
+                if reply.get("id") == self._next_id:
+                    break
+        if "error" in reply:
+            raise RuntimeError(f"ESLint: {reply['error']}")
+        return [
+            Diagnostic(_relative(m["path"], self.working_dir), m["line"], m["col"], m["severity"], m["code"], m["message"])
+            for m in reply["messages"]
+        ]
+
+    def close(self) -> None:
+        with self._lock:
+            _stop(self._proc)
+            self._proc = None
+
+    def _reply(self, deadline: float) -> dict:
+        """The next JSON line from the server; anything else it prints is skipped."""
+        fd = self._proc.stdout.fileno()
+        skipped: list[str] = []
+        while True:
+            while b"\n" in self._buffer:
+                line, self._buffer = self._buffer.split(b"\n", 1)
+                try:
+                    reply = json.loads(line)
+                except ValueError:
+                    skipped.append(line.decode("utf-8", errors="replace"))
+                    continue
+                if isinstance(reply, dict):
+                    return reply
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([fd], [], [], remaining)[0]:
+                _stop(self._proc)
+                raise TimeoutError("ESLint server did not answer in time")
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                output = "\n".join(skipped[:8]) or f"exit code {self._proc.wait()}"
+                raise RuntimeError(f"ESLint server exited: {output}")
+            self._buffer += chunk
+
+
+def _relative(path: str, working_dir: Path) -> str:
+    try:
+        return os.path.relpath(path, working_dir) if os.path.isabs(path) else os.path.normpath(path)
+    except ValueError:
+        return path
+
+
+def changed_files(working_dir: Path) -> list[str]:
+    """Files added or modified against HEAD, including untracked ones (deleted files are left out)."""
+    result = subprocess.run(
+        ["git", "status", "--porcelain=v1", "-z", "--untracked-files=all"],
+        cwd=str(working_dir), capture_output=True, text=True, timeout=60,
+    )
+    if result.returncode != 0:
+        return []
+    entries = result.stdout.split("\0")
+    files = []
+    i = 0
+    while i < len(entries):
+        entry = entries[i]
+        i += 1
+        if len(entry) < 4:
+            continue
+        status, path = entry[:2], entry[3:]
+        if "R" in status or "C" in status:
+            i += 1  # the entry after a rename is its old path
+        if "D" not in status:
+            files.append(path)
+    return files
+
+
+class DiagnosticsDaemon:
+    """Typecheck and lint diagnostics of one working tree, from warm background processes.
+
+    tsc --watch starts on the first check and ESLint on the first lint
+    request. Both live until the run's cleanup (or the worktree's removal).
+    """
+
+    def __init__(self, working_dir: Path, config: DiagnosticsConfig) -> None:
+        self.working_dir = Path(working_dir)
+        self.config = config
+        self.tsc = TscWatcher(self.working_dir, config.tsc_command) if config.tsc_command else None
+        self.eslint = EslintServer(self.working_dir, config.node) if config.eslint else None
+        self._started = False
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            if self.tsc is not None:
+                self.tsc.start()
+
+    def check(self, files: list[str] | None = None) -> str:
+        """Diagnostics for the given files (default: the files changed against HEAD), one per line."""
+        self.start()
+        # tsc and ESLint report paths relative to the tree, so requested ones must be too
+        files = [_relative(f, self.working_dir) for f in files] if files else changed_files(self.working_dir)
+        files = [f for f in files if (self.working_dir / f).is_file()]
+        if not files:
+            return "No changed files to check."
+        started = time.monotonic()
+        found: list[Diagnostic] = []
+        notes: list[str] = []
+
+        if self.tsc is not None:
+            since = max((self.working_dir / f).stat().st_mtime for f in files)
+            diagnostics = self.tsc.diagnostics(
+                since, timeout=self.config.timeout_seconds, settle=self.config.settle_seconds,
+            )
+            if diagnostics is None:
+                notes.append(f"tsc did not finish a build within {self.config.timeout_seconds}s; no type errors shown")
+            else:
+                wanted = set(files)
+                found.extend(d for d in diagnostics if d.path in wanted)
+                others = sum(1 for d in diagnostics if d.path not in wanted and d.severity == "error")
+                if others:
+                    notes.append(f"{others} type errors in other files")
+
+        lintable = [f for f in files if f.endswith(LINT_SUFFIXES)]
+        if self.eslint is not None and lintable:
+            found.extend(self.eslint.lint(lintable, self.config.timeout_seconds))
+
+        logger.debug("Diagnostics for %d files in %.2fs", len(files), time.monotonic() - started)
+        lines = [d.describe() for d in sorted(found, key=lambda d: (d.path, d.line, d.col))]
+        if len(lines) > MAX_DIAGNOSTICS:
+            lines = lines[:MAX_DIAGNOSTICS] + [f"... [{len(lines) - MAX_DIAGNOSTICS} more not shown]"]
+        errors = sum(1 for d in found if d.severity == "error")
+        summary = f"[{errors} errors, {len(found) - errors} warnings in {len(files)} files"
+        summary += f"; {'; '.join(notes)}]" if notes else "]"
+        return "\n".join([*lines, summary])
+
+    def close(self) -> None:
+        if self.tsc is not None:
+            self.tsc.close()
+        if self.eslint is not None:
+            self.eslint.close()
+
+
+_daemons: dict[Path, DiagnosticsDaemon] = {}
+_daemons_lock = threading.Lock()
+
+
+def diagnostics_daemon(working_dir: Path, config: DiagnosticsConfig) -> DiagnosticsDaemon:
+    """The shared daemon of a working tree, started on first use."""
+    key = Path(working_dir).resolve()
+    with _daemons_lock:
+        daemon = _daemons.get(key)
+        if daemon is None or daemon.config != config:
+            if daemon is not None:
+                daemon.close()
+            daemon = _daemons[key] = DiagnosticsDaemon(key, config)
+        return daemon
+
+
+def drop_daemon(working_dir: Path) -> None:
+    """Stop a working tree's daemon, e.g. once its worktree is removed."""
+    with _daemons_lock:
+        daemon = _daemons.pop(Path(working_dir).resolve(), None)
+    if daemon is not None:
+        daemon.close()
+
+
+def close_daemons() -> None:
+    """Stop every daemon; registered on the graph's cleanup."""
+    with _daemons_lock:
+        daemons = list(_daemons.values())
+        _daemons.clear()
+    for daemon in daemons:
+        daemon.close()
@@ -2,22 +2,40 @@
 
 from __future__ import annotations
 
+import logging
 import sqlite3
+from collections.abc import AsyncIterator, Callable
+from contextlib import ExitStack, asynccontextmanager
 from functools import partial
 from pathlib import Path
 from typing import Any, Literal
 
 from langgraph.checkpoint.sqlite import SqliteSaver
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
 from langgraph.graph import END, StateGraph
 
-from agent_runner.agents.committer import committer_node
-from agent_runner.agents.implementer import implementer_node
-from agent_runner.agents.planner import planner_node
-from agent_runner.agents.reviewer import reviewer_node
+from agent_runner.agents.committer import committer_node, committer_node_async
+from agent_runner.agents.gate import gate_node, gate_node_async
+from agent_runner.agents.implementer import implementer_node, implementer_node_async
+from agent_runner.agents.planner import planner_node, planner_node_async
+from agent_runner.agents.reviewer import reviewer_node, reviewer_node_async
+from agent_runner.commands import close_runners
 from agent_runner.config import Config
+from agent_runner.depgraph import DependencyGraph
+from agent_runner.diagnostics import close_daemons
 from agent_runner.models import ModelRouter
+from agent_runner.parallel import (
+    dispatch_node,
+    merge_node,
+    route_after_dispatch,
+    worker_node,
+    worker_node_async,
+)
 from agent_runner.state import AgentState
-from agent_runner.tools import make_tools
+from agent_runner.tools import FILE_CACHE, make_tools
+from agent_runner.usage import metered
+
+logger = logging.getLogger("agent_runner")
 
 
 def route_after_planner(state: AgentState) -> Literal["implementer", "__end__"]:
@@ -40,36 +58,215 @@ def route_after_reviewer(state: AgentState, *, max_retries: int = 3) -> Literal[
     return "planner"
 
 
-def build_graph(config: Config) -> tuple[Any, SqliteSaver]:
-    """Build and compile the agent orchestrator graph."""
-    router = ModelRouter(config)
-    tools = make_tools(
-        working_dir=config.project_dir,
-        allowed_commands=config.allowed_commands,
-    )
+def route_after_gate(state: AgentState, *, max_retries: int = 3) -> Literal["reviewer", "implementer", "planner"]:
+    """Route after the pre-review gate: pass -> LLM review, fail -> retry or skip."""
+    if state.get("error") != "review_rejected":
+        return "reviewer"
+    if state.get("retry_count", 0) < max_retries:
+        return "implementer"
+    return "planner"
 
-    graph = StateGraph(AgentState)
 
-    graph.add_node("planner", partial(planner_node, router=router, app_config=config))
-    graph.add_node("implementer", partial(implementer_node, router=router, tools=tools))
-    graph.add_node("reviewer", partial(reviewer_node, router=router, tools=tools))
-    graph.add_node("committer", partial(committer_node, router=router, app_config=config))
+def _metered(node: Callable, *, use_async: bool) -> Callable:
+    """Wrap an LLM-calling node so its usage and cost are written into state."""
+    if use_async:
+        async def run_async(state: AgentState) -> dict:
+            with metered(state) as meter:
+                return meter.state_update(await node(state))
+        return run_async
 
-    graph.set_entry_point("planner")
+    def run(state: AgentState) -> dict:
+        with metered(state) as meter:
+            return meter.state_update(node(state))
+    return run
 
-    graph.add_conditional_edges("planner", route_after_planner)
-    graph.add_edge("implementer", "reviewer")
+
+def save_failed_usage(compiled_graph: Any, thread_config: dict, error: BaseException) -> None:
+    """Checkpoint what a node spent before it raised, so a resumed run's budgets count it.
+
+    The update is applied as if by the node before the failed one, so the
+    failed node still runs next on resume. When sibling nodes of the same
+    step finished, that would re-run them, so the usage is only logged.
+    """
+    update = getattr(error, "usage_update", None)
+    if update and _can_save_usage(compiled_graph.get_state(thread_config), update):
+        compiled_graph.update_state(thread_config, update)
+
+
+async def asave_failed_usage(compiled_graph: Any, thread_config: dict, error: BaseException) -> None:
+    """Async variant of save_failed_usage."""
+    update = getattr(error, "usage_update", None)
+    if update and _can_save_usage(await compiled_graph.aget_state(thread_config), update):
+        await compiled_graph.aupdate_state(thread_config, update)
+
+
+def _can_save_usage(snapshot: Any, update: dict) -> bool:
+    if any(task.result is not None for task in snapshot.tasks):
+        logger.warning("Could not checkpoint the failed node's usage: %s", update["token_usage"])
+        return False
+    logger.info("Checkpointing the failed node's usage ($%.4f)", update.get("task_cost", 0.0))
+    return True
+
+
+def _node_variants(use_async: bool) -> dict[str, Callable]:
+    if use_async:
+        return {
+            "planner": planner_node_async,
+            "implementer": implementer_node_async,
+            "gate": gate_node_async,
+            "reviewer": reviewer_node_async,
+            "committer": committer_node_async,
+            "worker": worker_node_async,
+        }
+    return {
+        "planner": planner_node,
+        "implementer": implementer_node,
+        "gate": gate_node,
+        "reviewer": reviewer_node,
+        "committer": committer_node,
+        "worker": worker_node,
+    }
+
+
+def _add_task_nodes(
+    graph: StateGraph,
+    config: Config,
+    router: ModelRouter,
+    tools: list,
+    *,
+    use_async: bool,
+    on_finish: str,
+    deps: DependencyGraph | None = None,
+) -> None:
+    """Add implementer -> [gate ->] reviewer -> committer; exhausted retries go to on_finish."""
+    nodes = _node_variants(use_async)
+
+    graph.add_node("implementer", _metered(
+        partial(nodes["implementer"], router=router, tools=tools, app_config=config), use_async=use_async,
+    ))
+    graph.add_node("reviewer", _metered(
+        partial(nodes["reviewer"], router=router, tools=tools, app_config=config), use_async=use_async,
+    ))
+    graph.add_node("committer", _metered(
+        partial(nodes["committer"], router=router, app_config=config, deps=deps), use_async=use_async,
+    ))
+
+    if config.gate.enabled:
+        graph.add_node("gate", partial(nodes["gate"], router=router, app_config=config))
+        graph.add_edge("implementer", "gate")
+        graph.add_conditional_edges(
+            "gate",
+            partial(route_after_gate, max_retries=config.max_review_retries),
+            {"reviewer": "reviewer", "implementer": "implementer", "planner": on_finish},
+        )
+    else:
+        graph.add_edge("implementer", "reviewer")
     graph.add_conditional_edges(
         "reviewer",
         partial(route_after_reviewer, max_retries=config.max_review_retries),
+        {"committer": "committer", "implementer": "implementer", "planner": on_finish},
     )
-    graph.add_edge("committer", "planner")
+    graph.add_edge("committer", on_finish)
+
+
+def build_task_graph(config: Config, tools: list, *, router: ModelRouter, use_async: bool = False) -> Any:
+    """Compile the single-task pipeline used by parallel workers (no checkpointer)."""
+    graph = StateGraph(AgentState)
+    _add_task_nodes(graph, config, router, tools, use_async=use_async, on_finish=END)
+    graph.set_entry_point("implementer")
+    return graph.compile()
 
+
+def _state_graph(
+    config: Config,
+    router: ModelRouter,
+    *,
+    use_async: bool = False,
+    parallel: int = 1,
+) -> StateGraph:
+    """Wire nodes and edges; async mode uses the coroutine node variants.
+
+    With parallel > 1 the planner is replaced by dispatch -> worker* -> merge,
+    where each worker runs the task pipeline in its own git worktree.
+    """
+    nodes = _node_variants(use_async)
+    graph = StateGraph(AgentState)
+    deps = DependencyGraph()
+
+    if parallel > 1:
+        graph.add_node("dispatch", partial(dispatch_node, app_config=config, max_workers=parallel, deps=deps))
+        graph.add_node("worker", partial(
+            nodes["worker"],
+            app_config=config,
+            task_graph=partial(build_task_graph, router=router, use_async=use_async),
+        ))
+        graph.add_node("merge", partial(merge_node, app_config=config, deps=deps))
+
+        graph.set_entry_point("dispatch")
+        graph.add_conditional_edges("dispatch", route_after_dispatch, ["worker", END])
+        graph.add_edge("worker", "merge")
+        graph.add_edge("merge", "dispatch")
+        return graph
+
+    tools = make_tools(
+        working_dir=config.project_dir,
+        allowed_commands=config.allowed_commands,
+        commands=config.commands,
+        diagnostics=config.diagnostics,
+    )
+
+    graph.add_node("planner", _metered(
+        partial(nodes["planner"], router=router, app_config=config, deps=deps), use_async=use_async,
+    ))
+    _add_task_nodes(graph, config, router, tools, use_async=use_async, on_finish="planner", deps=deps)
+
+    graph.set_entry_point("planner")
+    graph.add_conditional_edges("planner", route_after_planner)
+    return graph
+
+
+def _checkpoint_path(config: Config) -> Path:
     checkpoint_dir = config.checkpoint_dir
     checkpoint_dir.mkdir(parents=True, exist_ok=True)
-    db_path = checkpoint_dir / "checkpoints.db"
-    conn = sqlite3.connect(str(db_path))
+    return checkpoint_dir / "checkpoints.db"
+
+
+def build_graph(config: Config, *, parallel: int = 1) -> tuple[Any, SqliteSaver, ExitStack]:
+    """Build and compile the agent orchestrator graph.
+
+    The returned ExitStack owns long-lived resources (LLM clients, the
+    checkpoint connection); close it when the run is over.
+    """
+    cleanup = ExitStack()
+    router = ModelRouter(config)
+    cleanup.callback(router.close)
+    cleanup.callback(FILE_CACHE.log_stats)
+    cleanup.callback(close_runners)
+    cleanup.callback(close_daemons)
+    graph = _state_graph(config, router, parallel=parallel)
+
+    conn = sqlite3.connect(str(_checkpoint_path(config)), check_same_thread=False)
+    cleanup.callback(conn.close)
     memory = SqliteSaver(conn)
 
     compiled = graph.compile(checkpointer=memory)
-    return compiled, memory
+    return compiled, memory, cleanup
+
+
+@asynccontextmanager
+async def abuild_graph(config: Config, *, parallel: int = 1) -> AsyncIterator[tuple[Any, AsyncSqliteSaver]]:
+    """Build the graph with async nodes, for use with compiled.ainvoke.
+
+    Shares the checkpoint database with build_graph, so runs can be resumed
+    in either mode.
+    """
+    router = ModelRouter(config)
+    graph = _state_graph(config, router, use_async=True, parallel=parallel)
+    try:
+        async with AsyncSqliteSaver.from_conn_string(str(_checkpoint_path(config))) as memory:
+            yield graph.compile(checkpointer=memory), memory
+    finally:
+        await router.aclose()
+        FILE_CACHE.log_stats()
+        close_runners()
+        close_daemons()
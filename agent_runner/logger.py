@@ -21,7 +21,7 @@ class JSONFormatter(logging.Formatter):
             "llm_provider": getattr(record, "llm_provider", None),
             "message": record.getMessage(),
         }
-        for key in ("task_id", "tokens_in", "tokens_out", "latency_ms", "tool_name"):
+        for key in ("task_id", "tokens_in", "tokens_out", "cache_read", "cache_write", "cost_usd", "latency_ms", "ttft_ms", "tool_name"):
             val = getattr(record, key, None)
             if val is not None:
                 log_data[key] = val
@@ -70,21 +70,35 @@ def log_llm_call(
     tokens_out: int,
     latency_ms: float,
     task_id: str | None = None,
+    cache_read: int = 0,
+    cache_write: int = 0,
+    ttft_ms: float | None = None,
+    cost_usd: float | None = None,
 ) -> None:
-    """Log an LLM API call with token usage."""
+    """Log an LLM API call with token usage and cost."""
+    cached = f", {cache_read} cached, {cache_write} cache write" if cache_read or cache_write else ""
+    first_token = f", first token {ttft_ms:.0f}ms" if ttft_ms is not None else ""
+    cost = f", ${cost_usd:.4f}" if cost_usd else ""
     logger.info(
-        "LLM call: %s using %s (%d in, %d out, %.0fms)",
+        "LLM call: %s using %s (%d in, %d out%s%s, %.0fms%s)",
         agent,
         provider,
         tokens_in,
         tokens_out,
+        cached,
+        cost,
         latency_ms,
+        first_token,
         extra={
             "agent": agent,
             "llm_provider": provider,
             "tokens_in": tokens_in,
             "tokens_out": tokens_out,
+            "cache_read": cache_read or None,
+            "cache_write": cache_write or None,
+            "cost_usd": cost_usd,
             "latency_ms": latency_ms,
+            "ttft_ms": ttft_ms,
             "task_id": task_id,
         },
     )
@@ -2,14 +2,34 @@
 
 from __future__ import annotations
 
+import asyncio
+import contextvars
+import inspect
+import json
 import logging
+import random
+import re
+import threading
 import time
-from typing import Any
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from functools import partial
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable
 
 from langchain_core.language_models.chat_models import BaseChatModel
-from langchain_core.messages import BaseMessage
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from langchain_core.messages.utils import message_chunk_to_message
 
-from agent_runner.config import Config, ModelConfig
+from agent_runner.cache import ResponseCache
+from agent_runner.compaction import pinned_prefix
+from agent_runner.config import CircuitBreakerConfig, Config, ModelConfig
+from agent_runner.logger import log_llm_call
+from agent_runner.routing import TierPolicy
+from agent_runner.usage import DOWNGRADE, BudgetExceeded, add_usage, budget_action, call_cost, current_meter
 
 logger = logging.getLogger("agent_runner")
 
@@ -29,6 +49,450 @@ def create_chat_model(model_config: ModelConfig, timeout: int = 120) -> BaseChat
         raise ValueError(f"Unknown provider: {model_config.provider}")
 
 
+def _close_chat_model(model: BaseChatModel) -> None:
+    """Close the SDK clients (and their HTTP pools) held by a chat model."""
+    for attr in ("_client", "root_client", "client"):
+        client = vars(model).get(attr)
+        close = getattr(client, "close", None)
+        if callable(close):
+            try:
+                close()
+            except Exception as e:
+                logger.debug("Error closing %s client: %s", attr, e)
+
+
+async def _aclose_chat_model(model: BaseChatModel) -> None:
+    """Close the async SDK clients held by a chat model."""
+    for attr in ("_async_client", "root_async_client"):
+        client = vars(model).get(attr)
+        close = getattr(client, "close", None)
+        if callable(close):
+            try:
+                result = close()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.debug("Error closing %s client: %s", attr, e)
+
+
+# Providers that need explicit cache breakpoints; OpenAI and Gemini cache prefixes on their own
+PROMPT_CACHE_PROVIDERS = frozenset({"anthropic"})
+CACHE_CONTROL = {"type": "ephemeral"}
+
+
+def _mark_cacheable(message: BaseMessage) -> BaseMessage:
+    """Copy of a message whose last content block carries a cache breakpoint."""
+    content = message.content
+    if isinstance(content, str):
+        if not content:
+            return message
+        blocks: list = [{"type": "text", "text": content}]
+    elif content and isinstance(content[-1], dict):
+        blocks = list(content)
+    else:
+        return message
+    blocks[-1] = {**blocks[-1], "cache_control": CACHE_CONTROL}
+    return message.model_copy(update={"content": blocks})
+
+
+def with_cache_breakpoints(messages: list[BaseMessage]) -> list[BaseMessage]:
+    """Mark the stable prefix and the transcript tail as cacheable.
+
+    Breakpoints go after the system prompt (shared by every call of an
+    agent), after the task/spec block (shared by every round of a task)
+    and on the last message, so each round reads the previous round's
+    transcript from cache and only pays for what was appended.
+    """
+    if not messages:
+        return messages
+    marks = {pinned_prefix(messages) - 1, len(messages) - 1}
+    if isinstance(messages[0], SystemMessage):
+        marks.add(0)
+    return [_mark_cacheable(m) if i in marks else m for i, m in enumerate(messages)]
+
+
+ToolCallCallback = Callable[[int, dict[str, Any]], None]
+
+
+class _StreamAssembler:
+    """Accumulates streamed chunks, announcing each tool call once it is complete.
+
+    A tool call's block is complete when the next one starts, so every call
+    but the last is announced (with its position) while the model is still
+    generating. The last one only completes with the stream and is left to
+    the caller, who gets it in the assembled message.
+    """
+
+    def __init__(self, on_tool_call: ToolCallCallback) -> None:
+        self.on_tool_call = on_tool_call
+        self._full: Any = None
+        self._announced = 0
+
+    def add(self, chunk: Any) -> None:
+        self._full = chunk if self._full is None else self._full + chunk
+        started = self._full.tool_call_chunks
+        while self._announced < len(started) - 1:
+            block = started[self._announced]
+            try:
+                args = json.loads(block["args"] or "{}")
+            except ValueError:
+                args = None
+            if isinstance(args, dict) and block.get("name") and block.get("id"):
+                self.on_tool_call(
+                    self._announced,
+                    {"name": block["name"], "args": args, "id": block["id"], "type": "tool_call"},
+                )
+            self._announced += 1
+
+    def message(self) -> Any:
+        if self._full is None:
+            raise RuntimeError("Provider returned an empty stream")
+        return message_chunk_to_message(self._full)
+
+
+def _in_thread(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+    """Run fn on a daemon thread of its own.
+
+    Hedged calls don't share a pool: an abandoned loser holds its thread
+    until the request times out, and must not queue the next call behind it.
+    """
+    future: Future = Future()
+
+    def run() -> None:
+        future.set_running_or_notify_cancel()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, daemon=True, name="hedge").start()
+    return future
+
+
+class _HedgeRace:
+    """Picks the one call of a hedged pair whose result counts: the first to answer.
+
+    The loser of a sync race can't be interrupted and may finish after the
+    node has returned; it must leave the router's health, latency and
+    current provider alone, though its usage is still billed.
+    """
+
+    def __init__(self) -> None:
+        self.winner: str | None = None
+        self._lock = threading.Lock()
+
+    def claim(self, provider_key: str) -> bool:
+        with self._lock:
+            if self.winner is None:
+                self.winner = provider_key
+            return self.winner == provider_key
+
+    def lost(self, provider_key: str) -> bool:
+        with self._lock:
+            return self.winner is not None and self.winner != provider_key
+
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+@dataclass
+class ProviderHealth:
+    """Circuit-breaker state for one provider/model."""
+
+    state: str = CLOSED
+    opened_at: float = 0.0
+    cooldown: float = 0.0
+    last_error: str = ""
+    probing: bool = False
+    events: deque[tuple[float, bool]] = field(default_factory=deque)  # (timestamp, ok)
+
+
+class HealthRegistry:
+    """Per-provider circuit breakers over a sliding error-rate window.
+
+    closed -> open when the windowed failure rate crosses the threshold;
+    open -> half_open once the cooldown elapses; a successful probe closes the
+    breaker, a failed one reopens it with a doubled cooldown. Breaker states
+    are persisted so `agent status` (and a resumed run) can see them.
+    """
+
+    def __init__(self, config: CircuitBreakerConfig, path: Path | None = None) -> None:
+        self.config = config
+        self.path = path
+        self._providers: dict[str, ProviderHealth] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def state(self, key: str) -> str:
+        with self._lock:
+            return self._refresh(key).state
+
+    def available(self, key: str) -> bool:
+        """Whether a regular call may be sent to the provider right now."""
+        with self._lock:
+            health = self._refresh(key)
+            if health.state == CLOSED:
+                return True
+            return health.state == HALF_OPEN and not health.probing
+
+    def start_probe(self, key: str) -> bool:
+        """Claim the single in-flight probe for a half-open provider."""
+        with self._lock:
+            health = self._refresh(key)
+            if health.state != HALF_OPEN or health.probing:
+                return False
+            health.probing = True
+            return True
+
+    def record_success(self, key: str) -> None:
+        with self._lock:
+            health = self._get(key)
+            health.events.append((time.time(), True))
+            health.probing = False
+            if health.state != CLOSED:
+                logger.info("Circuit closed for %s", key)
+                health.state = CLOSED
+                health.cooldown = 0.0
+                health.events.clear()
+                self._save()
+
+    def record_failure(self, key: str, error: Exception | str) -> None:
+        with self._lock:
+            now = time.time()
+            health = self._get(key)
+            health.events.append((now, False))
+            health.last_error = str(error)[:200]
+            health.probing = False
+            if health.state == HALF_OPEN:
+                self._open(key, health, now, min(health.cooldown * 2, self.config.max_cooldown_seconds))
+                return
+            if health.state == OPEN:
+                return
+            self._prune(health, now)
+            failures = sum(1 for _, ok in health.events if not ok)
+            if (
+                len(health.events) >= self.config.min_calls
+                and failures / len(health.events) >= self.config.failure_rate
+            ):
+                self._open(key, health, now, self.config.cooldown_seconds)
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        """Breaker state per provider, for status output."""
+        with self._lock:
+            now = time.time()
+            result = {}
+            for key in self._providers:
+                health = self._refresh(key)
+                self._prune(health, now)
+                result[key] = {
+                    "state": health.state,
+                    "calls": len(health.events),
+                    "failures": sum(1 for _, ok in health.events if not ok),
+                    "retry_in": max(0.0, health.opened_at + health.cooldown - now) if health.state == OPEN else 0.0,
+                    "last_error": health.last_error,
+                }
+            return result
+
+    def _get(self, key: str) -> ProviderHealth:
+        if key not in self._providers:
+            self._providers[key] = ProviderHealth()
+        return self._providers[key]
+
+    def _refresh(self, key: str) -> ProviderHealth:
+        health = self._get(key)
+        if health.state == OPEN and time.time() >= health.opened_at + health.cooldown:
+            logger.info("Circuit half-open for %s", key)
+            health.state = HALF_OPEN
+            health.probing = False
+        return health
+
+    def _open(self, key: str, health: ProviderHealth, now: float, cooldown: float) -> None:
+        logger.warning("Circuit open for %s for %.0fs: %s", key, cooldown, health.last_error)
+        health.state = OPEN
+        health.opened_at = now
+        health.cooldown = cooldown
+        self._save()
+
+    def _prune(self, health: ProviderHealth, now: float) -> None:
+        cutoff = now - self.config.window_seconds
+        while health.events and health.events[0][0] < cutoff:
+            health.events.popleft()
+
+    def _load(self) -> None:
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            raw = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable provider health file %s: %s", self.path, e)
+            return
+        for key, data in raw.items():
+            self._providers[key] = ProviderHealth(
+                state=data.get("state", CLOSED),
+                opened_at=data.get("opened_at", 0.0),
+                cooldown=data.get("cooldown", 0.0),
+                last_error=data.get("last_error", ""),
+            )
+
+    def _save(self) -> None:
+        if self.path is None:
+            return
+        data = {
+            key: {
+                "state": h.state,
+                "opened_at": h.opened_at,
+                "cooldown": h.cooldown,
+                "last_error": h.last_error,
+            }
+            for key, h in self._providers.items()
+        }
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.write_text(json.dumps(data, indent=2), encoding="utf-8")
+        except OSError as e:
+            logger.warning("Could not persist provider health: %s", e)
+
+
+def health_path(config: Config) -> Path:
+    """Where breaker state is persisted between processes."""
+    return config.checkpoint_dir / "provider_health.json"
+
+
+_RESET_KINDS = ("requests", "tokens", "input-tokens", "output-tokens")
+
+
+def _parse_duration(value: str) -> float | None:
+    """Parse an OpenAI-style reset duration such as '1s', '6m0s' or '250ms'."""
+    parts = re.findall(r"(\d+(?:\.\d+)?)(ms|h|m|s)", value)
+    if not parts or "".join(n + u for n, u in parts) != value.strip():
+        return None
+    scale = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    return sum(float(n) * scale[u] for n, u in parts)
+
+
+def _seconds_until(value: str) -> float | None:
+    """Parse a header that is either delta-seconds, a duration, or a date."""
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    duration = _parse_duration(value)
+    if duration is not None:
+        return duration
+    try:
+        when = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        try:
+            when = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def retry_after_seconds(error: BaseException) -> float | None:
+    """Extract the provider's requested wait from a failed call, if any.
+
+    Honors Retry-After / retry-after-ms, and otherwise the reset header of
+    whichever rate limit (Anthropic or OpenAI naming) is exhausted.
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or getattr(error, "headers", None)
+    if not headers:
+        return None
+    headers = {k.lower(): v for k, v in dict(headers).items()}
+
+    if "retry-after-ms" in headers:
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    if "retry-after" in headers:
+        seconds = _seconds_until(headers["retry-after"])
+        if seconds is not None:
+            return seconds
+
+    waits = []
+    for kind in _RESET_KINDS:
+        for remaining_key, reset_key in (
+            (f"anthropic-ratelimit-{kind}-remaining", f"anthropic-ratelimit-{kind}-reset"),
+            (f"x-ratelimit-remaining-{kind}", f"x-ratelimit-reset-{kind}"),
+        ):
+            if headers.get(remaining_key) == "0" and reset_key in headers:
+                seconds = _seconds_until(headers[reset_key])
+                if seconds is not None:
+                    waits.append(seconds)
+    return max(waits) if waits else None
+
+
+class RetryScheduler:
+    """Per-provider backoff with full jitter, overridden by Retry-After."""
+
+    def __init__(self, base_seconds: float, max_seconds: float) -> None:
+        self.base_seconds = base_seconds
+        self.max_seconds = max_seconds
+        self._failures: dict[str, int] = {}
+        self._available_at: dict[str, float] = {}  # monotonic time
+        self._lock = threading.Lock()
+
+    def ready(self, key: str) -> bool:
+        with self._lock:
+            return time.monotonic() >= self._available_at.get(key, 0.0)
+
+    def record_failure(self, key: str, error: BaseException) -> float:
+        """Schedule the provider's next attempt; returns the delay in seconds."""
+        with self._lock:
+            failures = self._failures.get(key, 0)
+            self._failures[key] = failures + 1
+            delay = retry_after_seconds(error)
+            if delay is None:
+                ceiling = min(self.max_seconds, self.base_seconds * 2 ** failures)
+                delay = random.uniform(ceiling / 2, ceiling)
+            self._available_at[key] = time.monotonic() + delay
+            return delay
+
+    def record_success(self, key: str) -> None:
+        with self._lock:
+            self._failures.pop(key, None)
+            self._available_at.pop(key, None)
+
+    def wait_time(self, chain: list[ModelConfig]) -> float:
+        """Seconds until the earliest provider in the chain is ready."""
+        with self._lock:
+            now = time.monotonic()
+            waits = [
+                self._available_at.get(f"{mc.provider}/{mc.model}", now) - now
+                for mc in chain
+            ]
+        return max(0.0, min(waits, default=0.0))
+
+
+class LatencyTracker:
+    """Recent successful-call latencies per (agent, provider)."""
+
+    def __init__(self, window: int = 50) -> None:
+        self.window = window
+        self._samples: dict[tuple[str, str], deque[float]] = {}
+
+    def record(self, agent_name: str, provider_key: str, seconds: float) -> None:
+        key = (agent_name, provider_key)
+        if key not in self._samples:
+            self._samples[key] = deque(maxlen=self.window)
+        self._samples[key].append(seconds)
+
+    def percentile(self, agent_name: str, provider_key: str, q: float, *, min_samples: int = 1) -> float | None:
+        """Nearest-rank percentile (q in 0..1), or None with too few samples."""
+        samples = sorted(self._samples.get((agent_name, provider_key), ()))
+        if len(samples) < max(min_samples, 1):
+            return None
+        rank = min(len(samples) - 1, max(0, int(round(q * len(samples))) - 1))
+        return samples[rank]
+
+
 class ModelRouter:
     """Routes LLM calls through a fallback chain of providers."""
 
@@ -37,22 +501,77 @@ class ModelRouter:
         self.fallback_chain = config.fallback_chain
         self.timeout = config.request_timeout_seconds
         self._current_provider: str = ""
-        self._token_usage: dict[str, dict[str, int]] = {}
+        self._token_usage: dict[str, dict[str, Any]] = {}
+        self._unpriced: set[str] = set()
+        self._budget_notices: set[str] = set()
+        # (provider, model, timeout) -> client; bound variants add the tool names
+        self._clients: dict[tuple, BaseChatModel] = {}
+        self._bound_clients: dict[tuple, Any] = {}
+        self._clients_lock = threading.Lock()
+        self.health = HealthRegistry(config.circuit_breaker, health_path(config))
+        self.retry = RetryScheduler(
+            base_seconds=config.backoff_base_seconds,
+            max_seconds=config.fallback_wait_seconds,
+        )
+        self.cache = ResponseCache.from_config(config)
+        self.routing = TierPolicy.from_config(config)
+        self.latency = LatencyTracker()
+        self._hedges_used: dict[str, int] = {}
 
     @property
     def current_provider(self) -> str:
         return self._current_provider
 
     @property
-    def token_usage(self) -> dict[str, dict[str, int]]:
+    def token_usage(self) -> dict[str, dict[str, Any]]:
         return self._token_usage
 
+    def get_client(self, model_config: ModelConfig, tools: list[Any] | None = None) -> Any:
+        """Return a warm chat model for a provider, bound to tools if given.
+
+        Clients are cached for the lifetime of the router so the SDK's HTTP
+        connection pool (and the tool-schema conversion) is reused across rounds.
+        """
+        key = (model_config.provider, model_config.model, self.timeout)
+        tool_key = key + (tuple(t.name for t in tools),) if tools else None
+        with self._clients_lock:
+            if tool_key is not None and tool_key in self._bound_clients:
+                return self._bound_clients[tool_key]
+            model = self._clients.get(key)
+            if model is None:
+                model = create_chat_model(model_config, self.timeout)
+                self._clients[key] = model
+            if tool_key is None:
+                return model
+            bound = model.bind_tools(tools)
+            self._bound_clients[tool_key] = bound
+            return bound
+
+    def close(self) -> None:
+        """Close all cached clients. Call once on shutdown."""
+        if self.cache is not None and (self.cache.hits or self.cache.misses):
+            logger.info("LLM cache (%s): %d hits, %d misses", self.cache.mode, self.cache.hits, self.cache.misses)
+        with self._clients_lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+            self._bound_clients.clear()
+        for model in clients:
+            _close_chat_model(model)
+
+    async def aclose(self) -> None:
+        """Close async and sync clients. Call once at the end of an async run."""
+        with self._clients_lock:
+            clients = list(self._clients.values())
+        for model in clients:
+            await _aclose_chat_model(model)
+        self.close()
+
     def get_model_for_agent(self, agent_name: str) -> BaseChatModel:
         """Get the preferred model for a specific agent, with fallback."""
         preferred = self.config.models.get(agent_name)
         if preferred:
             try:
-                model = create_chat_model(preferred, self.timeout)
+                model = self.get_client(preferred)
                 self._current_provider = f"{preferred.provider}/{preferred.model}"
                 return model
             except Exception as e:
@@ -66,7 +585,7 @@ class ModelRouter:
         """Try each model in the fallback chain."""
         for mc in self.fallback_chain:
             try:
-                model = create_chat_model(mc, self.timeout)
+                model = self.get_client(mc)
                 self._current_provider = f"{mc.provider}/{mc.model}"
                 return model
             except Exception as e:
@@ -78,68 +597,489 @@ class ModelRouter:
         agent_name: str,
         messages: list[BaseMessage],
         tools: list[Any] | None = None,
+        *,
+        on_tool_call: ToolCallCallback | None = None,
+        model: ModelConfig | None = None,
     ) -> Any:
-        """Invoke an LLM with automatic fallback on failure."""
-        chain = list(self.fallback_chain)
+        """Invoke an LLM with automatic fallback on failure.
 
-        # Try preferred model first
-        preferred = self.config.models.get(agent_name)
+        Each round tries every provider that is healthy and out of backoff.
+        When a round fails completely the router sleeps until the earliest
+        healthy provider's backoff (or Retry-After) expires, up to
+        max_retry_rounds. A wait with no provider ready is not a round.
+        Agents with a hedging budget race the first two providers instead
+        of trying them one after the other (see _invoke_hedged).
+
+        With on_tool_call the response is streamed, and each tool call is
+        passed to the callback as soon as its block is complete (see
+        _StreamAssembler); the assembled message is still returned.
+
+        `model` replaces the agent's preferred model at the head of the chain
+        (see TierPolicy); the rest of the fallback chain still applies.
+
+        Raises BudgetExceeded when a spend budget set to stop is used up,
+        unless the response is cached: a cached call costs nothing.
+        """
+        digest = self.cache.call_digest(messages, tools, self._call_params()) if self.cache is not None else None
+        cached = self._cached_response(agent_name, self._cache_chain(agent_name, model), digest)
+        if cached is not None:
+            return cached
+        chain = self._budgeted_chain(agent_name, model)
+
+        last_error: Exception | None = None
+        round_num = 0
+        while True:
+            ready = self._ready_chain(chain)
+            attempted = bool(ready)
+            if on_tool_call is None and len(ready) > 1 and self._hedge_allowed(agent_name):
+                try:
+                    return self._invoke_hedged(agent_name, ready[0], ready[1], messages, tools, digest)
+                except Exception as e:
+                    last_error = e
+                ready = ready[2:]
+            for mc in ready:
+                try:
+                    return self._invoke_once(agent_name, mc, messages, tools, digest, on_tool_call)
+                except Exception as e:
+                    last_error = e
+
+            if attempted:
+                if round_num == self.config.max_retry_rounds:
+                    break
+                round_num += 1
+            time.sleep(self._retry_wait(chain, attempted, round_num))
+
+        raise RuntimeError(f"All LLM providers exhausted after retry. Last error: {last_error}")
+
+    async def ainvoke_with_fallback(
+        self,
+        agent_name: str,
+        messages: list[BaseMessage],
+        tools: list[Any] | None = None,
+        *,
+        on_tool_call: ToolCallCallback | None = None,
+        model: ModelConfig | None = None,
+    ) -> Any:
+        """Async variant of invoke_with_fallback; backoff waits don't block the loop."""
+        digest = self.cache.call_digest(messages, tools, self._call_params()) if self.cache is not None else None
+        cached = self._cached_response(agent_name, self._cache_chain(agent_name, model), digest)
+        if cached is not None:
+            return cached
+        chain = self._budgeted_chain(agent_name, model)
+
+        last_error: Exception | None = None
+        round_num = 0
+        while True:
+            ready = self._ready_chain(chain)
+            attempted = bool(ready)
+            if on_tool_call is None and len(ready) > 1 and self._hedge_allowed(agent_name):
+                try:
+                    return await self._ainvoke_hedged(agent_name, ready[0], ready[1], messages, tools, digest)
+                except Exception as e:
+                    last_error = e
+                ready = ready[2:]
+            for mc in ready:
+                try:
+                    return await self._ainvoke_once(agent_name, mc, messages, tools, digest, on_tool_call)
+                except Exception as e:
+                    last_error = e
+
+            if attempted:
+                if round_num == self.config.max_retry_rounds:
+                    break
+                round_num += 1
+            await asyncio.sleep(self._retry_wait(chain, attempted, round_num))
+
+        raise RuntimeError(f"All LLM providers exhausted after retry. Last error: {last_error}")
+
+    def tier_model(self, agent_name: str, tier: int | None) -> ModelConfig | None:
+        """The model for a task tier, or None when the agent isn't tier-routed."""
+        if self.routing is None or tier is None or not self.routing.applies_to(agent_name):
+            return None
+        return self.routing.model(tier)
+
+    def _chain_for(self, agent_name: str, model: ModelConfig | None = None) -> list[ModelConfig]:
+        """The fallback chain with the agent's preferred (or the given) model first."""
+        chain = list(self.fallback_chain)
+        preferred = model or self.config.models.get(agent_name)
         if preferred:
             chain = [preferred] + [
                 mc for mc in chain
                 if not (mc.provider == preferred.provider and mc.model == preferred.model)
             ]
+        return chain
 
-        last_error: Exception | None = None
-        for mc in chain:
-            try:
-                model = create_chat_model(mc, self.timeout)
-                if tools:
-                    model = model.bind_tools(tools)
-
-                start = time.monotonic()
-                response = model.invoke(messages)
-                elapsed_ms = (time.monotonic() - start) * 1000
-
-                # Track token usage
-                provider_key = f"{mc.provider}/{mc.model}"
-                self._current_provider = provider_key
-                usage = getattr(response, "usage_metadata", None)
-                if usage:
-                    if provider_key not in self._token_usage:
-                        self._token_usage[provider_key] = {"input": 0, "output": 0}
-                    self._token_usage[provider_key]["input"] += getattr(usage, "input_tokens", 0)
-                    self._token_usage[provider_key]["output"] += getattr(usage, "output_tokens", 0)
-
-                logger.info(
-                    "LLM call succeeded: agent=%s provider=%s latency=%.0fms",
-                    agent_name, provider_key, elapsed_ms,
-                    extra={"agent": agent_name, "llm_provider": provider_key, "latency_ms": elapsed_ms},
-                )
-                return response
+    def _budgeted_chain(self, agent_name: str, model: ModelConfig | None = None) -> list[ModelConfig]:
+        """The agent's chain, or the downgrade model first once a budget is spent."""
+        chain = self._chain_for(agent_name, model)
+        budgets = self.config.budgets
+        exceeded = budget_action(budgets, current_meter())
+        if exceeded is None:
+            return chain
+        action, reason = exceeded
+        if action != DOWNGRADE or budgets.downgrade_model is None:
+            raise BudgetExceeded(f"Stopping before {agent_name} call: {reason}")
+        cheap = budgets.downgrade_model
+        if reason not in self._budget_notices:
+            self._budget_notices.add(reason)
+            logger.warning("%s; %s now uses %s/%s", reason, agent_name, cheap.provider, cheap.model)
+        return [cheap] + [mc for mc in chain if not (mc.provider == cheap.provider and mc.model == cheap.model)]
 
-            except Exception as e:
-                last_error = e
-                logger.warning(
-                    "LLM call failed: agent=%s provider=%s/%s error=%s",
-                    agent_name, mc.provider, mc.model, str(e),
-                )
-                continue
+    def _cache_chain(self, agent_name: str, model: ModelConfig | None = None) -> list[ModelConfig]:
+        """The models a cached response may come from: the chain, and the downgrade model a spent budget uses."""
+        chain = self._chain_for(agent_name, model)
+        cheap = self.config.budgets.downgrade_model
+        if cheap is not None and not any(mc.provider == cheap.provider and mc.model == cheap.model for mc in chain):
+            chain.append(cheap)
+        return chain
+
+    def _retry_wait(self, chain: list[ModelConfig], attempted: bool, round_num: int) -> float:
+        """Seconds until the earliest healthy provider is out of backoff.
+
+        Providers with an open breaker are left out: _ready_chain skips them
+        even once their backoff expires.
+        """
+        wait = self.retry.wait_time(self._healthy_chain(chain))
+        if attempted:
+            logger.warning(
+                "All providers failed. Retrying in %.1fs (round %d/%d)...",
+                wait, round_num, self.config.max_retry_rounds,
+            )
+        else:
+            logger.info("No provider is out of backoff; waiting %.1fs", wait)
+        return wait
+
+    def _ready_chain(self, chain: list[ModelConfig]) -> list[ModelConfig]:
+        """Healthy providers whose backoff has expired, in chain order."""
+        return [
+            mc for mc in self._healthy_chain(chain)
+            if self.retry.ready(f"{mc.provider}/{mc.model}")
+        ]
+
+    def _invoke_once(
+        self,
+        agent_name: str,
+        mc: ModelConfig,
+        messages: list[BaseMessage],
+        tools: list[Any] | None,
+        digest: str | None = None,
+        on_tool_call: ToolCallCallback | None = None,
+        race: _HedgeRace | None = None,
+    ) -> Any:
+        """Call one provider, recording health, backoff, tokens and latency.
+
+        In a hedged race only the winner records health and latency (see _HedgeRace).
+        """
+        provider_key = f"{mc.provider}/{mc.model}"
+        try:
+            model = self.get_client(mc, tools)
+            start = time.monotonic()
+            ttft_ms = None
+            if on_tool_call is None:
+                response = model.invoke(self._prepare(mc, messages))
+            else:
+                assembler = _StreamAssembler(on_tool_call)
+                for chunk in model.stream(self._prepare(mc, messages)):
+                    if ttft_ms is None:
+                        ttft_ms = (time.monotonic() - start) * 1000
+                    assembler.add(chunk)
+                response = assembler.message()
+            elapsed_ms = (time.monotonic() - start) * 1000
+        except Exception as e:
+            if race is None or not race.lost(provider_key):
+                self._record_failure(agent_name, provider_key, e)
+            raise
+
+        if race is not None and not race.claim(provider_key):
+            self._drop_late_response(agent_name, provider_key, response)
+            return response
+        self._record_success(agent_name, provider_key, response, elapsed_ms, ttft_ms)
+        if digest is not None:
+            self.cache.put(mc, digest, response)
+        return response
+
+    async def _ainvoke_once(
+        self,
+        agent_name: str,
+        mc: ModelConfig,
+        messages: list[BaseMessage],
+        tools: list[Any] | None,
+        digest: str | None = None,
+        on_tool_call: ToolCallCallback | None = None,
+        race: _HedgeRace | None = None,
+    ) -> Any:
+        """Async variant of _invoke_once."""
+        provider_key = f"{mc.provider}/{mc.model}"
+        try:
+            model = self.get_client(mc, tools)
+            start = time.monotonic()
+            ttft_ms = None
+            if on_tool_call is None:
+                response = await model.ainvoke(self._prepare(mc, messages))
+            else:
+                assembler = _StreamAssembler(on_tool_call)
+                async for chunk in model.astream(self._prepare(mc, messages)):
+                    if ttft_ms is None:
+                        ttft_ms = (time.monotonic() - start) * 1000
+                    assembler.add(chunk)
+                response = assembler.message()
+            elapsed_ms = (time.monotonic() - start) * 1000
+        except Exception as e:
+            if race is None or not race.lost(provider_key):
+                self._record_failure(agent_name, provider_key, e)
+            raise
+
+        if race is not None and not race.claim(provider_key):
+            self._drop_late_response(agent_name, provider_key, response)
+            return response
+        self._record_success(agent_name, provider_key, response, elapsed_ms, ttft_ms)
+        if digest is not None:
+            self.cache.put(mc, digest, response)
+        return response
+
+    def _hedge_allowed(self, agent_name: str) -> bool:
+        budget = self.config.hedging.budgets.get(agent_name, 0)
+        return self._hedges_used.get(agent_name, 0) < budget
+
+    def _hedge_delay(self, agent_name: str, mc: ModelConfig) -> float:
+        """Seconds to give the primary before hedging: a percentile of its recent latency."""
+        settings = self.config.hedging
+        observed = self.latency.percentile(
+            agent_name, f"{mc.provider}/{mc.model}", settings.percentile, min_samples=settings.min_samples,
+        )
+        return observed if observed is not None else settings.default_delay_seconds
+
+    def _start_hedge(self, agent_name: str, primary: ModelConfig, secondary: ModelConfig, delay: float) -> None:
+        self._hedges_used[agent_name] = self._hedges_used.get(agent_name, 0) + 1
+        logger.info(
+            "Hedging %s: %s/%s slower than %.1fs, also asking %s/%s (%d/%d hedges used)",
+            agent_name, primary.provider, primary.model, delay, secondary.provider, secondary.model,
+            self._hedges_used[agent_name], self.config.hedging.budgets.get(agent_name, 0),
+        )
 
-        # All providers failed — wait and retry once
+    def _invoke_hedged(
+        self,
+        agent_name: str,
+        primary: ModelConfig,
+        secondary: ModelConfig,
+        messages: list[BaseMessage],
+        tools: list[Any] | None,
+        digest: str | None,
+    ) -> Any:
+        """Call the primary; if it is slow, race it against the secondary.
+
+        The first successful answer wins. A primary that fails before the
+        hedge delay simply falls through to the secondary (no budget spent).
+        A losing sync call cannot be interrupted mid-request, so it is
+        abandoned: when it finishes, its tokens and cost are counted but its
+        result and health signal are dropped. The async variant cancels it.
+        Raises the last error if both providers fail.
+        """
+        delay = self._hedge_delay(agent_name, primary)
+        call = partial(
+            self._invoke_once, agent_name, messages=messages, tools=tools, digest=digest, race=_HedgeRace(),
+        )
+        # Each thread needs its own copy of the context to reach the node's UsageMeter
+        submit = lambda mc: _in_thread(contextvars.copy_context().run, call, mc=mc)  # noqa: E731
+        pending = {submit(primary)}
+        secondary_started = False
+        last_error: BaseException | None = None
+
+        done, _ = wait(pending, timeout=delay)
+        if not done:
+            self._start_hedge(agent_name, primary, secondary, delay)
+            pending.add(submit(secondary))
+            secondary_started = True
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                error = future.exception()
+                if error is None:
+                    return future.result()
+                last_error = error
+            if not pending and not secondary_started:
+                pending.add(submit(secondary))
+                secondary_started = True
+
+        raise last_error
+
+    async def _ainvoke_hedged(
+        self,
+        agent_name: str,
+        primary: ModelConfig,
+        secondary: ModelConfig,
+        messages: list[BaseMessage],
+        tools: list[Any] | None,
+        digest: str | None,
+    ) -> Any:
+        """Async variant of _invoke_hedged; the losing request is cancelled."""
+        delay = self._hedge_delay(agent_name, primary)
+        call = partial(
+            self._ainvoke_once, agent_name, messages=messages, tools=tools, digest=digest, race=_HedgeRace(),
+        )
+        pending = {asyncio.ensure_future(call(mc=primary))}
+        secondary_started = False
+        last_error: BaseException | None = None
+
+        try:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if not done:
+                self._start_hedge(agent_name, primary, secondary, delay)
+                pending.add(asyncio.ensure_future(call(mc=secondary)))
+                secondary_started = True
+
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    error = task.exception()
+                    if error is None:
+                        return task.result()
+                    last_error = error
+                if not pending and not secondary_started:
+                    pending.add(asyncio.ensure_future(call(mc=secondary)))
+                    secondary_started = True
+        finally:
+            for task in pending:
+                task.cancel()
+
+        raise last_error
+
+    def _prepare(self, mc: ModelConfig, messages: list[BaseMessage]) -> list[BaseMessage]:
+        """Provider-specific request shaping: prompt-cache breakpoints where supported."""
+        if self.config.prompt_caching and mc.provider in PROMPT_CACHE_PROVIDERS:
+            return with_cache_breakpoints(messages)
+        return messages
+
+    def _call_params(self) -> dict[str, Any]:
+        """Client settings that shape a response, for the cache key.
+
+        The client timeout is the one create_chat_model builds clients with
+        (it sets no max_tokens). Whether prompt-cache breakpoints are added
+        comes from prompt_caching; the cache key's model says if they apply.
+        """
+        return {"timeout": self.timeout, "prompt_caching": self.config.prompt_caching}
+
+    def _cached_response(self, agent_name: str, chain: list[ModelConfig], digest: str | None) -> Any:
+        """A recorded response for this exact call, if the cache is on and has one.
+
+        Raises CacheMiss in replay mode instead of falling through to a provider.
+        """
+        if digest is None:
+            return None
+        found = self.cache.lookup(chain, digest)
+        if found is None:
+            return None
+        response, mc = found
+        self._current_provider = f"{mc.provider}/{mc.model}"
+        logger.info("LLM cache hit: %s using %s", agent_name, self._current_provider)
+        return response
+
+    def _drop_late_response(self, agent_name: str, provider_key: str, response: Any) -> None:
+        """Bill the answer of a hedged call that lost the race, and drop it.
+
+        The provider charged for it, so its usage counts toward the run totals
+        and budgets; its latency, health signal and provider are the winner's to set.
+        """
+        counts, cost = self._record_usage(provider_key, response)
+        logger.info(
+            "Dropped the losing hedged response: agent=%s provider=%s tokens=%d/%d cost=$%.4f",
+            agent_name, provider_key, counts["input"], counts["output"], cost,
+        )
+
+    def _record_failure(self, agent_name: str, provider_key: str, error: Exception) -> None:
+        self.health.record_failure(provider_key, error)
+        delay = self.retry.record_failure(provider_key, error)
         logger.warning(
-            "All providers failed. Waiting %ds before final retry...",
-            self.config.fallback_wait_seconds,
+            "LLM call failed: agent=%s provider=%s error=%s (backoff %.1fs)",
+            agent_name, provider_key, str(error), delay,
         )
-        time.sleep(self.config.fallback_wait_seconds)
 
+    def _record_success(
+        self,
+        agent_name: str,
+        provider_key: str,
+        response: Any,
+        elapsed_ms: float,
+        ttft_ms: float | None = None,
+    ) -> None:
+        """Update health/backoff, track token usage and cost, and log the call."""
+        self.health.record_success(provider_key)
+        self.retry.record_success(provider_key)
+        self.latency.record(agent_name, provider_key, elapsed_ms / 1000)
+        self._current_provider = provider_key
+        counts, cost = self._record_usage(provider_key, response)
+
+        log_llm_call(
+            logger,
+            agent=agent_name,
+            provider=provider_key,
+            tokens_in=counts["input"],
+            tokens_out=counts["output"],
+            latency_ms=elapsed_ms,
+            cache_read=counts["cache_read"],
+            cache_write=counts["cache_write"],
+            ttft_ms=ttft_ms,
+            cost_usd=cost,
+        )
+
+    def _record_usage(self, provider_key: str, response: Any) -> tuple[dict[str, int], float]:
+        """Price a response and add it to the run totals and the node's UsageMeter."""
+        usage = getattr(response, "usage_metadata", None) or {}
+        details = usage.get("input_token_details") or {}
+        counts = {
+            "input": usage.get("input_tokens", 0),
+            "output": usage.get("output_tokens", 0),
+            "cache_read": details.get("cache_read") or 0,
+            "cache_write": details.get("cache_creation") or 0,
+        }
+        price = self.config.pricing.get(provider_key)
+        if price is None and usage and provider_key not in self._unpriced:
+            self._unpriced.add(provider_key)
+            logger.warning("No price for %s in config.yaml pricing; its calls are counted as $0", provider_key)
+        cost = call_cost(price, counts)
+        if usage:
+            add_usage(self._token_usage, provider_key, {**counts, "cost": cost})
+            meter = current_meter()
+            if meter is not None:
+                meter.add(provider_key, {**counts, "cost": cost})
+        return counts, cost
+
+    def _healthy_chain(self, chain: list[ModelConfig]) -> list[ModelConfig]:
+        """Drop providers with an open breaker, kicking off probes where due.
+
+        If every provider is unhealthy the full chain is returned: trying a
+        known-bad provider still beats failing without a call.
+        """
+        healthy: list[ModelConfig] = []
         for mc in chain:
-            try:
-                model = create_chat_model(mc, self.timeout)
-                if tools:
-                    model = model.bind_tools(tools)
-                return model.invoke(messages)
-            except Exception:
+            key = f"{mc.provider}/{mc.model}"
+            if (
+                self.config.circuit_breaker.probe_in_background
+                and self.health.state(key) == HALF_OPEN
+                and self.health.start_probe(key)
+            ):
+                # With the caller's context, so the probe is billed to the node that set it off
+                threading.Thread(
+                    target=contextvars.copy_context().run, args=(self._probe, mc), daemon=True,
+                ).start()
                 continue
+            if self.health.available(key):
+                healthy.append(mc)
+            else:
+                logger.debug("Skipping %s: circuit %s", key, self.health.state(key))
+        return healthy or chain
 
-        raise RuntimeError(f"All LLM providers exhausted after retry. Last error: {last_error}")
+    def _probe(self, mc: ModelConfig) -> None:
+        """Send a minimal request to a half-open provider; its usage counts like any call's."""
+        key = f"{mc.provider}/{mc.model}"
+        try:
+            response = self.get_client(mc).invoke([HumanMessage(content="ping")])
+        except Exception as e:
+            self.health.record_failure(key, e)
+        else:
+            self.health.record_success(key)
+            counts, cost = self._record_usage(key, response)
+            logger.info(
+                "Probe of %s succeeded: tokens=%d/%d cost=$%.4f", key, counts["input"], counts["output"], cost,
+            )
@@ -0,0 +1,213 @@
+"""Parallel task execution: one git worktree per task, merged back in order."""
+
+from __future__ import annotations
+
+import dataclasses
+import logging
+import shutil
+import subprocess
+from pathlib import Path
+from typing import Any, Callable
+
+from langgraph.graph import END
+from langgraph.types import Send
+
+from agent_runner.agents.planner import no_task_result, select_task
+from agent_runner.commands import drop_runner
+from agent_runner.depgraph import DependencyGraph
+from agent_runner.diagnostics import drop_daemon
+from agent_runner.search import drop_index
+from agent_runner.state import AgentState, Task
+from agent_runner.symbols import drop_symbols
+from agent_runner.tools import make_tools
+from agent_runner.transcripts import archive_transcript
+from agent_runner.usage import usage_since
+
+logger = logging.getLogger("agent_runner")
+
+BRANCH_PREFIX = "agent/"
+
+# Dependency directories linked into each worktree so tsc/eslint work there
+NODE_MODULES_GLOBS = ("node_modules", "apps/*/node_modules", "packages/*/node_modules")
+
+
+def _git(args: list[str], cwd: Path, check: bool = False) -> subprocess.CompletedProcess:
+    return subprocess.run(["git", *args], capture_output=True, text=True, cwd=str(cwd), check=check)
+
+
+def create_worktree(project_dir: Path, worktree_root: Path, task_id: str) -> tuple[Path, str]:
+    """Create a fresh worktree on branch agent/<task_id> from the current HEAD."""
+    branch = f"{BRANCH_PREFIX}{task_id}"
+    path = worktree_root / task_id
+
+    _git(["worktree", "prune"], project_dir)
+    if path.exists():
+        _git(["worktree", "remove", "--force", str(path)], project_dir)
+        shutil.rmtree(path, ignore_errors=True)
+    worktree_root.mkdir(parents=True, exist_ok=True)
+    _git(["worktree", "add", "-B", branch, str(path), "HEAD"], project_dir, check=True)
+
+    _exclude_node_modules(project_dir)
+    for pattern in NODE_MODULES_GLOBS:
+        for source in project_dir.glob(pattern):
+            target = path / source.relative_to(project_dir)
+            if source.is_dir() and not target.exists() and target.parent.exists():
+                target.symlink_to(source, target_is_directory=True)
+
+    return path, branch
+
+
+def _exclude_node_modules(project_dir: Path) -> None:
+    """Keep the symlinked node_modules out of `git add -A` in every worktree."""
+    common_dir = _git(["rev-parse", "--git-common-dir"], project_dir).stdout.strip()
+    exclude = (project_dir / common_dir / "info" / "exclude").resolve()
+    existing = exclude.read_text(encoding="utf-8") if exclude.exists() else ""
+    if "node_modules" not in existing.splitlines():
+        exclude.parent.mkdir(parents=True, exist_ok=True)
+        exclude.write_text(existing.rstrip("\n") + "\nnode_modules\n", encoding="utf-8")
+
+
+def remove_worktree(project_dir: Path, path: Path, branch: str, *, delete_branch: bool) -> None:
+    _git(["worktree", "remove", "--force", str(path)], project_dir)
+    drop_index(path)
+    drop_symbols(path)
+    drop_runner(path)
+    drop_daemon(path)
+    if delete_branch:
+        _git(["branch", "-D", branch], project_dir)
+
+
+def merge_branch(project_dir: Path, branch: str) -> tuple[bool, str]:
+    """Merge a task branch into the current branch; abort cleanly on conflict."""
+    result = _git(["merge", "--no-edit", branch], project_dir)
+    if result.returncode == 0:
+        return True, result.stdout
+
+    conflicts = _git(["diff", "--name-only", "--diff-filter=U"], project_dir).stdout.split()
+    _git(["merge", "--abort"], project_dir)
+    detail = f"conflicts in: {', '.join(conflicts)}" if conflicts else (result.stderr or result.stdout).strip()
+    return False, detail
+
+
+def dispatch_node(state: AgentState, *, app_config: Any, max_workers: int, deps: DependencyGraph) -> dict:
+    """Pick up to max_workers ready tasks and give each its own worktree."""
+    ready = deps.sync(state["tasks"], state["task_status"]).ready(limit=max_workers)
+    if not ready:
+        return {**no_task_result(state, deps), "batch": []}
+
+    project_dir = Path(app_config.project_dir)
+    if _git(["status", "--porcelain"], project_dir).stdout.strip():
+        logger.warning("Working tree has uncommitted changes; they will not be visible to parallel tasks")
+
+    batch = []
+    for task in ready:
+        path, branch = create_worktree(project_dir, app_config.worktree_dir, task.id)
+        batch.append({"task": task, "worktree": str(path), "branch": branch})
+
+    logger.info("Dispatching %d tasks in parallel: %s", len(batch), ", ".join(b["task"].id for b in batch))
+    return {"batch": batch, "current_task": None, "error": None}
+
+
+def route_after_dispatch(state: AgentState) -> list[Send] | str:
+    """Fan out one worker per dispatched task, or end when nothing is left."""
+    batch = state.get("batch") or []
+    if not batch:
+        return END
+    return [
+        Send("worker", {
+            **item,
+            "task_status": state["task_status"],
+            "tasks": state["tasks"],
+            "token_usage": state.get("token_usage") or {},
+        })
+        for item in batch
+    ]
+
+
+def _worker_input(payload: dict, app_config: Any) -> tuple[dict, Any]:
+    task: Task = payload["task"]
+    task_config = dataclasses.replace(app_config, project_dir=Path(payload["worktree"]))
+    state = {
+        "tasks": payload["tasks"],
+        "task_status": dict(payload["task_status"]),
+        "git_dirty": False,
+        "retry_count": 0,
+        "current_llm": "",
+        "error": None,
+        "review_feedback": None,
+        "phase": task.phase,
+        # The run's usage so far, so workers see the run budget; only the delta is reported back
+        "token_usage": payload.get("token_usage") or {},
+        **select_task(task, task_config),
+    }
+    return state, task_config
+
+
+def _worker_result(payload: dict, final: dict, app_config: Any) -> dict:
+    task: Task = payload["task"]
+    committed = final.get("task_status", {}).get(task.id) == "done"
+    status = "done" if committed or final.get("error") is None else "failed"
+    # A finished task's committer already archived its transcript
+    archive_transcript(app_config, task.id, final.get("messages", []))
+    logger.info("Worker finished %s: %s", task.id, status)
+    return {
+        "token_usage": usage_since(final.get("token_usage") or {}, payload.get("token_usage") or {}),
+        "review_rounds": final.get("review_rounds") or {},
+        "batch_results": [{
+            "task_id": task.id,
+            "branch": payload["branch"],
+            "worktree": payload["worktree"],
+            "status": status,
+            "error": final.get("error"),
+        }],
+    }
+
+
+def worker_node(payload: dict, *, app_config: Any, task_graph: Callable[[Any, list], Any]) -> dict:
+    """Run implementer -> reviewer -> committer for one task inside its worktree."""
+    state, task_config = _worker_input(payload, app_config)
+    tools = make_tools(
+        task_config.project_dir, app_config.allowed_commands, app_config.commands, app_config.diagnostics,
+    )
+    final = task_graph(task_config, tools).invoke(state)
+    return _worker_result(payload, final, app_config)
+
+
+async def worker_node_async(payload: dict, *, app_config: Any, task_graph: Callable[[Any, list], Any]) -> dict:
+    """Async variant of worker_node."""
+    state, task_config = _worker_input(payload, app_config)
+    tools = make_tools(
+        task_config.project_dir, app_config.allowed_commands, app_config.commands, app_config.diagnostics,
+    )
+    final = await task_graph(task_config, tools).ainvoke(state)
+    return _worker_result(payload, final, app_config)
+
+
+def merge_node(state: AgentState, *, app_config: Any, deps: DependencyGraph) -> dict:
+    """Merge finished task branches back in dependency order."""
+    project_dir = Path(app_config.project_dir)
+    deps.sync(state["tasks"], state["task_status"])
+    results = sorted(state.get("batch_results") or [], key=lambda r: deps.topo_index.get(r["task_id"], 0))
+
+    task_status = dict(state["task_status"])
+    for result in results:
+        task_id, branch, path = result["task_id"], result["branch"], Path(result["worktree"])
+        keep_branch = False
+
+        if result["status"] == "done":
+            merged, detail = merge_branch(project_dir, branch)
+            if merged:
+                task_status[task_id] = "done"
+                logger.info("Merged %s into the main worktree", branch)
+            else:
+                task_status[task_id] = "failed"
+                keep_branch = True
+                logger.error("Merge conflict for %s (%s); branch %s kept for manual resolution", task_id, detail, branch)
+        else:
+            task_status[task_id] = "failed"
+            logger.warning("Task %s failed in its worktree: %s", task_id, result.get("error"))
+
+        deps.mark(task_id, task_status[task_id])
+        remove_worktree(project_dir, path, branch, delete_branch=not keep_branch)
+
+    return {"task_status": task_status, "batch": [], "batch_results": None}
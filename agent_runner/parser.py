@@ -87,7 +87,11 @@ def parse_orchestration(file_path: str | Path) -> list[Task]:
 
 
 def get_unblocked_tasks(tasks: list[Task], status: dict[str, str]) -> list[Task]:
-    """Return tasks that are pending and have all dependencies satisfied."""
+    """Return tasks that are pending and have all dependencies satisfied.
+
+    A full rescan; graph nodes use depgraph.DependencyGraph, which keeps this
+    set up to date incrementally.
+    """
     done_ids = {tid for tid, s in status.items() if s == "done"}
     unblocked = []
 
@@ -0,0 +1,163 @@
+"""Review bundle: the changed files and their diff, built up front for the reviewer's first message."""
+
+from __future__ import annotations
+
+import os
+import subprocess
+from dataclasses import dataclass
+from pathlib import Path
+
+from agent_runner.commands import GIT_TIMEOUT_SECONDS, scratch_index
+from agent_runner.config import ReviewConfig
+from agent_runner.state import Task
+
+EMPTY_TREE = "4b825dc642cb6eb9a060e54bf8d69288fbee4904"  # git's empty tree, the base when there is no HEAD
+CHARS_PER_TOKEN = 4
+
+_STATUS = {"A": "new", "M": "modified", "D": "deleted", "R": "renamed", "C": "copied", "T": "type changed"}
+
+
+@dataclass
+class FileChange:
+    path: str
+    status: str  # A, M, D, R, C or T
+    old_path: str | None = None  # renames and copies
+    diff: str = ""
+    added: int = 0
+    removed: int = 0
+    size: int | None = None  # bytes, for new files
+
+    def describe(self) -> str:
+        status = _STATUS.get(self.status, self.status)
+        line = f"- {status} {self.old_path} -> {self.path}" if self.old_path else f"- {status} {self.path}"
+        if self.status == "A" and self.size is not None:
+            return line + f" ({self.added} lines, {_size(self.size)})"
+        if self.added or self.removed:
+            line += f" (+{self.added} -{self.removed})"
+        return line
+
+
+def diff_base(project_dir: Path) -> str:
+    """HEAD, or the empty tree before the first commit."""
+    head = subprocess.run(
+        ["git", "rev-parse", "--verify", "-q", "HEAD"],
+        cwd=str(project_dir), capture_output=True, text=True, timeout=GIT_TIMEOUT_SECONDS,
+    )
+    return "HEAD" if head.returncode == 0 else EMPTY_TREE
+
+
+def changes(project_dir: Path, context_lines: int = 3) -> list[FileChange]:
+    """Every change since HEAD, untracked files included, with its unified diff."""
+    base = diff_base(project_dir)
+    with scratch_index(project_dir) as env:
+        if env is None:
+            return []
+
+        def git(*args: str) -> str:
+            return subprocess.run(
+                ["git", "diff", "--cached", base, "-M", "--no-color", "--no-ext-diff", *args],
+                cwd=str(project_dir), env=env, capture_output=True, text=True, timeout=GIT_TIMEOUT_SECONDS,
+            ).stdout
+
+        found = _parse_name_status(git("--name-status", "-z"))
+        # --irreversible-delete: a deleted file's old content is no use to a review
+        patch = git(f"-U{context_lines}", "--irreversible-delete")
+    sections = _split_patch(patch)
+    for change, section in zip(found, sections):
+        change.diff = section
+        change.added, change.removed = _count_lines(section)
+        if change.status == "A":
+            try:
+                change.size = os.path.getsize(project_dir / change.path)
+            except OSError:
+                pass
+    return found
+
+
+def build_review_bundle(project_dir: Path, task: Task, config: ReviewConfig) -> str:
+    """The changed-file list and the diff, deliverables first.
+
+    Each file's diff is cut at `max_file_chars`; files that don't fit in
+    `token_budget` are listed without their diff.
+    """
+    found = changes(project_dir, config.diff_context)
+    if not found:
+        return ""
+    deliverables = set(task.deliverable_paths)
+    ordered = sorted(found, key=lambda c: c.path not in deliverables)  # stable: git's order otherwise
+    total_added = sum(c.added for c in found)
+    total_removed = sum(c.removed for c in found)
+
+    budget = config.token_budget * CHARS_PER_TOKEN
+    diffs, left_out = [], []
+    for change in ordered:
+        diff = _cap(change.diff, config.max_file_chars)
+        if len(diff) > budget:
+            left_out.append(change.path)
+            continue
+        budget -= len(diff)
+        diffs.append(diff)
+
+    parts = [
+        f"Changed files ({len(found)}, +{total_added} -{total_removed}):",
+        "\n".join(change.describe() for change in found),
+        f"\nDiff (-U{config.diff_context}):",
+        "".join(diffs).rstrip("\n"),
+    ]
+    if left_out:
+        parts.append(
+            "\nDiffs left out to stay within the review budget (read these files if they matter):\n"
+            + "\n".join(f"- {path}" for path in left_out)
+        )
+    return "\n".join(parts)
+
+
+def _parse_name_status(output: str) -> list[FileChange]:
+    fields = output.split("\0")
+    found = []
+    i = 0
+    while i < len(fields) and fields[i]:
+        status = fields[i][0]
+        if status in "RC":
+            found.append(FileChange(path=fields[i + 2], status=status, old_path=fields[i + 1]))
+            i += 3
+        else:
+            found.append(FileChange(path=fields[i + 1], status=status))
+            i += 2
+    return found
+
+
+def _split_patch(patch: str) -> list[str]:
+    """One section per file, in git's order: the same order as --name-status."""
+    sections: list[str] = []
+    for line in patch.splitlines(keepends=True):
+        if line.startswith("diff --git ") or not sections:
+            sections.append(line)
+        else:
+            sections[-1] += line
+    return sections
+
+
+def _count_lines(section: str) -> tuple[int, int]:
+    added = removed = 0
+    in_hunk = False
+    for line in section.splitlines():
+        if line.startswith("@@"):
+            in_hunk = True
+        elif in_hunk and line.startswith("+"):
+            added += 1
+        elif in_hunk and line.startswith("-"):
+            removed += 1
+    return added, removed
+
+
+def _cap(diff: str, max_chars: int) -> str:
+    if len(diff) <= max_chars:
+        return diff
+    cut = diff.rfind("\n", 0, max_chars) + 1 or max_chars
+    omitted = diff[cut:].count("\n")
+    return diff[:cut] + f"... [{omitted} more diff lines of this file omitted; read the file for the rest]\n"
+
+
+def _size(size: int) -> str:
+    return f"{size} B" if size < 1024 else f"{size / 1024:.1f} KB"
@@ -0,0 +1,142 @@
+"""Difficulty-based model tiers: easy tasks start on a cheap model and escalate on trouble."""
+
+from __future__ import annotations
+
+import json
+import logging
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from agent_runner.config import Config, ModelConfig, RoutingConfig
+from agent_runner.state import Task
+
+logger = logging.getLogger("agent_runner")
+
+
+@dataclass
+class TierStats:
+    """Review outcomes of implementer attempts made on one model."""
+
+    reviews: int = 0
+    approved: int = 0
+
+    @property
+    def success_rate(self) -> float:
+        return self.approved / self.reviews if self.reviews else 1.0
+
+
+def routing_stats_path(config: Config) -> Path:
+    """Where per-tier stats are persisted between runs."""
+    return config.checkpoint_dir / "routing_stats.json"
+
+
+class TierPolicy:
+    """Picks a task's starting tier, escalates it, and learns from review outcomes.
+
+    Difficulty is the number of deliverables plus the spec size in units of
+    spec_chars_per_point; each threshold it reaches moves the task one tier
+    up. A tier whose approval rate falls below min_success_rate (after
+    min_samples reviews) is skipped when tasks start, so a cheap model that
+    keeps getting rejected stops costing a wasted attempt per task.
+    """
+
+    def __init__(self, config: RoutingConfig, path: Path | None = None) -> None:
+        self.config = config
+        self.path = path
+        self._stats: dict[str, TierStats] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    @classmethod
+    def from_config(cls, config: Config) -> TierPolicy | None:
+        if not config.routing.enabled or not config.routing.tiers:
+            return None
+        return cls(config.routing, routing_stats_path(config))
+
+    @property
+    def top(self) -> int:
+        return len(self.config.tiers) - 1
+
+    def applies_to(self, agent_name: str) -> bool:
+        return agent_name in self.config.agents
+
+    def model(self, tier: int) -> ModelConfig:
+        return self.config.tiers[min(tier, self.top)]
+
+    def difficulty(self, task: Task, spec_chars: int) -> float:
+        return len(task.deliverables) + spec_chars / self.config.spec_chars_per_point
+
+    def start_tier(self, task: Task, project_dir: Path) -> int:
+        if any(phase in task.phase for phase in self.config.hard_phases):
+            tier = self.top
+            score = float("inf")
+        else:
+            score = self.difficulty(task, _spec_chars(task, project_dir))
+            tier = min(sum(1 for t in self.config.thresholds if score >= t), self.top)
+        while tier < self.top and self._underperforms(self.model(tier)):
+            tier += 1
+        mc = self.model(tier)
+        logger.info("Task %s (difficulty %.1f) starts on tier %d: %s/%s", task.id, score, tier, mc.provider, mc.model)
+        return tier
+
+    def escalate(self, tier: int, task: Task, reason: str) -> int:
+        if tier >= self.top:
+            return tier
+        mc = self.model(tier + 1)
+        logger.info("Escalating %s to tier %d (%s/%s): %s", task.id, tier + 1, mc.provider, mc.model, reason)
+        return tier + 1
+
+    def record_review(self, tier: int, approved: bool) -> None:
+        mc = self.model(tier)
+        with self._lock:
+            stats = self._stats.setdefault(f"{mc.provider}/{mc.model}", TierStats())
+            stats.reviews += 1
+            stats.approved += int(approved)
+            self._save()
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        with self._lock:
+            return {
+                key: {"reviews": s.reviews, "approved": s.approved, "success_rate": s.success_rate}
+                for key, s in self._stats.items()
+            }
+
+    def _underperforms(self, mc: ModelConfig) -> bool:
+        stats = self._stats.get(f"{mc.provider}/{mc.model}")
+        return (
+            stats is not None
+            and stats.reviews >= self.config.min_samples
+            and stats.success_rate < self.config.min_success_rate
+        )
+
+    def _load(self) -> None:
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            raw = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable routing stats file %s: %s", self.path, e)
+            return
+        for key, data in raw.items():
+            self._stats[key] = TierStats(reviews=data.get("reviews", 0), approved=data.get("approved", 0))
+
+    def _save(self) -> None:
+        if self.path is None:
+            return
+        data = {key: {"reviews": s.reviews, "approved": s.approved} for key, s in self._stats.items()}
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.write_text(json.dumps(data, indent=2), encoding="utf-8")
+        except OSError as e:
+            logger.warning("Could not persist routing stats: %s", e)
+
+
+def _spec_chars(task: Task, project_dir: Path) -> int:
+    if not task.spec:
+        return 0
+    try:
+        return (Path(project_dir) / task.spec).stat().st_size
+    except OSError:
+        return 0
@@ -0,0 +1,94 @@
+"""Deterministic task ranking over the Task.depends_on DAG."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from agent_runner.state import Task
+
+
+@dataclass(frozen=True)
+class TaskRank:
+    """Scheduling priority of a task. Higher critical path / fan-out go first."""
+
+    critical_path: int  # pending tasks on the longest dependency chain starting here
+    fan_out: int  # pending tasks that transitively depend on this one
+    phase_index: int
+    order: int  # position in ORCHESTRATION.md
+
+    @property
+    def key(self) -> tuple[int, int, int, int]:
+        """Sort key, smallest first."""
+        return (-self.critical_path, -self.fan_out, self.phase_index, self.order)
+
+    @property
+    def tie_key(self) -> tuple[int, int, int]:
+        """The key without document order; equal tie keys are genuine ties."""
+        return self.key[:3]
+
+
+def rank_tasks(tasks: list[Task], status: dict[str, str]) -> dict[str, TaskRank]:
+    """Rank every task by critical-path length, downstream fan-out and phase."""
+    index = {task.id: i for i, task in enumerate(tasks)}
+    dependents: list[list[int]] = [[] for _ in tasks]
+    for i, task in enumerate(tasks):
+        for dep in task.depends_on:
+            if dep in index:
+                dependents[index[dep]].append(i)
+
+    pending = [status.get(task.id, "pending") != "done" for task in tasks]
+    pending_mask = sum(1 << i for i, p in enumerate(pending) if p)
+
+    # Reverse topological sweep via iterative DFS; back edges (cycles) count as leaves.
+    critical = [0] * len(tasks)
+    descendants = [0] * len(tasks)
+    state = [0] * len(tasks)  # 0 = unvisited, 1 = on stack, 2 = done
+    for root in range(len(tasks)):
+        if state[root]:
+            continue
+        stack = [(root, iter(dependents[root]))]
+        state[root] = 1
+        while stack:
+            node, children = stack[-1]
+            child = next(children, None)
+            if child is None:
+                stack.pop()
+                state[node] = 2
+                longest = 0
+                reach = 0
+                for c in dependents[node]:
+                    if state[c] == 2:
+                        longest = max(longest, critical[c])
+                        reach |= descendants[c] | (1 << c)
+                critical[node] = longest + (1 if pending[node] else 0)
+                descendants[node] = reach
+            elif state[child] == 0:
+                state[child] = 1
+                stack.append((child, iter(dependents[child])))
+
+    phases: dict[str, int] = {}
+    for task in tasks:
+        phases.setdefault(task.phase, len(phases))
+
+    return {
+        task.id: TaskRank(
+            critical_path=critical[i],
+            fan_out=bin(descendants[i] & pending_mask).count("1"),
+            phase_index=phases[task.phase],
+            order=i,
+        )
+        for i, task in enumerate(tasks)
+    }
+
+
+def order_tasks(candidates: list[Task], ranks: dict[str, TaskRank]) -> list[Task]:
+    """Candidates sorted best-first."""
+    return sorted(candidates, key=lambda t: ranks[t.id].key)
+
+
+def top_ties(ordered: list[Task], ranks: dict[str, TaskRank]) -> list[Task]:
+    """The leading tasks of an ordered list that are indistinguishable by rank."""
+    if not ordered:
+        return []
+    best = ranks[ordered[0].id].tie_key
+    return [t for t in ordered if ranks[t.id].tie_key == best]
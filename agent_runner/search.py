@@ -0,0 +1,309 @@
+"""In-process code search over a trigram index of the working tree."""
+
+from __future__ import annotations
+
+import fnmatch
+import logging
+import os
+import re
+import subprocess
+import threading
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
+
+logger = logging.getLogger("agent_runner")
+
+MAX_FILE_BYTES = 1024 * 1024  # Larger files are assumed to be generated or data, and skipped
+MAX_MATCHES = 200
+MAX_MATCHES_PER_FILE = 20
+MAX_CONTEXT_LINES = 5
+MAX_LINE_CHARS = 300
+SKIP_DIRS = frozenset({".git", "node_modules"})  # when the tree is not a git checkout
+
+
+@dataclass
+class _IndexedFile:
+    mtime_ns: int
+    size: int
+    text: str | None  # None for binary or oversized files, which are tracked but not searched
+    trigrams: frozenset[str] = field(repr=False)
+
+
+def trigrams(text: str) -> set[str]:
+    lowered = text.lower()
+    return {lowered[i:i + 3] for i in range(len(lowered) - 2)}
+
+
+def required_literals(pattern: str) -> list[str]:
+    """Literal runs every match of the regex must contain.
+
+    Deliberately conservative: only top-level literals count, a character
+    made optional by a quantifier is dropped, and any alternation means
+    nothing is required (every file is a candidate).
+    """
+    runs: list[str] = []
+    current: list[str] = []
+    depth = 0
+    i = 0
+
+    def end_run() -> None:
+        if current:
+            runs.append("".join(current))
+            current.clear()
+
+    while i < len(pattern):
+        c = pattern[i]
+        literal = None
+        if c == "\\":
+            escaped = pattern[i + 1:i + 2]
+            if escaped and not escaped.isalnum():
+                literal = escaped
+            else:
+                end_run()  # \d, \w, \b, backreferences...
+            i += 2
+        elif c == "[":
+            end_run()
+            i += 1
+            if pattern[i:i + 1] == "^":
+                i += 1
+            if pattern[i:i + 1] == "]":
+                i += 1
+            while i < len(pattern) and pattern[i] != "]":
+                i += 2 if pattern[i] == "\\" else 1
+            i += 1
+            continue
+        elif c == "|":
+            return []
+        else:
+            i += 1
+            if c == "(":
+                depth += 1
+                end_run()
+            elif c == ")":
+                depth -= 1
+                end_run()
+            elif c in "?*":
+                if current:
+                    current.pop()
+                end_run()
+            elif c == "{":
+                bounds = re.match(r"(\d*)(?:,\d*)?\}", pattern[i:])
+                if bounds is None:
+                    literal = c  # not a quantifier, Python matches it literally
+                else:
+                    if current and not int(bounds.group(1) or 0):
+                        current.pop()  # {0,n}: the character may be absent
+                    end_run()
+                    i += bounds.end()
+            elif c in "+.^$":
+                end_run()
+            else:
+                literal = c
+        if literal is not None:
+            if depth == 0:
+                current.append(literal)
+            else:
+                end_run()
+    end_run()
+    return [run for run in runs if len(run) >= 3]
+
+
+class SearchIndex:
+    """Trigram index of the working tree's text files, kept in memory.
+
+    The file list comes from `git ls-files -co --exclude-standard`, so
+    .gitignore'd paths such as node_modules and build output are never
+    indexed. Each search refreshes the index first: files whose mtime or
+    size changed are re-read, deleted files are dropped. A search only
+    runs the regex over files containing every trigram of the pattern's
+    required literals.
+    """
+
+    def __init__(self, root: Path, *, max_file_bytes: int = MAX_FILE_BYTES) -> None:
+        self.root = Path(root)
+        self.max_file_bytes = max_file_bytes
+        self._files: dict[str, _IndexedFile] = {}
+        self._postings: dict[str, set[str]] = {}
+        self._lock = threading.Lock()
+
+    def refresh(self) -> None:
+        seen = set()
+        changed = 0
+        for rel in self._list_files():
+            seen.add(rel)
+            try:
+                st = (self.root / rel).stat()
+            except OSError:
+                continue
+            indexed = self._files.get(rel)
+            if indexed is not None and indexed.mtime_ns == st.st_mtime_ns and indexed.size == st.st_size:
+                continue
+            self._remove(rel)
+            self._add(rel, st.st_mtime_ns, st.st_size)
+            changed += 1
+        removed = set(self._files) - seen
+        for rel in removed:
+            self._remove(rel)
+        if changed or removed:
+            logger.debug("Search index: %d files (re)indexed, %d removed", changed, len(removed))
+
+    def search(
+        self,
+        pattern: str,
+        *,
+        path: str = ".",
+        file_glob: str = "",
+        context: int = 0,
+        max_matches: int = MAX_MATCHES,
+    ) -> str:
+        """grep -n style output: `file:line:text`, context lines as `file-line-text`."""
+        try:
+            regex = re.compile(pattern)
+        except re.error as e:
+            return f"Error: Invalid regex {pattern!r}: {e}"
+        context = max(0, min(context, MAX_CONTEXT_LINES))
+        literals = required_literals(pattern)
+
+        with self._lock:
+            self.refresh()
+            candidates = self._candidates(literals)
+            hits = []
+            for rel in candidates:
+                text = self._files[rel].text
+                if text is None or not _in_scope(rel, path, file_glob):
+                    continue
+                lines = text.splitlines()
+                matched = [n for n, line in enumerate(lines) if regex.search(line)]
+                if matched:
+                    hits.append((rel, lines, matched))
+
+        if not hits:
+            return "No matches found."
+        hits.sort(key=lambda hit: _rank(hit[0], len(hit[2]), literals))
+        return _format(hits, context, max_matches)
+
+    def texts(self, suffixes: tuple[str, ...]) -> Iterator[tuple[str, int, str]]:
+        """(path, mtime_ns, text) of every searchable file with one of the suffixes, after a refresh."""
+        with self._lock:
+            self.refresh()
+            files = [(rel, f.mtime_ns, f.text) for rel, f in self._files.items() if f.text is not None]
+        for rel, mtime_ns, text in files:
+            if rel.endswith(suffixes):
+                yield rel, mtime_ns, text
+
+    def _list_files(self) -> list[str]:
+        try:
+            result = subprocess.run(
+                ["git", "ls-files", "-co", "--exclude-standard", "-z"],
+                capture_output=True, text=True, timeout=30, cwd=str(self.root),
+            )
+        except (OSError, subprocess.TimeoutExpired):
+            result = None
+        if result is not None and result.returncode == 0:
+            return [rel for rel in result.stdout.split("\0") if rel]
+        files = []
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS]
+            rel_dir = os.path.relpath(dirpath, self.root)
+            files.extend(os.path.normpath(os.path.join(rel_dir, name)) for name in filenames)
+        return files
+
+    def _add(self, rel: str, mtime_ns: int, size: int) -> None:
+        if size > self.max_file_bytes:
+            self._files[rel] = _IndexedFile(mtime_ns, size, None, frozenset())
+            return
+        try:
+            data = (self.root / rel).read_bytes()
+        except OSError:
+            return
+        if b"\0" in data[:8192]:
+            self._files[rel] = _IndexedFile(mtime_ns, size, None, frozenset())
+            return
+        text = data.decode("utf-8", errors="replace")
+        grams = frozenset(trigrams(text))
+        self._files[rel] = _IndexedFile(mtime_ns, size, text, grams)
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(rel)
+
+    def _remove(self, rel: str) -> None:
+        indexed = self._files.pop(rel, None)
+        if indexed is None:
+            return
+        for gram in indexed.trigrams:
+            posting = self._postings.get(gram)
+            if posting is not None:
+                posting.discard(rel)
+                if not posting:
+                    del self._postings[gram]
+
+    def _candidates(self, literals: list[str]) -> list[str]:
+        grams = set().union(*(trigrams(literal) for literal in literals)) if literals else set()
+        if not grams:
+            return list(self._files)
+        postings = sorted((self._postings.get(gram, set()) for gram in grams), key=len)
+        return list(set.intersection(*postings)) if postings[0] else []
+
+
+_indexes: dict[Path, SearchIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def search_index(root: Path) -> SearchIndex:
+    """The shared index of a working tree; search, symbols and the repo map all use it."""
+    key = Path(root).resolve()
+    with _indexes_lock:
+        if key not in _indexes:
+            _indexes[key] = SearchIndex(key)
+        return _indexes[key]
+
+
+def drop_index(root: Path) -> None:
+    """Forget a working tree's index, e.g. once its worktree is removed."""
+    with _indexes_lock:
+        _indexes.pop(Path(root).resolve(), None)
+
+
+def _in_scope(rel: str, path: str, file_glob: str) -> bool:
+    """grep -r semantics: `path` is a file or a directory prefix, the glob matches base names."""
+    if file_glob and not fnmatch.fnmatch(os.path.basename(rel), file_glob):
+        return False
+    prefix = os.path.normpath(path)
+    return prefix == "." or rel == prefix or rel.startswith(prefix + "/")
+
+
+def _rank(rel: str, match_count: int, literals: list[str]) -> tuple:
+    """Files named after the search term first, then source over tests, then by match count."""
+    name = os.path.basename(rel).lower()
+    named = any(literal.lower() in name for literal in literals)
+    test = any(part in rel for part in ("test", "spec", "__mocks__"))
+    return (not named, test, -match_count, rel)
+
+
+def _format(hits: list[tuple[str, list[str], list[int]]], context: int, max_matches: int) -> str:
+    out: list[str] = []
+    shown = skipped_matches = skipped_files = 0
+    for rel, lines, matched in hits:
+        budget = min(MAX_MATCHES_PER_FILE, max_matches - shown)
+        if budget <= 0:
+            skipped_matches += len(matched)
+            skipped_files += 1
+            continue
+        selected = set(matched[:budget])
+        skipped_matches += len(matched) - len(selected)
+        shown += len(selected)
+        last = None
+        for n in sorted(selected):
+            start = n - context if last is None else max(n - context, last + 1)
+            end = min(n + context, len(lines) - 1)
+            if context and out and (last is None or start > last + 1):
+                out.append("--")
+            for k in range(max(start, 0), end + 1):
+                sep = ":" if k in selected else "-"
+                out.append(f"{rel}{sep}{k + 1}{sep}{lines[k][:MAX_LINE_CHARS]}")
+            last = max(end, last if last is not None else end)
+    if skipped_matches:
+        note = f"... [{skipped_matches} more matches"
+        note += f" in {skipped_files} more files" if skipped_files else ""
+        out.append(note + " not shown; narrow the pattern, path or file_glob]")
+    return "\n".join(out)
@@ -2,12 +2,15 @@
 
 from __future__ import annotations
 
+import re
 from dataclasses import dataclass, field
-from typing import Any
+from typing import Annotated, Any
 
 from langchain_core.messages import BaseMessage
 from langgraph.graph import MessagesState
 
+_BACKTICKED = re.compile(r"`([^`]+)`")
+
 
 @dataclass
 class Task:
@@ -22,6 +25,52 @@ class Task:
     commit_message: str | None = None
     done: bool = False
 
+    @property
+    def deliverable_paths(self) -> list[str]:
+        """The path each deliverable names: its first backticked span, else its first word.
+
+        "`src/a.tsx` — form" and "Modify: `src/a.tsx`" both name "src/a.tsx".
+        """
+        paths = []
+        for deliverable in self.deliverables:
+            quoted = _BACKTICKED.search(deliverable)
+            words = [quoted.group(1).strip()] if quoted else deliverable.split()
+            if words and words[0]:
+                paths.append(words[0])
+        return paths
+
+
+def merge_batch_results(current: list[dict] | None, update: list[dict] | None) -> list[dict]:
+    """Reducer for parallel worker results: workers append, None clears."""
+    if update is None:
+        return []
+    return (current or []) + update
+
+
+def merge_token_usage(current: dict | None, update: dict | None) -> dict:
+    """Reducer for token_usage: nodes report their own calls, which are summed per provider."""
+    merged = {provider: dict(counts) for provider, counts in (current or {}).items()}
+    for provider, counts in (update or {}).items():
+        totals = merged.setdefault(provider, {})
+        for key, value in counts.items():
+            totals[key] = totals.get(key, 0) + value
+    return merged
+
+
+def merge_counts(current: dict | None, update: dict | None) -> dict:
+    """Reducer for review_rounds: counts are summed per key."""
+    merged = dict(current or {})
+    for key, value in (update or {}).items():
+        merged[key] = merged.get(key, 0) + value
+    return merged
+
+
+def add_task_cost(current: float | None, update: float | None) -> float:
+    """Reducer for task_cost: nodes add their spend, None resets it for a new task."""
+    if update is None:
+        return 0.0
+    return (current or 0.0) + update
+
 
 class AgentState(MessagesState):
     """Shared state across all graph nodes."""
@@ -33,5 +82,12 @@ class AgentState(MessagesState):
     retry_count: int
     current_llm: str
     error: str | None
+    review_feedback: str | None  # reviewer's rejection, the only context a retry gets
+    model_tier: int | None  # index into routing.tiers for current_task; None until the implementer picks it
     phase: str
-    token_usage: dict[str, Any]  # provider -> {input: int, output: int, cost: float}
+    # provider -> {input, output, cache_read, cache_write: int, cost: float}
+    token_usage: Annotated[dict[str, dict[str, Any]], merge_token_usage]
+    task_cost: Annotated[float, add_task_cost]  # USD spent on current_task so far
+    review_rounds: Annotated[dict[str, int], merge_counts]  # LLM rounds a review took ("1", "2"...) -> reviews
+    batch: list[dict]  # parallel mode: [{task, worktree, branch}] being worked on
+    batch_results: Annotated[list[dict], merge_batch_results]
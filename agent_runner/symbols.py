@@ -0,0 +1,160 @@
+"""Exported TypeScript/JavaScript symbols of the working tree, and a task-ranked repo map."""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+
+from agent_runner.search import SearchIndex, search_index
+from agent_runner.state import Task
+
+logger = logging.getLogger("agent_runner")
+
+SOURCE_SUFFIXES = (".ts", ".tsx", ".js", ".jsx", ".mjs")
+MAX_RESULTS = 50
+
+_EXPORT = re.compile(
+    r"^export\s+(?:declare\s+)?(?P<default>default\s+)?(?:abstract\s+)?(?:async\s+)?"
+    r"(?P<keyword>function\*?|const|let|var|class|interface|type|enum)\s+(?P<name>[A-Za-z_$][\w$]*)",
+    re.MULTILINE,
+)
+_EXPORT_LIST = re.compile(r"^export\s+(?:type\s+)?\{(?P<names>[^}]*)\}", re.MULTILINE)
+_WORD = re.compile(r"[A-Za-z][a-z]+|[A-Z]+(?![a-z])|\d+")
+
+
+@dataclass(frozen=True)
+class Symbol:
+    name: str
+    kind: str  # component | hook | function | const | class | type | enum
+    path: str
+    line: int
+
+    def describe(self) -> str:
+        return f"{self.kind} {self.name} ({self.path}:{self.line})"
+
+
+def _kind(keyword: str, name: str, path: str) -> str:
+    if keyword in ("interface", "type"):
+        return "type"
+    if keyword in ("class", "enum"):
+        return keyword
+    if re.match(r"use[A-Z]", name):
+        return "hook"
+    if name[:1].isupper() and path.endswith((".tsx", ".jsx")):
+        return "component"
+    return "function" if keyword.startswith("function") else "const"
+
+
+def extract_symbols(path: str, text: str) -> list[Symbol]:
+    """Top-level exports: declarations and `export { a, b as c }` lists."""
+    symbols = []
+    for match in _EXPORT.finditer(text):
+        line = text.count("\n", 0, match.start()) + 1
+        symbols.append(Symbol(match["name"], _kind(match["keyword"], match["name"], path), path, line))
+    for match in _EXPORT_LIST.finditer(text):
+        line = text.count("\n", 0, match.start()) + 1
+        for item in match["names"].split(","):
+            name = item.split(" as ")[-1].strip().removeprefix("type ").strip()
+            if re.fullmatch(r"[A-Za-z_$][\w$]*", name) and name != "default":
+                symbols.append(Symbol(name, _kind("const", name, path), path, line))
+    return symbols
+
+
+def words(text: str) -> set[str]:
+    """Lower-cased words of identifiers and paths: useAuthStore -> {use, auth, store}."""
+    return {w.lower() for w in _WORD.findall(text) if len(w) >= 3}
+
+
+class SymbolIndex:
+    """Exports per file, re-extracted only for files whose mtime changed."""
+
+    def __init__(self, files: SearchIndex) -> None:
+        self.files = files
+        self._symbols: dict[str, tuple[int, list[Symbol]]] = {}
+        self._lock = threading.Lock()
+
+    def refresh(self) -> dict[str, list[Symbol]]:
+        with self._lock:
+            current = {}
+            for rel, mtime_ns, text in self.files.texts(SOURCE_SUFFIXES):
+                cached = self._symbols.get(rel)
+                if cached is None or cached[0] != mtime_ns:
+                    cached = (mtime_ns, extract_symbols(rel, text))
+                current[rel] = cached
+            self._symbols = current
+            return {rel: symbols for rel, (_, symbols) in current.items() if symbols}
+
+    def find(self, query: str = "", kind: str = "", limit: int = MAX_RESULTS) -> list[Symbol]:
+        """Symbols whose name contains the query (case-insensitive), exact matches first."""
+        needle = query.lower()
+        found = [
+            symbol
+            for symbols in self.refresh().values()
+            for symbol in symbols
+            if needle in symbol.name.lower() and (not kind or symbol.kind == kind)
+        ]
+        found.sort(key=lambda s: (s.name.lower() != needle, not s.name.lower().startswith(needle), s.path, s.line))
+        return found[:limit]
+
+    def repo_map(self, task: Task, context: str = "", *, max_files: int = 25) -> str:
+        """The exports of the files most relevant to a task, one line per file.
+
+        Files score for being (or sitting next to) a deliverable and for
+        words shared between their path or symbol names and the task's
+        title, deliverables and spec; ties go to files exporting more.
+        Path words found in most files are ignored.
+        """
+        by_file = self.refresh()
+        if not by_file:
+            return ""
+        deliverables = task.deliverable_paths
+        deliverable_dirs = {os.path.dirname(d) for d in deliverables}
+        terms = words(" ".join([task.title, *task.deliverables, context]))
+        path_words = {rel: words(os.path.splitext(rel)[0]) for rel in by_file}
+        # Words in most paths (src, components...) say nothing about relevance
+        counts = Counter(w for ws in path_words.values() for w in ws)
+        common = {w for w, n in counts.items() if n > len(by_file) / 2}
+
+        def rank(item: tuple[str, list[Symbol]]) -> tuple[int, int, str]:
+            rel, symbols = item
+            points = 0
+            if rel in deliverables:
+                points += 10
+            elif os.path.dirname(rel) in deliverable_dirs:
+                points += 3
+            points += 2 * len((path_words[rel] - common) & terms)
+            points += sum(1 for s in symbols if words(s.name) & terms)
+            return -points, -len(symbols), rel
+
+        ranked = sorted(by_file.items(), key=rank)
+        lines = []
+        for rel, symbols in ranked[:max_files]:
+            names = ", ".join(f"{s.name} ({s.kind})" for s in symbols[:12])
+            more = f", +{len(symbols) - 12} more" if len(symbols) > 12 else ""
+            lines.append(f"- {rel}: {names}{more}")
+        return "\n".join(lines)
+
+
+_indexes: dict[Path, SymbolIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def symbol_index(root: Path) -> SymbolIndex:
+    """The shared symbol index of a working tree, built on its search index."""
+    files = search_index(root)
+    with _indexes_lock:
+        index = _indexes.get(files.root)
+        if index is None or index.files is not files:
+            index = _indexes[files.root] = SymbolIndex(files)
+        return index
+
+
+def drop_symbols(root: Path) -> None:
+    """Forget a working tree's symbol index (see search.drop_index)."""
+    with _indexes_lock:
+        _indexes.pop(Path(root).resolve(), None)
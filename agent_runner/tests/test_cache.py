@@ -0,0 +1,106 @@
+"""Tests for the LLM response cache."""
+
+import os
+from pathlib import Path
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.tools import tool
+
+from agent_runner import models
+from agent_runner.cache import REPLAY, CacheMiss, ResponseCache, cache_key, content_digest
+from agent_runner.config import BudgetConfig, CacheConfig, ModelConfig
+from agent_runner.models import ModelRouter
+from agent_runner.tests.test_models import make_config
+from agent_runner.usage import BudgetExceeded, metered
+
+OPUS = ModelConfig("anthropic", "claude-opus-4-20250514")
+
+
+@tool
+def read_file(file_path: str) -> str:
+    """Read a file."""
+    return ""
+
+
+def test_digest_ignores_ids_but_not_content_or_tools() -> None:
+    a = [SystemMessage(content="sys", id="1"), HumanMessage(content="hi", id="2")]
+    b = [SystemMessage(content="sys", id="x"), HumanMessage(content="hi", id="y")]
+    assert content_digest(a) == content_digest(b)
+    assert content_digest(a) != content_digest(a, [read_file])
+    assert content_digest(a) != content_digest([SystemMessage(content="sys"), HumanMessage(content="hello")])
+    assert cache_key(OPUS, "d") != cache_key(ModelConfig("google", "gemini-2.0-flash"), "d")
+
+
+def test_repeated_calls_get_their_own_entries(tmp_path: Path) -> None:
+    cache = ResponseCache(tmp_path)
+    messages = [HumanMessage(content="review")]
+    first, second = cache.call_digest(messages), cache.call_digest(messages)
+    assert first != second
+
+    cache.put(OPUS, first, AIMessage(content="REJECTED: no"))
+    cache.put(OPUS, second, AIMessage(content="APPROVED"))
+    replay = ResponseCache(tmp_path, mode=REPLAY)
+    assert replay.lookup([OPUS], replay.call_digest(messages))[0].content == "REJECTED: no"
+    assert replay.lookup([OPUS], replay.call_digest(messages))[0].content == "APPROVED"
+    with pytest.raises(CacheMiss):
+        replay.lookup([OPUS], replay.call_digest(messages))
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path: Path) -> None:
+    cache = ResponseCache(tmp_path, max_bytes=2000)
+    for i in range(3):
+        cache.put(OPUS, f"d{i}", AIMessage(content=f"{i}" * 300))
+        path = cache._path(cache_key(OPUS, f"d{i}"))
+        os.utime(path, (1000 + i, 1000 + i))
+    cache.get(cache_key(OPUS, "d0"))  # touch: d1 is now the oldest
+
+    cache.put(OPUS, "d3", AIMessage(content="3" * 300))
+    assert cache.get(cache_key(OPUS, "d1")) is None
+    assert cache.get(cache_key(OPUS, "d0")) is not None
+    assert cache.get(cache_key(OPUS, "d3")) is not None
+
+
+class CountingModel:
+    calls = 0
+
+    def __init__(self, model_config: ModelConfig) -> None:
+        self.model_config = model_config
+
+    def invoke(self, messages: list) -> AIMessage:
+        CountingModel.calls += 1
+        return AIMessage(content=f"answer {CountingModel.calls}")
+
+
+def test_router_records_then_replays_offline(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(models, "create_chat_model", lambda mc, timeout=120: CountingModel(mc))
+    messages = [HumanMessage(content="Generate the commit message.")]
+
+    recorder = ModelRouter(make_config(tmp_path, llm_cache=CacheConfig(mode="record")))
+    assert recorder.invoke_with_fallback("committer", messages).content == "answer 1"
+
+    replayer = ModelRouter(make_config(tmp_path, llm_cache=CacheConfig(mode="replay")))
+    assert replayer.invoke_with_fallback("committer", messages).content == "answer 1"
+    with pytest.raises(CacheMiss):
+        replayer.invoke_with_fallback("committer", [HumanMessage(content="something new")])
+    assert CountingModel.calls == 1
+
+    # A change to the client settings is a different call
+    for changed in ({"request_timeout_seconds": 30}, {"prompt_caching": False}):
+        other = ModelRouter(make_config(tmp_path, llm_cache=CacheConfig(mode="replay"), **changed))
+        with pytest.raises(CacheMiss):
+            other.invoke_with_fallback("committer", messages)
+
+
+def test_cached_responses_are_served_after_the_budget_is_spent(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(models, "create_chat_model", lambda mc, timeout=120: CountingModel(mc))
+    messages = [HumanMessage(content="Generate the commit message.")]
+    ModelRouter(make_config(tmp_path, llm_cache=CacheConfig(mode="record"))).invoke_with_fallback("committer", messages)
+    calls = CountingModel.calls
+
+    router = ModelRouter(make_config(tmp_path, llm_cache=CacheConfig(mode="record"), budgets=BudgetConfig(run_usd=1.0)))
+    with metered({"token_usage": {"anthropic/claude-opus-4-20250514": {"cost": 5.0}}}):
+        assert router.invoke_with_fallback("committer", messages).content == f"answer {calls}"
+        with pytest.raises(BudgetExceeded):
+            router.invoke_with_fallback("committer", [HumanMessage(content="something new")])
+    assert CountingModel.calls == calls
@@ -0,0 +1,92 @@
+"""Tests for the run_command runner."""
+
+import asyncio
+import subprocess
+import time
+from pathlib import Path
+
+import pytest
+
+from agent_runner import commands
+from agent_runner.commands import CHECK_CACHE, CommandRunner, OutputBuffer, tree_hash
+from agent_runner.config import CommandsConfig
+
+
+def test_output_buffer_keeps_head_and_tail() -> None:
+    buffer = OutputBuffer(400)
+    for n in range(1, 1001):
+        buffer.write(f"line {n}\n".encode())
+    text = buffer.text()
+
+    assert text.startswith("line 1\nline 2\n")
+    assert text.endswith("line 999\nline 1000\n")
+    assert "bytes omitted" in text and "line 500\n" not in text
+    assert len(text) < 500
+
+
+def test_timeouts_use_the_longest_matching_prefix(tmp_path: Path) -> None:
+    config = CommandsConfig(timeout_seconds=60, timeouts={"npx": 200, "npx tsc": 300})
+    runner = CommandRunner(tmp_path, config)
+    assert runner.timeout_for("npx  tsc --noEmit") == 300
+    assert runner.timeout_for("npx eslint src") == 200
+    assert runner.timeout_for("git status") == 60
+
+
+@pytest.mark.parametrize("persistent_worker", [False, True])
+def test_runner_captures_output_and_kills_the_group_on_timeout(tmp_path: Path, persistent_worker: bool) -> None:
+    config = CommandsConfig(timeout_seconds=1, persistent_worker=persistent_worker)
+    runner = CommandRunner(tmp_path, config)
+    try:
+        result = runner.run("cd /; echo out; echo err >&2; exit 3")
+        assert (result.stdout, result.stderr, result.returncode) == ("out\n", "err\n", 3)
+        assert runner.run("pwd").stdout.strip() == str(tmp_path)  # the cd didn't leak
+
+        start = time.monotonic()
+        result = runner.run("echo started; sleep 30 | cat")
+        assert result.timed_out and time.monotonic() - start < 10
+        assert result.format().startswith("Error: Command timed out after 1s and was killed")
+        assert "started" in result.format()
+
+        assert runner.run("echo again").stdout == "again\n"  # a killed worker is replaced
+        assert asyncio.run(runner.arun("printf async")).stdout == "async"
+    finally:
+        runner.close()
+
+
+def test_background_processes_holding_the_output_are_killed(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(commands, "KILL_GRACE_SECONDS", 0.2)
+    runner = CommandRunner(tmp_path, CommandsConfig(timeout_seconds=10))
+    for run in (runner.run, lambda command: asyncio.run(runner.arun(command))):
+        start = time.monotonic()
+        result = run("echo started; sleep 30 & exit 2")
+        assert (result.stdout, result.returncode) == ("started\n", 2)  # not a timeout
+        assert time.monotonic() - start < 5
+
+
+def test_check_commands_are_cached_per_tree_state(tmp_path: Path) -> None:
+    repo, runs = tmp_path / "repo", tmp_path / "runs"
+    repo.mkdir()
+    subprocess.run(["git", "init", "-q"], cwd=repo, check=True)
+    (repo / ".gitignore").write_text("dist/\n")
+    (repo / "a.ts").write_text("const a = 1;\n")
+    runner = CommandRunner(repo, CommandsConfig(cached_commands=["echo check", "echo fix"]))
+    check = f"echo check >> {runs}; cat a.ts"
+    hits = CHECK_CACHE.hits
+
+    assert runner.run(check).stdout == runner.run(check).stdout == "const a = 1;\n"
+    assert runs.read_text().count("check") == 1 and CHECK_CACHE.hits == hits + 1
+
+    (repo / "dist").mkdir()
+    (repo / "dist" / "a.js").write_text("ignored")  # ignored files don't change the tree hash
+    assert runner.run(check).stdout == "const a = 1;\n" and runs.read_text().count("check") == 1
+    (repo / "a.ts").write_text("const a = 2;\n")  # untracked edits do
+    assert runner.run(check).stdout == "const a = 2;\n" and runs.read_text().count("check") == 2
+
+    fix = f"echo fix >> {runs}; date +%N >> a.ts"  # changes the tree it ran on, so never cached
+    runner.run(fix)
+    runner.run(fix)
+    assert runs.read_text().count("fix") == 2
+    assert subprocess.run(["git", "status", "--porcelain"], cwd=repo, capture_output=True, text=True).stdout == (
+        "?? .gitignore\n?? a.ts\n"  # the real index was never touched
+    )
+    assert tree_hash(tmp_path) is None  # not a git checkout
@@ -0,0 +1,96 @@
+"""Tests for implementer context compaction."""
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from agent_runner.compaction import compact_messages, estimate_tokens, pinned_prefix
+from agent_runner.config import CompactionConfig
+
+
+def _round(n: int, name: str, args: dict, output: str) -> list:
+    call_id = f"call-{n}"
+    return [
+        AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": call_id}]),
+        ToolMessage(content=output, tool_call_id=call_id),
+    ]
+
+
+def _transcript() -> list:
+    return [
+        SystemMessage(content="system"),
+        HumanMessage(content="Task: 1.1 - spec"),
+        *_round(1, "read_file", {"file_path": "a.ts"}, "old a\n" * 200),
+        *_round(2, "read_file", {"file_path": "b.ts"}, "b\n" * 200),
+        *_round(3, "edit_file", {"file_path": "a.ts", "old_string": "x", "new_string": "y"}, "Edited a.ts"),
+        *_round(4, "run_command", {"command": "npx tsc --noEmit"}, "error TS1\n" * 100),
+        *_round(5, "run_command", {"command": "npx tsc --noEmit"}, "ok"),
+    ]
+
+
+def test_stale_outputs_are_elided_and_spec_pinned() -> None:
+    messages = _transcript()
+    compacted, saved = compact_messages(messages, pinned=pinned_prefix(messages), config=CompactionConfig())
+
+    assert saved > 0
+    assert compacted[:2] == messages[:2]
+    assert "stale read_file output for a.ts" in compacted[3].content
+    assert compacted[5].content == messages[5].content  # b.ts was never touched again
+    assert "stale run_command" in compacted[9].content
+    assert compacted[11].content == "ok"
+
+
+def test_reads_of_other_ranges_are_not_stale() -> None:
+    messages = [
+        SystemMessage(content="system"),
+        HumanMessage(content="Task: 1.1 - spec"),
+        *_round(1, "read_file", {"file_path": "a.ts"}, "first half\n" * 100),
+        *_round(2, "read_file", {"file_path": "a.ts", "offset": 101}, "second half\n" * 100),
+        *_round(3, "read_file", {"file_path": "a.ts", "offset": 101}, "second half\n" * 100),
+    ]
+    compacted, _ = compact_messages(messages, pinned=2, config=CompactionConfig())
+    assert compacted[3].content == messages[3].content
+    assert "stale read_file" in compacted[5].content
+
+
+def test_old_rounds_are_summarized_over_budget() -> None:
+    messages = _transcript()
+    config = CompactionConfig(token_budget=10, keep_recent_rounds=2)
+    compacted, saved = compact_messages(messages, pinned=2, config=config)
+
+    assert compacted[:2] == messages[:2]
+    summary = compacted[2]
+    assert isinstance(summary, HumanMessage)
+    assert "read_file(b.ts)" in summary.content and "edit_file(a.ts) -> Edited a.ts" in summary.content
+    # Only the two most recent rounds remain, with tool results still paired
+    assert [type(m) for m in compacted[3:]] == [AIMessage, ToolMessage, AIMessage, ToolMessage]
+    assert estimate_tokens(compacted) < estimate_tokens(messages)
+
+    # Compacting again extends the same summary rather than stacking a new one
+    again, _ = compact_messages(compacted + _round(6, "list_directory", {"dir_path": "."}, "f x"), pinned=2, config=config)
+    assert sum(1 for m in again if isinstance(m, HumanMessage)) == 2
+    assert "run_command(npx tsc --noEmit)" in again[2].content
+
+
+def test_disabled_is_a_no_op() -> None:
+    messages = _transcript()
+    compacted, saved = compact_messages(messages, pinned=2, config=CompactionConfig(enabled=False))
+    assert compacted is messages and saved == 0
+
+
+def test_reads_of_files_changed_on_disk_are_stale(tmp_path) -> None:
+    path = tmp_path / "a.ts"
+    path.write_text("const a = 1;\n")
+    st = path.stat()
+    artifact = {"path": str(path), "signature": [st.st_mtime_ns, st.st_size]}
+    messages = [
+        SystemMessage(content="system"),
+        HumanMessage(content="Task: 1.1 - spec"),
+        *_round(1, "read_file", {"file_path": "a.ts"}, "const a = 1;\n" * 200),
+    ]
+    messages[3].artifact = artifact
+
+    compacted, _ = compact_messages(messages, pinned=2, config=CompactionConfig())
+    assert compacted[3].content == messages[3].content
+
+    path.write_text("const a = 2; // reformatted\n")  # e.g. by `npx prettier --write`
+    compacted, _ = compact_messages(messages, pinned=2, config=CompactionConfig())
+    assert "the file has changed since" in compacted[3].content
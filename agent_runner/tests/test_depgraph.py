@@ -0,0 +1,76 @@
+"""Tests for incremental dependency tracking."""
+
+import pytest
+
+from agent_runner.depgraph import DependencyError, DependencyGraph
+from agent_runner.state import Task
+
+
+def make_tasks() -> list[Task]:
+    return [
+        Task(id="P1-T1", title="A", phase="Phase 1"),
+        Task(id="P1-T2", title="B", phase="Phase 1", depends_on=["P1-T1"]),
+        Task(id="P1-T3", title="C", phase="Phase 1", depends_on=["P1-T1"]),
+        Task(id="P1-T4", title="D", phase="Phase 1", depends_on=["P1-T2", "P1-T3"]),
+        Task(id="P2-T1", title="E", phase="Phase 2", depends_on=["P1-T4", "P1-T9"]),
+    ]
+
+
+def ids(tasks: list[Task]) -> list[str]:
+    return [t.id for t in tasks]
+
+
+def test_ready_queue_updates_incrementally() -> None:
+    deps = DependencyGraph(make_tasks(), {})
+    assert ids(deps.ready()) == ["P1-T1"]
+    assert deps.missing == {"P2-T1": ["P1-T9"]}
+
+    deps.mark("P1-T1", "done")
+    assert ids(deps.ready()) == ["P1-T2", "P1-T3"]
+
+    deps.mark("P1-T2", "done")
+    assert ids(deps.ready()) == ["P1-T3"]
+    deps.mark("P1-T3", "failed")
+    assert deps.ready() == []
+    assert ids(deps.blocked()) == ["P1-T4", "P2-T1"]
+
+    deps.mark("P1-T3", "done")
+    assert ids(deps.ready(limit=1)) == ["P1-T4"]
+    deps.mark("P1-T4", "done")
+    assert deps.ready() == []  # P1-T9 does not exist
+
+
+def test_matches_full_rescan() -> None:
+    tasks = make_tasks()
+    status = {"P1-T1": "done", "P1-T2": "done"}
+    assert ids(DependencyGraph(tasks, status).ready()) == ["P1-T3"]
+
+
+def test_cycle_detected_at_load() -> None:
+    tasks = [
+        Task(id="P1-T1", title="A", phase="Phase 1"),
+        Task(id="P1-T2", title="B", phase="Phase 1", depends_on=["P1-T3"]),
+        Task(id="P1-T3", title="C", phase="Phase 1", depends_on=["P1-T2"]),
+    ]
+    deps = DependencyGraph(tasks, {})
+    assert deps.cycle == ["P1-T2", "P1-T3"]
+    with pytest.raises(DependencyError):
+        deps.check()
+
+
+def test_sync_rebuilds_only_for_new_task_list() -> None:
+    tasks = make_tasks()
+    deps = DependencyGraph()
+    deps.sync(tasks, {})
+    deps.mark("P1-T1", "done")
+    deps.sync(tasks, {})
+    assert ids(deps.ready()) == ["P1-T2", "P1-T3"]
+
+    deps.sync(list(tasks), {"P1-T1": "done", "P1-T2": "done", "P1-T3": "done"})
+    assert ids(deps.ready()) == ["P1-T4"]
+
+
+def test_topological_order_follows_document_order() -> None:
+    deps = DependencyGraph(make_tasks(), {})
+    order = sorted(deps.topo_index, key=deps.topo_index.get)
+    assert order == ["P1-T1", "P1-T2", "P1-T3", "P1-T4", "P2-T1"]
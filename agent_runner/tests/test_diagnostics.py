@@ -0,0 +1,96 @@
+"""Tests for the background typecheck and lint daemon."""
+
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from agent_runner.config import DiagnosticsConfig
+from agent_runner.diagnostics import DiagnosticsDaemon, close_daemons, diagnostics_daemon
+from agent_runner.tools import make_tools
+
+# Stands in for `tsc --watch`: rebuilds whenever a .ts file changes, flagging `any`
+FAKE_TSC = '''
+import os, sys, time
+def build(label):
+    print(f"12:00:00 AM - {label}...", flush=True)
+    for name in sorted(os.listdir(".")):
+        if name.endswith(".ts"):
+            for n, line in enumerate(open(name), 1):
+                if ": any" in line:
+                    print(f"{name}({n},5): error TS7006: Parameter has an 'any' type.", flush=True)
+                    print("  Use a specific type.", flush=True)
+    print("12:00:01 AM - Found 0 errors. Watching for file changes.", flush=True)
+seen = None
+while True:
+    state = {n: os.stat(n).st_mtime_ns for n in os.listdir(".") if n.endswith(".ts")}
+    if state != seen:
+        build("Starting compilation in watch mode" if seen is None else "File change detected. Starting incremental compilation")
+        seen = state
+    time.sleep(0.05)
+'''
+
+# Stands in for node running the ESLint server: answers every request with one warning per file
+FAKE_NODE = '''
+import json, sys
+print(json.dumps({"ready": True}), flush=True)
+for line in sys.stdin:
+    request = json.loads(line)
+    messages = [{"path": f, "line": 1, "col": 1, "severity": "warning", "code": "no-console", "message": "Unexpected console"}
+                for f in request["files"]]
+    print("some plugin chatter", flush=True)
+    print(json.dumps({"id": request["id"], "messages": messages}), flush=True)
+'''
+
+
+def _config(tmp_path: Path, **overrides) -> DiagnosticsConfig:
+    (tmp_path / "fake_tsc.py").write_text(FAKE_TSC)
+    node = tmp_path / "fake_node"
+    node.write_text(f"#!{sys.executable}\n{FAKE_NODE}")
+    node.chmod(0o755)
+    values = dict(
+        enabled=True, tsc_command=f"{sys.executable} fake_tsc.py", node=str(node), timeout_seconds=10, settle_seconds=0.5,
+    )
+    values.update(overrides)
+    return DiagnosticsConfig(**values)
+
+
+def test_daemon_reports_diagnostics_of_the_latest_build(tmp_path: Path) -> None:
+    subprocess.run(["git", "init", "-q"], cwd=tmp_path, check=True)
+    (tmp_path / "a.ts").write_text("export const a = 1;\n")
+    (tmp_path / "b.ts").write_text("export function b(x: any) {}\n")
+    daemon = DiagnosticsDaemon(tmp_path, _config(tmp_path))
+    try:
+        out = daemon.check(["a.ts"]).splitlines()
+        assert out == [
+            "a.ts:1:1 - warning no-console: Unexpected console",
+            "[0 errors, 1 warnings in 1 files; 1 type errors in other files]",
+        ]
+
+        (tmp_path / "a.ts").write_text("export function a(x: any) {}\n")
+        start = time.monotonic()
+        out = daemon.check(["a.ts"]).splitlines()
+        assert time.monotonic() - start < 5
+        assert out[1] == "a.ts:1:5 - error TS7006: Parameter has an 'any' type. Use a specific type."
+        # An absolute path matches tsc's tree-relative one
+        absolute = daemon.check([str(tmp_path / "a.ts")]).splitlines()
+        assert absolute[1] == out[1] and absolute[-1] == "[1 errors, 1 warnings in 1 files; 1 type errors in other files]"
+
+        # By default the files changed since HEAD are checked; untracked ones count
+        assert "[2 errors, 2 warnings in 4 files]" in daemon.check()
+    finally:
+        daemon.close()
+
+
+def test_check_diagnostics_tool_is_offered_only_when_enabled(tmp_path: Path) -> None:
+    assert "check_diagnostics" not in [t.name for t in make_tools(tmp_path, [])]
+
+    config = _config(tmp_path)
+    (tmp_path / "a.ts").write_text("console.log(1);\n")
+    tools = make_tools(tmp_path, [], diagnostics=config)
+    check = next(t for t in tools if t.name == "check_diagnostics")
+    try:
+        assert diagnostics_daemon(tmp_path, config).tsc._proc is None  # nothing runs until the first check
+        assert check.invoke({"files": ["a.ts", "missing.ts"]}).splitlines()[-1] == "[0 errors, 1 warnings in 1 files]"
+    finally:
+        close_daemons()
@@ -0,0 +1,74 @@
+"""Tests for the pre-review gate."""
+
+import asyncio
+import subprocess
+from pathlib import Path
+
+from agent_runner.agents.gate import added_lines, gate_node, gate_node_async, missing_deliverables
+from agent_runner.config import GateConfig
+from agent_runner.models import ModelRouter
+from agent_runner.state import Task
+from agent_runner.tests.test_models import make_config
+
+GATE = GateConfig(
+    enabled=True,
+    checks=["! grep -n TODO {files}", "test -e package.json"],
+    forbidden_patterns={r":\s*any\b": "explicit `any` type", "@ts-ignore": "@ts-ignore"},
+)
+
+
+def _repo(tmp_path: Path) -> Path:
+    def git(*args: str) -> None:
+        subprocess.run(["git", *args], cwd=tmp_path, check=True, capture_output=True)
+
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "old.ts").write_text("export const a = 1;\n// @ts-ignore\nexport const b = 2;\n")
+    git("init", "-q")
+    git("add", "-A")
+    git("-c", "user.name=t", "-c", "user.email=t@t", "commit", "-qm", "init")
+    return tmp_path
+
+
+def test_added_lines_cover_edits_and_new_files(tmp_path: Path) -> None:
+    repo = _repo(tmp_path)
+    (repo / "src" / "old.ts").write_text("export const a = 1;\n// @ts-ignore\nexport const b = 3;\nexport const c = 4;\n")
+    (repo / "src" / "new.ts").write_text("export const d = 5;\n")
+
+    assert sorted(added_lines(repo)) == [
+        ("src/new.ts", 1, "export const d = 5;"),
+        ("src/old.ts", 3, "export const b = 3;"),
+        ("src/old.ts", 4, "export const c = 4;"),
+    ]
+
+
+def test_gate_rejects_with_machine_output_and_passes_clean_trees(tmp_path: Path) -> None:
+    repo = _repo(tmp_path)
+    config = make_config(repo, gate=GATE)
+    router = ModelRouter(config)
+    task = Task(id="P1-T1", title="Form", phase="Phase 1", deliverables=["`src/form.tsx` — form", "`package.json`"])
+    (repo / "src" / "form.tsx").write_text("// TODO: type x\nexport function f(x: any) {}\n")
+    state = {"current_task": task, "retry_count": 1}
+
+    update = gate_node(state, router=router, app_config=config)
+    feedback = update["review_feedback"]
+    assert update["error"] == "review_rejected" and update["retry_count"] == 2
+    assert "Missing deliverables:\n- package.json" in feedback
+    assert "src/form.tsx:2: explicit `any` type: export function f(x: any) {}" in feedback
+    assert "@ts-ignore" not in feedback  # only added lines count
+    assert "`! grep -n TODO src/form.tsx` failed:\n1:// TODO: type x" in feedback
+    assert "`test -e package.json` failed:\n\nExit code: 1" in feedback
+
+    (repo / "src" / "form.tsx").write_text("export function f(x: string) {}\n")
+    (repo / "package.json").write_text("{}\n")
+    assert gate_node(state, router=router, app_config=config) == {"error": None}
+    assert asyncio.run(gate_node_async(state, router=router, app_config=config)) == {"error": None}
+
+
+def test_bracketed_route_deliverables_are_found(tmp_path: Path) -> None:
+    repo = _repo(tmp_path)
+    (repo / "app" / "case").mkdir(parents=True)
+    (repo / "app" / "case" / "[id].tsx").write_text("export default function Case() {}\n")
+    task = Task(id="P1-T2", title="Case", phase="Phase 1", deliverables=[
+        "Create: `app/case/[id].tsx`", "Modify: `app/case/[slug].tsx`", "`src/*.ts`",
+    ])
+    assert missing_deliverables(task, repo) == ["app/case/[slug].tsx"]
@@ -0,0 +1,158 @@
+"""End-to-end runs of the orchestrator graph with scripted chat models."""
+
+import asyncio
+import subprocess
+import textwrap
+import time
+from pathlib import Path
+
+import pytest
+from langchain_core.messages import AIMessage, BaseMessage, ToolMessage
+
+from agent_runner import models
+from agent_runner.agent import _initial_state
+from agent_runner.config import Config, ModelConfig
+from agent_runner.graph import abuild_graph, build_graph
+from agent_runner.tests.test_models import make_config
+from agent_runner.tools import arun_subprocess
+
+OPUS = ModelConfig("anthropic", "claude-opus-4-20250514")
+THREAD = {"configurable": {"thread_id": "lomito-main"}}
+
+ORCHESTRATION = textwrap.dedent("""\
+    # Lomito Orchestration Plan
+
+    ## Phase 1: Foundation
+
+    ### P1-T1: Greeting
+    - **Depends on:** nothing
+    - **Deliverables:**
+      - `src/greeting.ts` — greeting
+    - [ ] Done
+""")
+
+
+USAGE = {"input_tokens": 100, "output_tokens": 10, "total_tokens": 110}
+
+
+class ScriptedModel:
+    """Answers by agent, telling them apart by their system prompt."""
+
+    fail = False
+    calls: list[str] = []
+
+    def __init__(self, model_config: ModelConfig) -> None:
+        self.model_config = model_config
+
+    def bind_tools(self, tools: list) -> "ScriptedModel":
+        return self
+
+    def invoke(self, messages: list) -> AIMessage:
+        system = _text(messages[0])
+        if system.startswith("You are the Implementer"):
+            agent = "implementer"
+            if ScriptedModel.fail:
+                raise ConnectionError("provider down")
+            if not any(isinstance(m, ToolMessage) for m in messages):
+                ScriptedModel.calls.append(agent)
+                return AIMessage(content="", tool_calls=[{
+                    "name": "write_file", "id": "call-1",
+                    "args": {"file_path": "src/greeting.ts", "content": "export const greeting = 'hola';\n"},
+                }], usage_metadata=USAGE)
+            content = "Added src/greeting.ts"
+        elif system.startswith("You are the Reviewer"):
+            agent = "reviewer"
+            assert "+export const greeting = 'hola';" in _text(messages[1])  # the review bundle
+            content = "APPROVED: adds the greeting"
+        else:
+            agent = "committer"
+            content = "feat(ui): add greeting"
+        ScriptedModel.calls.append(agent)
+        return AIMessage(content=content, usage_metadata=USAGE)
+
+    async def ainvoke(self, messages: list) -> AIMessage:
+        await asyncio.sleep(0)
+        return self.invoke(messages)
+
+
+def _text(message: BaseMessage) -> str:
+    """A message's text, also when prompt-cache breakpoints turned it into content blocks."""
+    if isinstance(message.content, str):
+        return message.content
+    return "".join(block.get("text", "") for block in message.content)
+
+
+@pytest.fixture
+def project(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Config:
+    def git(*args: str) -> None:
+        subprocess.run(["git", *args], cwd=repo, check=True, capture_output=True)
+
+    repo = tmp_path / "repo"
+    (repo / "docs" / "plans").mkdir(parents=True)
+    (repo / "docs" / "plans" / "ORCHESTRATION.md").write_text(ORCHESTRATION)
+    git("init", "-q")
+    git("config", "user.name", "t")
+    git("config", "user.email", "t@t")
+    git("add", "-A")
+    git("commit", "-qm", "init")
+
+    ScriptedModel.fail, ScriptedModel.calls = False, []
+    monkeypatch.setattr(models, "create_chat_model", lambda mc, timeout=120: ScriptedModel(mc))
+    return make_config(
+        repo, checkpoint_dir=tmp_path / "checkpoints", models={}, fallback_chain=[OPUS], max_retry_rounds=0,
+    )
+
+
+def _run(config: Config, graph_input: dict | None, *, use_async: bool) -> dict:
+    if use_async:
+        async def run() -> dict:
+            async with abuild_graph(config) as (compiled, memory):
+                return await compiled.ainvoke(graph_input, config=THREAD)
+        return asyncio.run(run())
+    compiled, memory, cleanup = build_graph(config)
+    with cleanup:
+        return compiled.invoke(graph_input, config=THREAD)
+
+
+def _head(config: Config) -> str:
+    return subprocess.run(
+        ["git", "log", "-1", "--format=%s"], cwd=config.project_dir, capture_output=True, text=True,
+    ).stdout.strip()
+
+
+@pytest.mark.parametrize("use_async", [False, True], ids=["sync", "async"])
+def test_task_runs_from_plan_to_commit(project: Config, use_async: bool) -> None:
+    result = _run(project, _initial_state(project), use_async=use_async)
+
+    assert result["task_status"] == {"P1-T1": "done"}
+    assert ScriptedModel.calls == ["implementer", "implementer", "reviewer", "committer"]
+    assert _head(project) == "feat(ui): add greeting"
+    assert (project.project_dir / "src" / "greeting.ts").read_text() == "export const greeting = 'hola';\n"
+    assert result["token_usage"]["anthropic/claude-opus-4-20250514"]["input"] == 400
+    assert result["review_rounds"] == {"1": 1}
+
+
+@pytest.mark.parametrize("use_async", [False, True], ids=["sync", "async"])
+def test_failed_run_resumes_from_its_checkpoint(project: Config, use_async: bool) -> None:
+    ScriptedModel.fail = True
+    with pytest.raises(RuntimeError, match="All LLM providers exhausted"):
+        _run(project, _initial_state(project), use_async=use_async)
+    assert _head(project) == "init"
+
+    ScriptedModel.fail = False
+    result = _run(project, None, use_async=use_async)  # picks up at the implementer
+    assert result["task_status"] == {"P1-T1": "done"}
+    assert ScriptedModel.calls == ["implementer", "implementer", "reviewer", "committer"]
+    assert _head(project) == "feat(ui): add greeting"
+
+
+@pytest.mark.parametrize("shell", [False, True])
+def test_arun_subprocess_kills_on_timeout(tmp_path: Path, shell: bool) -> None:
+    cmd = "exec sleep 30" if shell else ["sleep", "30"]
+    start = time.monotonic()
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(arun_subprocess(cmd, cwd=tmp_path, timeout=0.2, shell=shell))
+    assert time.monotonic() - start < 5
+
+    out, err, code = asyncio.run(arun_subprocess(["sh", "-c", "echo out; echo err >&2; exit 3"], cwd=tmp_path, timeout=5))
+    assert (out, err, code) == ("out\n", "err\n", 3)
@@ -0,0 +1,435 @@
+"""Tests for the multi-LLM router."""
+
+import asyncio
+import json
+import threading
+import time
+from pathlib import Path
+
+import pytest
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, SystemMessage, ToolMessage
+
+from agent_runner import models
+from agent_runner.config import CircuitBreakerConfig, Config, HedgeConfig, ModelConfig
+from agent_runner.models import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    HealthRegistry,
+    ModelRouter,
+    RetryScheduler,
+    retry_after_seconds,
+)
+from agent_runner.usage import metered
+
+
+class FakeSDKClient:
+    def __init__(self) -> None:
+        self.closed = False
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class FakeChatModel:
+    def __init__(self, model_config: ModelConfig) -> None:
+        self.model_config = model_config
+        self.client = FakeSDKClient()
+        self.bind_calls = 0
+
+    def bind_tools(self, tools: list) -> tuple:
+        self.bind_calls += 1
+        return ("bound", self, tuple(t.name for t in tools))
+
+
+class FakeTool:
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+
+def make_config(tmp_path: Path, **overrides) -> Config:
+    values = dict(
+        project_dir=tmp_path,
+        orchestration_file="docs/plans/ORCHESTRATION.md",
+        issues_file="docs/plans/ISSUES.md",
+        checkpoint_dir=tmp_path,
+        log_dir=".agent-logs",
+        models={"implementer": ModelConfig("anthropic", "claude-opus-4-20250514")},
+        fallback_chain=[
+            ModelConfig("anthropic", "claude-opus-4-20250514"),
+            ModelConfig("google", "gemini-2.0-flash"),
+        ],
+        max_review_retries=3,
+        fallback_wait_seconds=0,
+        request_timeout_seconds=120,
+        allowed_commands=[],
+    )
+    values.update(overrides)
+    return Config(**values)
+
+
+@pytest.fixture
+def created(monkeypatch: pytest.MonkeyPatch) -> list[FakeChatModel]:
+    instances: list[FakeChatModel] = []
+
+    def fake_create(model_config: ModelConfig, timeout: int = 120) -> FakeChatModel:
+        model = FakeChatModel(model_config)
+        instances.append(model)
+        return model
+
+    monkeypatch.setattr(models, "create_chat_model", fake_create)
+    return instances
+
+
+def test_clients_are_reused(created: list[FakeChatModel], tmp_path: Path) -> None:
+    router = ModelRouter(make_config(tmp_path))
+    mc = ModelConfig("anthropic", "claude-opus-4-20250514")
+    tools = [FakeTool("read_file"), FakeTool("write_file")]
+
+    first = router.get_client(mc, tools)
+    second = router.get_client(mc, tools)
+    plain = router.get_client(mc)
+
+    assert first is second
+    assert len(created) == 1
+    assert created[0].bind_calls == 1
+    assert plain is created[0]
+
+
+def test_close_releases_clients(created: list[FakeChatModel], tmp_path: Path) -> None:
+    router = ModelRouter(make_config(tmp_path))
+    router.get_client(ModelConfig("anthropic", "claude-opus-4-20250514"))
+    router.get_client(ModelConfig("google", "gemini-2.0-flash"))
+
+    router.close()
+
+    assert all(m.client.closed for m in created)
+    router.get_client(ModelConfig("google", "gemini-2.0-flash"))
+    assert len(created) == 3
+
+
+def test_breaker_opens_and_recovers(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    now = [1000.0]
+    monkeypatch.setattr(models.time, "time", lambda: now[0])
+    config = CircuitBreakerConfig(min_calls=2, failure_rate=0.5, cooldown_seconds=60)
+    registry = HealthRegistry(config, tmp_path / "health.json")
+    key = "anthropic/claude-opus-4-20250514"
+
+    registry.record_failure(key, "429 Too Many Requests")
+    assert registry.state(key) == CLOSED
+    registry.record_failure(key, "429 Too Many Requests")
+    assert registry.state(key) == OPEN
+    assert not registry.available(key)
+
+    # Breaker state survives a new process
+    assert HealthRegistry(config, tmp_path / "health.json").state(key) == OPEN
+
+    now[0] += 61
+    assert registry.state(key) == HALF_OPEN
+    assert registry.start_probe(key)
+    assert not registry.start_probe(key)
+    assert not registry.available(key)
+
+    registry.record_failure(key, "timeout")
+    assert registry.state(key) == OPEN
+    now[0] += 61
+    assert registry.state(key) == OPEN  # cooldown doubled
+    now[0] += 60
+    assert registry.start_probe(key)
+    registry.record_success(key)
+    assert registry.state(key) == CLOSED
+    assert registry.available(key)
+
+
+def test_open_provider_is_skipped(
+    created: list[FakeChatModel], monkeypatch: pytest.MonkeyPatch, tmp_path: Path,
+) -> None:
+    router = ModelRouter(make_config(tmp_path))
+    calls: list[str] = []
+
+    class Response:
+        content = "ok"
+        usage_metadata = None
+
+    def fake_invoke(self: FakeChatModel, messages: list) -> Response:
+        calls.append(self.model_config.provider)
+        return Response()
+
+    monkeypatch.setattr(FakeChatModel, "invoke", fake_invoke, raising=False)
+    for _ in range(3):
+        router.health.record_failure("anthropic/claude-opus-4-20250514", "503")
+
+    router.invoke_with_fallback("implementer", [])
+    assert calls == ["google"]
+
+
+class FakeHTTPError(Exception):
+    def __init__(self, headers: dict[str, str]) -> None:
+        super().__init__("429 Too Many Requests")
+        self.response = type("Response", (), {"headers": headers})()
+
+
+def test_retry_after_headers() -> None:
+    assert retry_after_seconds(FakeHTTPError({"Retry-After": "7"})) == 7
+    assert retry_after_seconds(FakeHTTPError({"retry-after-ms": "250"})) == 0.25
+    assert retry_after_seconds(FakeHTTPError({
+        "x-ratelimit-remaining-requests": "5",
+        "x-ratelimit-reset-requests": "1s",
+        "x-ratelimit-remaining-tokens": "0",
+        "x-ratelimit-reset-tokens": "6m0s",
+    })) == 360
+    assert retry_after_seconds(FakeHTTPError({})) is None
+    assert retry_after_seconds(ValueError("no response")) is None
+
+
+def test_scheduler_waits_for_earliest_provider(monkeypatch: pytest.MonkeyPatch) -> None:
+    now = [100.0]
+    monkeypatch.setattr(models.time, "monotonic", lambda: now[0])
+    scheduler = RetryScheduler(base_seconds=2, max_seconds=60)
+    chain = [ModelConfig("anthropic", "a"), ModelConfig("openai", "b")]
+
+    scheduler.record_failure("anthropic/a", FakeHTTPError({"retry-after": "30"}))
+    scheduler.record_failure("openai/b", FakeHTTPError({"retry-after": "5"}))
+
+    assert scheduler.wait_time(chain) == 5
+    assert not scheduler.ready("openai/b")
+    now[0] += 5
+    assert scheduler.ready("openai/b")
+    assert not scheduler.ready("anthropic/a")
+
+
+def test_retry_round_records_usage(
+    created: list[FakeChatModel], monkeypatch: pytest.MonkeyPatch, tmp_path: Path,
+) -> None:
+    router = ModelRouter(make_config(tmp_path, max_retry_rounds=1))
+    attempts: list[str] = []
+
+    class Response:
+        content = "ok"
+        usage_metadata = {"input_tokens": 10, "output_tokens": 3, "total_tokens": 13}
+
+    def fake_invoke(self: FakeChatModel, messages: list) -> Response:
+        attempts.append(self.model_config.provider)
+        if len(attempts) <= 2:
+            raise FakeHTTPError({"retry-after": "0"})
+        return Response()
+
+    monkeypatch.setattr(FakeChatModel, "invoke", fake_invoke, raising=False)
+    router.invoke_with_fallback("implementer", [])
+
+    assert attempts == ["anthropic", "google", "anthropic"]
+    assert router.token_usage == {
+        "anthropic/claude-opus-4-20250514": {"input": 10, "output": 3, "cache_read": 0, "cache_write": 0, "cost": 0.0},
+    }
+
+
+def test_retry_waits_for_the_healthy_provider_in_backoff(
+    created: list[FakeChatModel], monkeypatch: pytest.MonkeyPatch, tmp_path: Path,
+) -> None:
+    router = ModelRouter(make_config(tmp_path, max_retry_rounds=1))
+    calls: list[str] = []
+
+    def fake_invoke(self: FakeChatModel, messages: list) -> AIMessage:
+        calls.append(self.model_config.provider)
+        return AIMessage(content="ok")
+
+    monkeypatch.setattr(FakeChatModel, "invoke", fake_invoke, raising=False)
+    for _ in range(3):  # anthropic's breaker is open, its backoff long expired
+        router.health.record_failure("anthropic/claude-opus-4-20250514", "503")
+    router.retry.record_failure("google/gemini-2.0-flash", FakeHTTPError({"retry-after": "0.2"}))
+
+    start = time.monotonic()
+    assert router.invoke_with_fallback("implementer", []).content == "ok"
+    assert time.monotonic() - start >= 0.2
+    assert calls == ["google"]
+
+
+def test_cache_breakpoints_mark_prefix_and_tail() -> None:
+    messages = [
+        SystemMessage(content="system"),
+        HumanMessage(content="task"),
+        HumanMessage(content="spec"),
+        AIMessage(content="", tool_calls=[{"name": "read_file", "args": {"file_path": "a"}, "id": "1"}]),
+        ToolMessage(content="contents", tool_call_id="1"),
+    ]
+    marked = models.with_cache_breakpoints(messages)
+
+    cached = [i for i, m in enumerate(marked) if isinstance(m.content, list) and "cache_control" in m.content[-1]]
+    assert cached == [0, 2, 4]
+    assert marked[2].content[-1]["text"] == "spec"
+    assert messages[2].content == "spec"  # originals untouched
+
+
+def test_cache_tokens_are_recorded(
+    created: list[FakeChatModel], monkeypatch: pytest.MonkeyPatch, tmp_path: Path,
+) -> None:
+    router = ModelRouter(make_config(tmp_path))
+    sent: list[list] = []
+
+    class Response:
+        content = "ok"
+        usage_metadata = {
+            "input_tokens": 1200, "output_tokens": 5, "total_tokens": 1205,
+            "input_token_details": {"cache_read": 1000, "cache_creation": 150},
+        }
+
+    def fake_invoke(self: FakeChatModel, messages: list) -> Response:
+        sent.append(messages)
+        return Response()
+
+    monkeypatch.setattr(FakeChatModel, "invoke", fake_invoke, raising=False)
+    router.invoke_with_fallback("implementer", [SystemMessage(content="s"), HumanMessage(content="t")])
+
+    assert isinstance(sent[0][0].content, list)  # anthropic gets breakpoints
+    usage = router.token_usage["anthropic/claude-opus-4-20250514"]
+    assert (usage["cache_read"], usage["cache_write"]) == (1000, 150)
+
+
+def test_streaming_dispatches_tool_calls_before_the_stream_ends(
+    created: list[FakeChatModel], monkeypatch: pytest.MonkeyPatch, tmp_path: Path,
+) -> None:
+    router = ModelRouter(make_config(tmp_path))
+    announced = threading.Event()
+    calls = [
+        {"name": "read_file", "args": {"file_path": "a"}, "id": "1"},
+        {"name": "read_file", "args": {"file_path": "b"}, "id": "2"},
+    ]
+
+    def fake_stream(self: FakeChatModel, messages: list):
+        for i, tc in enumerate(calls):
+            yield AIMessageChunk(content="", tool_call_chunks=[
+                {"name": tc["name"], "args": json.dumps(tc["args"]), "id": tc["id"], "index": i},
+            ])
+        # The model is "still generating": the first call must already be out
+        assert announced.wait(5)
+        yield AIMessageChunk(content="", usage_metadata={"input_tokens": 5, "output_tokens": 2, "total_tokens": 7})
+
+    seen: list[tuple[int, str]] = []
+
+    def on_tool_call(index: int, tool_call: dict) -> None:
+        seen.append((index, tool_call["id"]))
+        announced.set()
+
+    monkeypatch.setattr(FakeChatModel, "stream", fake_stream, raising=False)
+    response = router.invoke_with_fallback("implementer", [HumanMessage(content="go")], on_tool_call=on_tool_call)
+
+    assert seen == [(0, "1")]  # the last call completes with the stream
+    assert [tc["id"] for tc in response.tool_calls] == ["1", "2"]
+    assert router.token_usage["anthropic/claude-opus-4-20250514"]["output"] == 2
+
+
+def test_latency_percentile_needs_samples() -> None:
+    tracker = models.LatencyTracker()
+    for seconds in (0.1, 0.2, 0.3, 0.4, 2.0):
+        tracker.record("committer", "p", seconds)
+    assert tracker.percentile("committer", "p", 0.8) == 0.4
+    assert tracker.percentile("committer", "p", 0.9, min_samples=6) is None
+    assert tracker.percentile("planner", "p", 0.9) is None
+
+
+def _slow_anthropic(monkeypatch: pytest.MonkeyPatch, seconds: float) -> list[str]:
+    started: list[str] = []
+
+    class Response:
+        def __init__(self, provider: str) -> None:
+            self.content = provider
+            self.usage_metadata = None
+
+    def fake_invoke(self: FakeChatModel, messages: list) -> Response:
+        started.append(self.model_config.provider)
+        if self.model_config.provider == "anthropic":
+            time.sleep(seconds)
+        return Response(self.model_config.provider)
+
+    async def fake_ainvoke(self: FakeChatModel, messages: list) -> Response:
+        started.append(self.model_config.provider)
+        if self.model_config.provider == "anthropic":
+            try:
+                await asyncio.sleep(seconds)
+            except asyncio.CancelledError:
+                started.append("cancelled")
+                raise
+        return Response(self.model_config.provider)
+
+    monkeypatch.setattr(FakeChatModel, "invoke", fake_invoke, raising=False)
+    monkeypatch.setattr(FakeChatModel, "ainvoke", fake_ainvoke, raising=False)
+    return started
+
+
+def test_slow_primary_is_hedged_within_budget(
+    created: list[FakeChatModel], monkeypatch: pytest.MonkeyPatch, tmp_path: Path,
+) -> None:
+    hedging = HedgeConfig(budgets={"implementer": 1}, default_delay_seconds=0.05)
+    router = ModelRouter(make_config(tmp_path, hedging=hedging))
+    started = _slow_anthropic(monkeypatch, 0.5)
+
+    assert router.invoke_with_fallback("implementer", []).content == "google"
+    assert started == ["anthropic", "google"]
+
+    # Budget spent: the slow primary is waited for
+    assert router.invoke_with_fallback("implementer", []).content == "anthropic"
+    router.close()
+
+
+def test_abandoned_losers_do_not_hold_up_later_calls(
+    created: list[FakeChatModel], monkeypatch: pytest.MonkeyPatch, tmp_path: Path,
+) -> None:
+    hedging = HedgeConfig(budgets={"committer": 6}, default_delay_seconds=0.05)
+    router = ModelRouter(make_config(tmp_path, hedging=hedging))
+    started = _slow_anthropic(monkeypatch, 2)
+
+    start = time.monotonic()
+    for _ in range(6):  # each leaves a loser stuck on anthropic
+        assert router.invoke_with_fallback("committer", []).content == "google"
+    assert time.monotonic() - start < 1.5
+    assert started == ["anthropic", "google"] * 6
+    router.close()
+
+
+def test_async_hedge_cancels_the_loser(
+    created: list[FakeChatModel], monkeypatch: pytest.MonkeyPatch, tmp_path: Path,
+) -> None:
+    hedging = HedgeConfig(budgets={"implementer": 5}, default_delay_seconds=0.05)
+    router = ModelRouter(make_config(tmp_path, hedging=hedging))
+    started = _slow_anthropic(monkeypatch, 5)
+
+    async def run() -> str:
+        response = await router.ainvoke_with_fallback("implementer", [])
+        await asyncio.sleep(0)  # let the cancellation land
+        assert started == ["anthropic", "google", "cancelled"]
+        return response.content
+
+    assert asyncio.run(run()) == "google"
+
+
+def test_late_sync_loser_is_billed_but_leaves_the_router_alone(
+    created: list[FakeChatModel], monkeypatch: pytest.MonkeyPatch, tmp_path: Path,
+) -> None:
+    hedging = HedgeConfig(budgets={"implementer": 1}, default_delay_seconds=0.05)
+    router = ModelRouter(make_config(tmp_path, hedging=hedging))
+    finished = threading.Event()
+
+    def fake_invoke(self: FakeChatModel, messages: list) -> AIMessage:
+        if self.model_config.provider == "anthropic":
+            time.sleep(0.3)
+        response = AIMessage(content=self.model_config.provider, usage_metadata={
+            "input_tokens": 10, "output_tokens": 1, "total_tokens": 11,
+        })
+        if self.model_config.provider == "anthropic":
+            threading.Timer(0.05, finished.set).start()  # after _invoke_once is done with it
+        return response
+
+    monkeypatch.setattr(FakeChatModel, "invoke", fake_invoke, raising=False)
+    with metered({}) as meter:
+        assert router.invoke_with_fallback("implementer", []).content == "google"
+        update = meter.state_update(None)
+    assert finished.wait(2)
+
+    assert router.current_provider == "google/gemini-2.0-flash"
+    assert router.latency.percentile("implementer", "anthropic/claude-opus-4-20250514", 0.5, min_samples=1) is None
+    # Still billed: in the run totals, and in the next node's update
+    assert sorted(router.token_usage) == ["anthropic/claude-opus-4-20250514", "google/gemini-2.0-flash"]
+    assert list(update["token_usage"]) == ["google/gemini-2.0-flash"]
+    with metered({}) as meter:
+        assert meter.state_update(None)["token_usage"]["anthropic/claude-opus-4-20250514"]["input"] == 10
+    router.close()
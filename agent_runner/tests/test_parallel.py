@@ -0,0 +1,59 @@
+"""Tests for worktree management in parallel mode."""
+
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from agent_runner.parallel import create_worktree, merge_branch, remove_worktree
+
+
+def git(cwd: Path, *args: str) -> str:
+    return subprocess.run(
+        ["git", *args],
+        cwd=cwd, capture_output=True, text=True, check=True,
+    ).stdout
+
+
+@pytest.fixture
+def repo(tmp_path: Path) -> Path:
+    project = tmp_path / "project"
+    project.mkdir()
+    git(project, "init", "-q", "-b", "main")
+    git(project, "config", "user.email", "agent@example.com")
+    git(project, "config", "user.name", "agent")
+    (project / "app.ts").write_text("export const value = 1;\n")
+    git(project, "add", "-A")
+    git(project, "commit", "-qm", "init")
+    return project
+
+
+def commit_in(worktree: Path, content: str) -> None:
+    (worktree / "app.ts").write_text(content)
+    git(worktree, "commit", "-qam", "change")
+
+
+def test_worktrees_merge_and_detect_conflicts(repo: Path, tmp_path: Path) -> None:
+    root = tmp_path / "worktrees"
+    first, first_branch = create_worktree(repo, root, "P1-T1")
+    second, second_branch = create_worktree(repo, root, "P1-T2")
+    assert first_branch == "agent/P1-T1"
+    assert (first / "app.ts").exists()
+
+    commit_in(first, "export const value = 2;\n")
+    commit_in(second, "export const value = 3;\n")
+
+    merged, _ = merge_branch(repo, first_branch)
+    assert merged
+    assert (repo / "app.ts").read_text() == "export const value = 2;\n"
+
+    merged, detail = merge_branch(repo, second_branch)
+    assert not merged
+    assert "app.ts" in detail
+    assert git(repo, "status", "--porcelain") == ""
+
+    remove_worktree(repo, first, first_branch, delete_branch=True)
+    remove_worktree(repo, second, second_branch, delete_branch=False)
+    assert not first.exists()
+    assert "agent/P1-T1" not in git(repo, "branch")
+    assert "agent/P1-T2" in git(repo, "branch")
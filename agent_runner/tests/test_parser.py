@@ -6,6 +6,7 @@ from pathlib import Path
 import pytest
 
 from agent_runner.parser import get_unblocked_tasks, parse_orchestration
+from agent_runner.state import Task
 
 
 @pytest.fixture
@@ -89,3 +90,20 @@ def test_all_done_returns_empty(sample_orchestration: Path) -> None:
 
     unblocked = get_unblocked_tasks(tasks, status)
     assert unblocked == []
+
+
+def test_deliverable_paths_take_the_backticked_path() -> None:
+    task = Task(id="P1-T1", title="Case", phase="Phase 1", deliverables=[
+        "`apps/mobile/app/case/[id].tsx` — case detail",
+        "Modify: `apps/mobile/app/_layout.tsx`",
+        "Create: `packages/shared/src/case.ts` (types)",
+        "docs/cases.md",
+        "Tests",
+    ])
+    assert task.deliverable_paths == [
+        "apps/mobile/app/case/[id].tsx",
+        "apps/mobile/app/_layout.tsx",
+        "packages/shared/src/case.ts",
+        "docs/cases.md",
+        "Tests",
+    ]
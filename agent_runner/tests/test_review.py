@@ -0,0 +1,87 @@
+"""Tests for the reviewer's diff bundle and review-round metric."""
+
+import subprocess
+from pathlib import Path
+
+from langchain_core.messages import AIMessage
+
+from agent_runner.agents.reviewer import reviewer_node
+from agent_runner.config import ReviewConfig
+from agent_runner.models import ModelRouter
+from agent_runner.review import build_review_bundle, changes
+from agent_runner.state import Task
+from agent_runner.tests.test_models import make_config
+
+TASK = Task(id="P1-T1", title="Form", phase="Phase 1", deliverables=["`src/form.tsx` — form"])
+
+
+def _repo(tmp_path: Path) -> Path:
+    def git(*args: str) -> None:
+        subprocess.run(["git", *args], cwd=tmp_path, check=True, capture_output=True)
+
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "app.ts").write_text("".join(f"export const v{n} = {n};\n" for n in range(20)))
+    (tmp_path / "src" / "old.ts").write_text("export const old = 1;\n")
+    (tmp_path / "src" / "moved.ts").write_text("export const moved = 'a long enough line to match';\n")
+    git("init", "-q")
+    git("add", "-A")
+    git("-c", "user.name=t", "-c", "user.email=t@t", "commit", "-qm", "init")
+    (tmp_path / "src" / "app.ts").write_text(
+        "".join(f"export const v{n} = {n * 10 if n == 10 else n};\n" for n in range(20))
+    )
+    (tmp_path / "src" / "old.ts").unlink()
+    (tmp_path / "src" / "moved.ts").rename(tmp_path / "src" / "renamed.ts")
+    (tmp_path / "src" / "form.tsx").write_text("export function Form() {\n  return null;\n}\n")
+    return tmp_path
+
+
+def test_changes_cover_edits_renames_deletes_and_untracked_files(tmp_path: Path) -> None:
+    repo = _repo(tmp_path)
+    found = {change.path: change for change in changes(repo, context_lines=1)}
+
+    assert sorted((c.status, c.old_path, c.path) for c in found.values()) == [
+        ("A", None, "src/form.tsx"), ("D", None, "src/old.ts"),
+        ("M", None, "src/app.ts"), ("R", "src/moved.ts", "src/renamed.ts"),
+    ]
+    app = found["src/app.ts"]
+    assert (app.added, app.removed) == (1, 1)
+    assert " export const v9 = 9;\n-export const v10 = 10;\n+export const v10 = 100;\n export const v11" in app.diff
+    assert "\n export const v8" not in app.diff  # one line of context
+    assert "export const old" not in found["src/old.ts"].diff  # deleted content is left out
+    assert found["src/form.tsx"].describe() == "- new src/form.tsx (3 lines, 42 B)"
+    # The real index is left alone
+    assert "src/form.tsx" not in subprocess.run(
+        ["git", "diff", "--cached", "--name-only"], cwd=repo, capture_output=True, text=True,
+    ).stdout
+
+
+def test_bundle_puts_deliverables_first_and_caps_diffs(tmp_path: Path) -> None:
+    repo = _repo(tmp_path)
+    bundle = build_review_bundle(repo, TASK, ReviewConfig(diff_context=3))
+    assert bundle.startswith("Changed files (4, +4 -1):\n")
+    assert bundle.index("+++ b/src/form.tsx") < bundle.index("+++ b/src/app.ts")
+
+    capped = build_review_bundle(repo, TASK, ReviewConfig(max_file_chars=150))
+    assert "more diff lines of this file omitted" in capped
+
+    tight = build_review_bundle(repo, TASK, ReviewConfig(token_budget=60))  # room for the form's diff only
+    assert "+++ b/src/form.tsx" in tight and "+++ b/src/app.ts" not in tight
+    assert "stay within the review budget (read these files if they matter):\n- src/app.ts\n" in tight
+
+
+def test_reviewer_gets_the_bundle_and_counts_rounds(tmp_path: Path) -> None:
+    repo = _repo(tmp_path)
+    config = make_config(repo)
+    router = ModelRouter(config)
+    prompts = []
+
+    def invoke(agent: str, messages: list, **kwargs) -> AIMessage:
+        prompts.append(messages[1].content)
+        return AIMessage(content="APPROVED: adds the form")
+
+    router.invoke_with_fallback = invoke
+    update = reviewer_node({"current_task": TASK}, router=router, tools=[], app_config=config)
+
+    assert update["error"] is None and update["review_rounds"] == {"1": 1}
+    assert "- new src/form.tsx (3 lines, 42 B)" in prompts[0] and "+export function Form() {" in prompts[0]
+    assert "git diff --cached" not in prompts[0]
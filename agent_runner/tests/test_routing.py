@@ -0,0 +1,57 @@
+"""Tests for difficulty-based model tier routing."""
+
+from pathlib import Path
+
+from langchain_core.messages import AIMessage
+
+from agent_runner.agents.reviewer import record_review_outcome, _verdict
+from agent_runner.config import ModelConfig, RoutingConfig
+from agent_runner.models import ModelRouter
+from agent_runner.routing import TierPolicy, routing_stats_path
+from agent_runner.state import Task
+from agent_runner.tests.test_models import make_config
+
+FLASH = ModelConfig("google", "gemini-2.0-flash")
+OPUS = ModelConfig("anthropic", "claude-opus-4-20250514")
+
+
+def _routing(**overrides) -> RoutingConfig:
+    return RoutingConfig(enabled=True, tiers=[FLASH, OPUS], thresholds=[4.0], hard_phases=["Phase 4"], **overrides)
+
+
+def test_start_tier_follows_difficulty_and_phase(tmp_path: Path) -> None:
+    (tmp_path / "spec.md").write_text("x" * 12000)
+    policy = TierPolicy(_routing())
+
+    assert policy.start_tier(Task(id="T1", title="i18n key", phase="Phase 1", deliverables=["a"]), tmp_path) == 0
+    big = Task(id="T2", title="Pipeline", phase="Phase 1", deliverables=["a"], spec="spec.md")
+    assert policy.start_tier(big, tmp_path) == 1  # 1 deliverable + 3 points of spec
+    assert policy.start_tier(Task(id="T3", title="Hard", phase="Phase 4: Moderation"), tmp_path) == 1
+
+
+def test_rejected_tiers_are_skipped_after_enough_reviews(tmp_path: Path) -> None:
+    path = tmp_path / "routing_stats.json"
+    policy = TierPolicy(_routing(min_samples=3), path)
+    easy = Task(id="T1", title="Easy", phase="Phase 1")
+    for approved in (False, False, True):
+        policy.record_review(0, approved)
+
+    assert TierPolicy(_routing(min_samples=3), path).start_tier(easy, tmp_path) == 1
+    assert TierPolicy(_routing(min_samples=4), path).start_tier(easy, tmp_path) == 0
+
+
+def test_rejection_escalates_and_is_recorded(tmp_path: Path) -> None:
+    config = make_config(tmp_path, routing=_routing())
+    router = ModelRouter(config)
+    state = {"current_task": Task(id="T1", title="Easy", phase="Phase 1"), "model_tier": 0, "retry_count": 0}
+    assert router.tier_model("reviewer", 0) == FLASH
+    assert router.tier_model("committer", 0) is None
+
+    update = record_review_outcome(state, router, _verdict(state, AIMessage(content="REJECTED: no tests"), []))
+    assert update["model_tier"] == 1
+    approved = record_review_outcome({**state, "model_tier": 1}, router, {"error": None})
+    assert "model_tier" not in approved
+    assert TierPolicy(config.routing, routing_stats_path(config)).snapshot() == {
+        "google/gemini-2.0-flash": {"reviews": 1, "approved": 0, "success_rate": 0.0},
+        "anthropic/claude-opus-4-20250514": {"reviews": 1, "approved": 1, "success_rate": 1.0},
+    }
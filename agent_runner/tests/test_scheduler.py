@@ -0,0 +1,52 @@
+"""Tests for the critical-path task scheduler."""
+
+from agent_runner.scheduler import order_tasks, rank_tasks, top_ties
+from agent_runner.state import Task
+
+
+def make_tasks() -> list[Task]:
+    # A -> B -> D -> E, A -> C; F standalone in a later phase
+    return [
+        Task(id="P1-T1", title="A", phase="Phase 1"),
+        Task(id="P1-T2", title="B", phase="Phase 1", depends_on=["P1-T1"]),
+        Task(id="P1-T3", title="C", phase="Phase 1", depends_on=["P1-T1"]),
+        Task(id="P1-T4", title="D", phase="Phase 1", depends_on=["P1-T2"]),
+        Task(id="P2-T1", title="E", phase="Phase 2", depends_on=["P1-T4"]),
+        Task(id="P2-T2", title="F", phase="Phase 2"),
+    ]
+
+
+def test_rank_by_critical_path_and_fan_out() -> None:
+    tasks = make_tasks()
+    ranks = rank_tasks(tasks, {"P1-T1": "done"})
+
+    assert ranks["P1-T1"].critical_path == 3  # done itself, B -> D -> E pending
+    assert ranks["P1-T2"].critical_path == 3
+    assert ranks["P1-T3"].critical_path == 1
+    assert ranks["P1-T2"].fan_out == 2
+    assert ranks["P1-T1"].fan_out == 4
+
+    unblocked = [tasks[1], tasks[2], tasks[5]]
+    assert [t.id for t in order_tasks(unblocked, ranks)] == ["P1-T2", "P1-T3", "P2-T2"]
+
+
+def test_ties_and_phase_order() -> None:
+    tasks = [
+        Task(id="P1-T1", title="x", phase="Phase 1"),
+        Task(id="P1-T2", title="y", phase="Phase 1"),
+        Task(id="P2-T1", title="late", phase="Phase 2"),
+    ]
+    ranks = rank_tasks(tasks, {})
+    ordered = order_tasks(list(reversed(tasks)), ranks)
+
+    assert [t.id for t in ordered] == ["P1-T1", "P1-T2", "P2-T1"]
+    assert [t.id for t in top_ties(ordered, ranks)] == ["P1-T1", "P1-T2"]
+
+
+def test_cycles_do_not_hang() -> None:
+    tasks = [
+        Task(id="P1-T1", title="a", phase="Phase 1", depends_on=["P1-T2"]),
+        Task(id="P1-T2", title="b", phase="Phase 1", depends_on=["P1-T1"]),
+    ]
+    ranks = rank_tasks(tasks, {})
+    assert set(ranks) == {"P1-T1", "P1-T2"}
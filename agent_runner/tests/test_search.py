@@ -0,0 +1,71 @@
+"""Tests for the indexed code search behind search_files."""
+
+import os
+import subprocess
+from pathlib import Path
+
+from agent_runner.search import SearchIndex, required_literals
+from agent_runner.tools import make_tools
+
+
+def test_required_literals_are_conservative() -> None:
+    assert required_literals("useAuthStore") == ["useAuthStore"]
+    assert required_literals(r"import\s+React") == ["import", "React"]
+    assert required_literals("colou?r") == ["colo"]
+    assert required_literals("(foo)?barbaz") == ["barbaz"]
+    assert required_literals("foo|bar") == []
+    assert required_literals("[abc]def") == ["def"]
+
+
+def _repo(tmp_path: Path) -> Path:
+    subprocess.run(["git", "init", "-q"], cwd=tmp_path, check=True)
+    (tmp_path / ".gitignore").write_text("node_modules/\n")
+    (tmp_path / "node_modules" / "lib").mkdir(parents=True)
+    (tmp_path / "node_modules" / "lib" / "index.js").write_text("export const useAuthStore = 1;\n")
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "screen.tsx").write_text("import { useAuthStore } from './auth-store';\n\nconst a = 1;\n")
+    (tmp_path / "src" / "auth-store.ts").write_text("// store\nexport function useAuthStore() {}\n// end\n")
+    (tmp_path / "logo.png").write_bytes(b"\x89PNG\0\0useAuthStore")
+    return tmp_path
+
+
+def test_search_skips_ignored_and_binary_files_and_ranks(tmp_path: Path) -> None:
+    index = SearchIndex(_repo(tmp_path))
+    assert index.search("useAuth").splitlines() == [
+        "src/auth-store.ts:2:export function useAuthStore() {}",
+        "src/screen.tsx:1:import { useAuthStore } from './auth-store';",
+    ]
+    (tmp_path / "src" / "app.ts").write_text("store\nstore\n")
+    ranked = [line.split(":")[0] for line in index.search("store").splitlines()]
+    assert ranked == ["src/auth-store.ts", "src/app.ts", "src/app.ts", "src/screen.tsx"]
+    assert index.search("useAuth", file_glob="*.ts", context=1).splitlines() == [
+        "src/auth-store.ts-1-// store",
+        "src/auth-store.ts:2:export function useAuthStore() {}",
+        "src/auth-store.ts-3-// end",
+    ]
+    assert index.search("nothingLikeThis") == "No matches found."
+
+
+def test_index_follows_edits_and_deletes(tmp_path: Path) -> None:
+    root = _repo(tmp_path)
+    index = SearchIndex(root)
+    assert "screen.tsx" in index.search("const a")
+
+    target = root / "src" / "screen.tsx"
+    target.write_text("const renamed = 2;\n")
+    os.utime(target, ns=(1, 1))
+    (root / "src" / "new.ts").write_text("const a = 3;\n")
+    (root / "src" / "auth-store.ts").unlink()
+
+    assert index.search("const a") == "src/new.ts:1:const a = 3;"
+    assert index.search("useAuthStore") == "No matches found."
+
+
+def test_search_tool_caps_output(tmp_path: Path) -> None:
+    root = _repo(tmp_path)
+    (root / "src" / "many.ts").write_text("hit\n" * 50)
+    search = next(t for t in make_tools(root, []) if t.name == "search_files")
+    output = search.invoke({"pattern": "hit", "path": "src"})
+    assert len(output.splitlines()) == 21
+    assert output.endswith("[30 more matches not shown; narrow the pattern, path or file_glob]")
+    assert search.invoke({"pattern": "hit", "path": "/elsewhere"}).startswith("Error")
@@ -0,0 +1,72 @@
+"""Tests for the symbol index, find_symbol and the implementer's repo map."""
+
+import subprocess
+from pathlib import Path
+
+from agent_runner.search import SearchIndex
+from agent_runner.state import Task
+from agent_runner.symbols import SymbolIndex, extract_symbols
+from agent_runner.tools import make_tools
+
+
+def test_exports_are_classified() -> None:
+    source = """export function LoginScreen() {}
+export const useAuthStore = create(() => ({}));
+export type AuthState = { user: string };
+export interface Props {}
+export enum Role { Admin }
+const local = 1;
+export { local as helper, type Props as LoginProps };
+export default function HomeScreen() {}
+"""
+    symbols = {s.name: (s.kind, s.line) for s in extract_symbols("src/login.tsx", source)}
+    assert symbols == {
+        "LoginScreen": ("component", 1),
+        "useAuthStore": ("hook", 2),
+        "AuthState": ("type", 3),
+        "Props": ("type", 4),
+        "Role": ("enum", 5),
+        "helper": ("const", 7),
+        "LoginProps": ("component", 7),
+        "HomeScreen": ("component", 8),
+    }
+
+
+def _repo(tmp_path: Path) -> Path:
+    subprocess.run(["git", "init", "-q"], cwd=tmp_path, check=True)
+    files = {
+        "src/stores/auth-store.ts": "export const useAuthStore = 1;\nexport type Session = {};\n",
+        "src/screens/report-screen.tsx": "export function ReportScreen() {}\n",
+        "src/screens/map-screen.tsx": "export function MapScreen() {}\n",
+        "src/lib/format.ts": "export function formatDate() {}\nexport function formatDistance() {}\n",
+        "README.md": "export const notCode = 1;\n",
+    }
+    for rel, text in files.items():
+        (tmp_path / rel).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / rel).write_text(text)
+    return tmp_path
+
+
+def test_repo_map_ranks_files_by_task_relevance(tmp_path: Path) -> None:
+    index = SymbolIndex(SearchIndex(_repo(tmp_path)))
+    task = Task(id="P2-T1", title="Report form", phase="Phase 2",
+                deliverables=["`src/screens/report-form.tsx` — form"])
+
+    lines = index.repo_map(task, "Uses the auth session of the signed-in user.", max_files=3).splitlines()
+    assert lines == [
+        "- src/screens/report-screen.tsx: ReportScreen (component)",
+        "- src/screens/map-screen.tsx: MapScreen (component)",
+        "- src/stores/auth-store.ts: useAuthStore (hook), Session (type)",
+    ]
+
+
+def test_find_symbol_tool_sees_new_files(tmp_path: Path) -> None:
+    root = _repo(tmp_path)
+    find = next(t for t in make_tools(root, []) if t.name == "find_symbol")
+    assert find.invoke({"query": "format", "kind": "function"}).splitlines() == [
+        "function formatDate (src/lib/format.ts:1)",
+        "function formatDistance (src/lib/format.ts:2)",
+    ]
+    (root / "src" / "lib" / "format-number.ts").write_text("export function formatNumber() {}\n")
+    assert "formatNumber (src/lib/format-number.ts:1)" in find.invoke({"query": "formatnumber"})
+    assert find.invoke({"query": "nothing"}) == "No matching symbols."
@@ -0,0 +1,137 @@
+"""Tests for agent tools and tool-call execution."""
+
+import os
+import threading
+from pathlib import Path
+
+from langchain_core.tools import tool
+
+from agent_runner.tools import FILE_CACHE, MMAP_READ_BYTES, FileCache, ToolPrefetch, make_tools, run_tool_calls
+
+
+def test_read_only_calls_run_concurrently_in_order() -> None:
+    barrier = threading.Barrier(3, timeout=5)
+    log: list[str] = []
+
+    @tool
+    def read_file(file_path: str) -> str:
+        """Read."""
+        barrier.wait()  # only passes if all three reads are in flight at once
+        return f"content of {file_path}"
+
+    @tool
+    def write_file(file_path: str, content: str) -> str:
+        """Write."""
+        log.append(file_path)
+        return "ok"
+
+    calls = [
+        {"name": "read_file", "args": {"file_path": "a"}, "id": "1"},
+        {"name": "read_file", "args": {"file_path": "b"}, "id": "2"},
+        {"name": "read_file", "args": {"file_path": "c"}, "id": "3"},
+        {"name": "write_file", "args": {"file_path": "d", "content": ""}, "id": "4"},
+        {"name": "missing_tool", "args": {}, "id": "5"},
+    ]
+    results = run_tool_calls([read_file, write_file], calls)
+
+    assert [r.tool_call_id for r in results] == ["1", "2", "3", "4", "5"]
+    assert results[1].content == "content of b"
+    assert "Unknown tool" in results[4].content
+    assert log == ["d"]
+
+
+def test_reads_after_write_see_the_write(tmp_path: Path) -> None:
+    tools = make_tools(working_dir=tmp_path, allowed_commands=[])
+    calls = [
+        {"name": "write_file", "args": {"file_path": "x.ts", "content": "export {};\n"}, "id": "1"},
+        {"name": "read_file", "args": {"file_path": "x.ts"}, "id": "2"},
+        {"name": "list_directory", "args": {"dir_path": "."}, "id": "3"},
+    ]
+    results = run_tool_calls(tools, calls)
+    assert "export {};" in results[1].content
+    assert "f x.ts" in results[2].content
+
+
+def test_prefetch_stops_at_first_write_and_keeps_order() -> None:
+    ran: list[str] = []
+
+    @tool
+    def read_file(file_path: str) -> str:
+        """Read."""
+        ran.append(file_path)
+        return file_path
+
+    @tool
+    def write_file(file_path: str, content: str) -> str:
+        """Write."""
+        ran.append(f"write {file_path}")
+        return "ok"
+
+    calls = [
+        {"name": "read_file", "args": {"file_path": "a"}, "id": "1"},
+        {"name": "write_file", "args": {"file_path": "b", "content": ""}, "id": "2"},
+        {"name": "read_file", "args": {"file_path": "b"}, "id": "3"},
+    ]
+    prefetch = ToolPrefetch([read_file, write_file])
+    for i, tc in enumerate(calls[:2]):  # announced mid-stream; the last call completes with it
+        prefetch(i, tc)
+    assert prefetch.started == 1
+
+    results = prefetch.run(calls)
+    assert [r.tool_call_id for r in results] == ["1", "2", "3"]
+    assert ran == ["a", "write b", "b"]
+
+
+def test_read_file_returns_numbered_slices(tmp_path: Path) -> None:
+    (tmp_path / "big.json").write_text("".join(f"line {n}\n" for n in range(1, 5001)))
+    (tmp_path / "logo.png").write_bytes(b"\x89PNG\r\n\x1a\n\0\0\0")
+    read_file = next(t for t in make_tools(tmp_path, []) if t.name == "read_file")
+
+    head = read_file.invoke({"file_path": "big.json"}).splitlines()
+    assert head[0] == "     1\tline 1"
+    assert head[-1] == "[lines 1-2000 of 5000; continue with offset=2001]"
+
+    tail = read_file.invoke({"file_path": "big.json", "offset": 4999, "limit": 10}).splitlines()
+    assert tail == ["  4999\tline 4999", "  5000\tline 5000", "[lines 4999-5000 of 5000]"]
+
+    (tmp_path / "big.json").write_text("changed\n")  # the cached line index must not be reused
+    assert read_file.invoke({"file_path": "big.json"}).splitlines() == ["     1\tchanged", "[lines 1-1 of 1]"]
+    assert read_file.invoke({"file_path": "logo.png"}) == "Error: logo.png is a binary file (11 bytes)"
+
+
+def test_large_files_are_mapped_not_cached(tmp_path: Path) -> None:
+    lock = tmp_path / "package-lock.json"
+    lock.write_text("".join(f'    "dep-{n}": "1.0.{n}",\n' for n in range(MMAP_READ_BYTES // 20)))
+    read_file = next(t for t in make_tools(tmp_path, []) if t.name == "read_file")
+
+    assert read_file.invoke({"file_path": "package-lock.json", "offset": 100, "limit": 1}).startswith("   100\t")
+    assert lock.resolve() not in FILE_CACHE._entries
+
+
+def test_file_cache_validates_by_mtime_and_size_and_evicts_lru(tmp_path: Path) -> None:
+    cache = FileCache(max_bytes=10)
+    a, b = tmp_path / "a.ts", tmp_path / "b.ts"
+    a.write_text("aaaa")
+    b.write_text("bbbb")
+
+    assert cache.read_text(a) == "aaaa" and cache.read_text(a) == "aaaa"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    a.write_text("changed")  # a different size, as a formatter run would leave it
+    assert cache.read_text(a) == "changed"
+    cache.write_text(b, "bbbbbb")
+    assert cache.read_text(b) == "bbbbbb" and cache.hits == 2
+    assert cache.stats()["bytes"] <= 10 and cache.evictions == 1  # a went first
+
+    os.utime(b, ns=(1, 1))
+    assert cache.read_text(b) == "bbbbbb" and cache.misses == 3
+
+
+def test_read_file_artifact_carries_the_file_signature(tmp_path: Path) -> None:
+    (tmp_path / "a.ts").write_text("export const a = 1;\n")
+    tools = make_tools(tmp_path, [])
+    [result] = run_tool_calls(tools, [{"name": "read_file", "args": {"file_path": "a.ts"}, "id": "1"}])
+
+    st = (tmp_path / "a.ts").stat()
+    assert result.content.startswith("     1\texport const a = 1;")
+    assert result.artifact == {"path": str((tmp_path / "a.ts").resolve()), "signature": [st.st_mtime_ns, st.st_size]}
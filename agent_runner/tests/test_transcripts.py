@@ -0,0 +1,52 @@
+"""Tests for task-scoped messages and transcript archiving."""
+
+import json
+from pathlib import Path
+from types import SimpleNamespace
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langgraph.graph.message import add_messages
+
+from agent_runner.agents.committer import _finish_task
+from agent_runner.agents.implementer import _initial_messages
+from agent_runner.agents.planner import select_task
+from agent_runner.state import Task
+
+
+def _task() -> Task:
+    return Task(id="P1-T1", title="Scaffold", phase="Phase 1")
+
+
+def test_select_task_resets_messages(tmp_path: Path) -> None:
+    old = [HumanMessage(content="old spec", id="1"), AIMessage(content="old work", id="2")]
+    update = select_task(_task(), SimpleNamespace(project_dir=tmp_path))
+    messages = add_messages(old, update["messages"])
+    assert len(messages) == 1
+    assert "Working on task P1-T1" in messages[0].content
+    assert update["review_feedback"] is None
+
+
+def test_retry_prompt_gets_spec_and_feedback_only() -> None:
+    state = {
+        "current_task": _task(),
+        "messages": [
+            HumanMessage(content="Working on task P1-T1: Scaffold\n\nSpec:\n..."),
+            AIMessage(content="", tool_calls=[{"name": "read_file", "args": {"file_path": "a"}, "id": "c1"}]),
+            ToolMessage(content="x" * 5000, tool_call_id="c1"),
+            AIMessage(content="REJECTED: missing i18n"),
+        ],
+        "review_feedback": "REJECTED: missing i18n",
+    }
+    messages = _initial_messages(state)
+    assert not any(isinstance(m, (AIMessage, ToolMessage)) for m in messages)
+    assert "Spec:" in messages[2].content
+    assert "missing i18n" in messages[-1].content
+
+
+def test_finish_task_archives_and_clears(tmp_path: Path) -> None:
+    state = {"current_task": _task(), "messages": [HumanMessage(content="spec"), AIMessage(content="done")]}
+    update = _finish_task(state, SimpleNamespace(checkpoint_dir=tmp_path))
+
+    assert add_messages(state["messages"], update["messages"]) == []
+    [archived] = (tmp_path / "transcripts").glob("P1-T1-*.json")
+    assert [m["data"]["content"] for m in json.loads(archived.read_text())] == ["spec", "done"]
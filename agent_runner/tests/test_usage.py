@@ -0,0 +1,127 @@
+"""Tests for cost accounting and spend budgets."""
+
+import time
+from pathlib import Path
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.graph import END, START, StateGraph
+
+from agent_runner import models
+from agent_runner.config import BudgetConfig, CircuitBreakerConfig, ModelConfig, Price
+from agent_runner.graph import _metered, save_failed_usage
+from agent_runner.models import CLOSED, ModelRouter
+from agent_runner.state import AgentState, add_task_cost, merge_token_usage
+from agent_runner.tests.test_models import make_config
+from agent_runner.usage import BudgetExceeded, call_cost, metered
+
+OPUS = "anthropic/claude-opus-4-20250514"
+FLASH = ModelConfig("google", "gemini-2.0-flash")
+PRICING = {OPUS: Price(input=15.0, output=75.0, cache_read=1.5), "google/gemini-2.0-flash": Price(input=0.1, output=0.4)}
+
+
+class PricedModel:
+    used: list[str] = []
+
+    def __init__(self, model_config: ModelConfig) -> None:
+        self.model_config = model_config
+
+    def invoke(self, messages: list) -> AIMessage:
+        PricedModel.used.append(self.model_config.provider)
+        return AIMessage(content="ok", usage_metadata={
+            "input_tokens": 100_000, "output_tokens": 1_000, "total_tokens": 101_000,
+        })
+
+
+@pytest.fixture
+def priced(monkeypatch: pytest.MonkeyPatch) -> list[str]:
+    PricedModel.used = []
+    monkeypatch.setattr(models, "create_chat_model", lambda mc, timeout=120: PricedModel(mc))
+    return PricedModel.used
+
+
+def _call(router: ModelRouter) -> dict:
+    router.invoke_with_fallback("implementer", [HumanMessage(content="go")])
+    return {}
+
+
+def test_call_cost_prices_cache_reads_separately() -> None:
+    tokens = {"input": 1_000_000, "output": 100_000, "cache_read": 800_000, "cache_write": 0}
+    assert call_cost(PRICING[OPUS], tokens) == pytest.approx(0.2 * 15 + 0.8 * 1.5 + 0.1 * 75)
+    assert call_cost(None, tokens) == 0.0
+
+
+def test_node_usage_is_written_to_state(priced: list[str], tmp_path: Path) -> None:
+    router = ModelRouter(make_config(tmp_path, pricing=PRICING))
+    node = _metered(lambda state: {"error": None, **_call(router)}, use_async=False)
+
+    update = node({"token_usage": {OPUS: {"input": 5, "cost": 1.0}}, "task_cost": 0.5})
+    assert update["token_usage"][OPUS]["input"] == 100_000
+    assert update["task_cost"] == pytest.approx(1.575)
+
+    usage = merge_token_usage({OPUS: {"input": 5, "cost": 1.0}}, update["token_usage"])
+    assert usage[OPUS]["input"] == 100_005
+    assert usage[OPUS]["cost"] == pytest.approx(2.575)
+    assert add_task_cost(0.5, update["task_cost"]) == pytest.approx(2.075)
+    assert add_task_cost(2.075, None) == 0.0
+
+
+def test_budgets_downgrade_then_stop(priced: list[str], tmp_path: Path) -> None:
+    budgets = BudgetConfig(task_usd=1.0, run_usd=10.0, downgrade_model=FLASH)
+    router = ModelRouter(make_config(tmp_path, pricing=PRICING, budgets=budgets))
+
+    with metered({"token_usage": {}, "task_cost": 0.5}):
+        _call(router)  # $1.575 on opus: the task budget is now spent
+        _call(router)
+    assert priced == ["anthropic", "google"]
+
+    with metered({"token_usage": {OPUS: {"cost": 10.0}}, "task_cost": 0.0}):
+        with pytest.raises(BudgetExceeded, match="run budget"):
+            _call(router)
+    assert len(priced) == 2
+
+
+def test_usage_of_a_failed_node_is_checkpointed(priced: list[str], tmp_path: Path) -> None:
+    router = ModelRouter(make_config(tmp_path, pricing=PRICING))
+
+    def spend_then_fail(state: AgentState) -> dict:
+        _call(router)
+        raise BudgetExceeded("run budget spent")
+
+    graph = StateGraph(AgentState)
+    graph.add_node("planner", lambda state: {"error": None})
+    graph.add_node("implementer", _metered(spend_then_fail, use_async=False))
+    graph.add_edge(START, "planner")
+    graph.add_edge("planner", "implementer")
+    graph.add_edge("implementer", END)
+    compiled = graph.compile(checkpointer=MemorySaver())
+    thread = {"configurable": {"thread_id": "t"}}
+
+    with pytest.raises(BudgetExceeded) as raised:
+        compiled.invoke({"token_usage": {OPUS: {"input": 5, "cost": 1.0}}, "task_cost": 0.5}, thread)
+    save_failed_usage(compiled, thread, raised.value)
+
+    snapshot = compiled.get_state(thread)
+    assert snapshot.values["token_usage"][OPUS]["input"] == 100_005
+    assert snapshot.values["task_cost"] == pytest.approx(2.075)
+    assert snapshot.next == ("implementer",)  # a resume re-runs the failed node
+
+
+def test_background_probes_are_billed(priced: list[str], tmp_path: Path) -> None:
+    breaker = CircuitBreakerConfig(cooldown_seconds=0)  # half-open as soon as it opens
+    router = ModelRouter(make_config(tmp_path, pricing=PRICING, circuit_breaker=breaker))
+    for _ in range(3):
+        router.health.record_failure(OPUS, "503 Service Unavailable")
+    first = _metered(lambda state: _call(router), use_async=False)({"token_usage": {}, "task_cost": 0.0})
+    deadline = time.monotonic() + 2
+    while router.health.state(OPUS) != CLOSED and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert sorted(priced) == ["anthropic", "google"]  # the probe, and the call it was skipped for
+
+    # Whether the probe finished within the node or after it, one of the two updates counts it
+    second = _metered(lambda state: {}, use_async=False)({"token_usage": {}, "task_cost": 0.0})
+    usage = merge_token_usage(first.get("token_usage"), second.get("token_usage"))
+    assert usage[OPUS]["input"] == 100_000
+    assert usage[OPUS]["cost"] == pytest.approx(1.575)
+    assert router.token_usage[OPUS]["input"] == 100_000
@@ -2,31 +2,181 @@
 
 from __future__ import annotations
 
+import asyncio
+import logging
+import mmap
 import os
-import subprocess
+import re
+import threading
+from array import array
+from collections import OrderedDict
+from collections.abc import Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Any
 
-from langchain_core.tools import tool
+from langchain_core.messages import ToolMessage
+from langchain_core.tools import StructuredTool, tool
 
+from agent_runner.commands import command_runner
+from agent_runner.config import CommandsConfig, DiagnosticsConfig
+from agent_runner.diagnostics import diagnostics_daemon
+from agent_runner.search import search_index
+from agent_runner.symbols import symbol_index
 
-def make_tools(working_dir: Path, allowed_commands: list[str]) -> list:
-    """Create tool instances bound to a working directory."""
+logger = logging.getLogger("agent_runner")
 
-    @tool
-    def read_file(file_path: str) -> str:
-        """Read the contents of a file. Use absolute paths or paths relative to the project root."""
+MAX_READ_LINES = 2000
+MAX_READ_CHARS = 50000
+MAX_LINE_CHARS = 2000
+BINARY_SNIFF_BYTES = 8192
+LINE_INDEX_ENTRIES = 64
+FILE_CACHE_BYTES = 64 * 1024 * 1024
+FILE_CACHE_MAX_ENTRY_BYTES = 4 * 1024 * 1024  # larger files are read and edited uncached
+MMAP_READ_BYTES = 256 * 1024  # read_file maps files above this instead of loading them whole
+
+# Tools without side effects; consecutive calls to these run concurrently
+READ_ONLY_TOOLS = frozenset({"read_file", "list_directory", "search_files", "find_symbol", "check_diagnostics"})
+MAX_PARALLEL_READS = 8
+
+_LINE_INDEX: OrderedDict[Path, tuple[int, int, array]] = OrderedDict()
+_LINE_INDEX_LOCK = threading.Lock()
+
+_READ_POOL: ThreadPoolExecutor | None = None
+_READ_POOL_LOCK = threading.Lock()
+
+FileSignature = tuple[int, int]  # (mtime_ns, size)
+
+
+class FileCache:
+    """Process-wide cache of file contents, validated by (mtime_ns, size).
+
+    A lookup stats the file and reuses the cached bytes while both match,
+    so changes made outside the tools (a formatter run through run_command,
+    a git checkout) are picked up on the next read. Writes made through
+    the cache store what they wrote. Entries are evicted least recently
+    used first once their total size passes max_bytes.
+    """
+
+    def __init__(self, max_bytes: int = FILE_CACHE_BYTES, max_entry_bytes: int = FILE_CACHE_MAX_ENTRY_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[Path, tuple[FileSignature, bytes]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def read(self, path: Path) -> tuple[bytes, FileSignature]:
+        """A file's bytes and the signature they were read at."""
+        key = Path(path).resolve()
+        st = key.stat()
+        signature = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None and cached[0] == signature:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cached[1], signature
+            self.misses += 1
+        data = key.read_bytes()
+        st = key.stat()  # the file may have changed while it was read
+        signature = (st.st_mtime_ns, st.st_size)
+        if len(data) == st.st_size:
+            self._store(key, signature, data)
+        return data, signature
+
+    def read_text(self, path: Path) -> str:
+        return self.read(path)[0].decode("utf-8")
+
+    def write_text(self, path: Path, text: str) -> FileSignature:
+        """Write a file and keep what was written, so the next read is a hit."""
+        key = Path(path).resolve()
+        data = text.encode("utf-8")
+        key.write_bytes(data)
+        st = key.stat()
+        signature = (st.st_mtime_ns, st.st_size)
+        self._store(key, signature, data)
+        return signature
+
+    def signature(self, path: Path) -> FileSignature | None:
+        """The file's current (mtime_ns, size), or None once it is gone."""
+        try:
+            st = Path(path).stat()
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def log_stats(self) -> None:
+        stats = self.stats()
+        if stats["hits"] or stats["misses"]:
+            logger.info(
+                "File cache: %d hits, %d misses, %d evictions (%d files, %.1f MB held)",
+                stats["hits"], stats["misses"], stats["evictions"], stats["entries"], stats["bytes"] / 1e6,
+            )
+
+    def _store(self, key: Path, signature: FileSignature, data: bytes) -> None:
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[1])
+            if len(data) > self.max_entry_bytes:
+                return
+            self._entries[key] = (signature, data)
+            self._bytes += len(data)
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+
+
+FILE_CACHE = FileCache()
+
+
+def make_tools(
+    working_dir: Path,
+    allowed_commands: list[str],
+    commands: CommandsConfig | None = None,
+    diagnostics: DiagnosticsConfig | None = None,
+) -> list:
+    """Create tool instances bound to a working directory.
+
+    With diagnostics enabled, the working tree's tsc --watch starts on the
+    first check_diagnostics call, so building the graph (e.g. for `status`)
+    spawns nothing.
+    """
+    runner = command_runner(working_dir, commands or CommandsConfig())
+
+    @tool(response_format="content_and_artifact")
+    def read_file(file_path: str, offset: int = 1, limit: int = MAX_READ_LINES) -> tuple[str, dict | None]:
+        """Read a file as numbered lines. Use absolute paths or paths relative to the project root.
+
+        offset is the first line to read (1-based) and limit the number of lines;
+        the footer gives the total line count, so large files can be read in slices.
+        """
         p = _resolve_path(file_path, working_dir)
         if not p.exists():
-            return f"Error: File not found: {p}"
+            return f"Error: File not found: {_display_path(p, working_dir)}", None
         if not p.is_file():
-            return f"Error: Not a file: {p}"
+            return f"Error: Not a file: {_display_path(p, working_dir)}", None
         try:
-            content = p.read_text(encoding="utf-8")
-            if len(content) > 50000:
-                return content[:50000] + f"\n\n... [truncated, {len(content)} total chars]"
-            return content
+            content, signature = read_lines(p, offset, limit, display=_display_path(p, working_dir))
         except Exception as e:
-            return f"Error reading file: {e}"
+            return f"Error reading file: {e}", None
+        # Not shown to the model: lets compaction spot outputs of files changed since
+        return content, {"path": str(p.resolve()), "signature": list(signature)}
 
     @tool
     def write_file(file_path: str, content: str) -> str:
@@ -34,8 +184,8 @@ def make_tools(working_dir: Path, allowed_commands: list[str]) -> list:
         p = _resolve_path(file_path, working_dir)
         try:
             p.parent.mkdir(parents=True, exist_ok=True)
-            p.write_text(content, encoding="utf-8")
-            return f"Successfully wrote {len(content)} chars to {p}"
+            FILE_CACHE.write_text(p, content)
+            return f"Successfully wrote {len(content)} chars to {_display_path(p, working_dir)}"
         except Exception as e:
             return f"Error writing file: {e}"
 
@@ -44,17 +194,17 @@ def make_tools(working_dir: Path, allowed_commands: list[str]) -> list:
         """Replace an exact string in a file. The old_string must appear exactly once."""
         p = _resolve_path(file_path, working_dir)
         if not p.exists():
-            return f"Error: File not found: {p}"
+            return f"Error: File not found: {_display_path(p, working_dir)}"
         try:
-            content = p.read_text(encoding="utf-8")
+            content = FILE_CACHE.read_text(p)
             count = content.count(old_string)
             if count == 0:
-                return f"Error: old_string not found in {p}"
+                return f"Error: old_string not found in {_display_path(p, working_dir)}"
             if count > 1:
-                return f"Error: old_string found {count} times in {p}. Must be unique."
+                return f"Error: old_string found {count} times in {_display_path(p, working_dir)}. Must be unique."
             new_content = content.replace(old_string, new_string, 1)
-            p.write_text(new_content, encoding="utf-8")
-            return f"Successfully edited {p}"
+            FILE_CACHE.write_text(p, new_content)
+            return f"Successfully edited {_display_path(p, working_dir)}"
         except Exception as e:
             return f"Error editing file: {e}"
 
@@ -63,9 +213,9 @@ def make_tools(working_dir: Path, allowed_commands: list[str]) -> list:
         """List files and directories at a path."""
         p = _resolve_path(dir_path, working_dir)
         if not p.exists():
-            return f"Error: Directory not found: {p}"
+            return f"Error: Directory not found: {_display_path(p, working_dir)}"
         if not p.is_dir():
-            return f"Error: Not a directory: {p}"
+            return f"Error: Not a directory: {_display_path(p, working_dir)}"
         try:
             entries = sorted(p.iterdir())
             result = []
@@ -78,27 +228,38 @@ def make_tools(working_dir: Path, allowed_commands: list[str]) -> list:
         except Exception as e:
             return f"Error listing directory: {e}"
 
-    @tool
-    def search_files(pattern: str, path: str = ".", file_glob: str = "") -> str:
-        """Search for a regex pattern in files using grep. Returns matching lines with file paths."""
-        p = _resolve_path(path, working_dir)
-        cmd = ["grep", "-rn", "--include", file_glob or "*", "-E", pattern, str(p)]
+    index = search_index(working_dir)
+
+    def search_files(pattern: str, path: str = ".", file_glob: str = "", context: int = 0) -> str:
+        """Search for a regex pattern in the project's files (.gitignore'd files are skipped).
+
+        Returns `file:line:text` matches, best first and capped, with `context` lines around each.
+        """
+        scope = _display_path(_resolve_path(path, working_dir), working_dir)
+        if Path(scope).is_absolute():
+            return f"Error: {path} is outside the project"
         try:
-            result = subprocess.run(
-                cmd, capture_output=True, text=True, timeout=30, cwd=str(working_dir),
-            )
-            output = result.stdout
-            if len(output) > 20000:
-                output = output[:20000] + "\n... [truncated]"
-            return output or "No matches found."
-        except subprocess.TimeoutExpired:
-            return "Error: Search timed out after 30s"
+            return index.search(pattern, path=scope, file_glob=file_glob, context=context)
         except Exception as e:
             return f"Error searching: {e}"
 
+    async def asearch_files(pattern: str, path: str = ".", file_glob: str = "", context: int = 0) -> str:
+        return await asyncio.to_thread(search_files, pattern, path, file_glob, context)
+
     @tool
-    def run_command(command: str) -> str:
-        """Run a shell command. Only allowed commands can be used (git, npm, npx, tsc, eslint, prettier, node, python)."""
+    def find_symbol(query: str = "", kind: str = "") -> str:
+        """Find exported components, hooks, functions and types by name (case-insensitive substring).
+
+        kind narrows the results: component, hook, function, const, class, type or enum.
+        Returns one `kind Name (file:line)` per line.
+        """
+        try:
+            found = symbol_index(working_dir).find(query, kind)
+        except Exception as e:
+            return f"Error finding symbols: {e}"
+        return "\n".join(s.describe() for s in found) or "No matching symbols."
+
+    def _check_allowed(command: str) -> str | None:
         cmd_parts = command.strip().split()
         if not cmd_parts:
             return "Error: Empty command"
@@ -106,30 +267,307 @@ def make_tools(working_dir: Path, allowed_commands: list[str]) -> list:
         base_cmd = cmd_parts[0]
         if base_cmd not in allowed_commands:
             return f"Error: Command '{base_cmd}' not in allowed list: {allowed_commands}"
+        return None
+
+    def run_command(command: str) -> str:
+        """Run a shell command. Only allowed commands can be used (git, npm, npx, tsc, eslint, prettier, node, python).
 
+        Long output keeps its beginning and end; the middle is cut.
+        """
+        error = _check_allowed(command)
+        if error:
+            return error
         try:
-            result = subprocess.run(
-                command, shell=True, capture_output=True, text=True,
-                timeout=120, cwd=str(working_dir),
-                env={**os.environ, "PATH": os.environ.get("PATH", "")},
-            )
-            output = ""
-            if result.stdout:
-                output += result.stdout
-            if result.stderr:
-                output += f"\nSTDERR:\n{result.stderr}"
-            if result.returncode != 0:
-                output += f"\nExit code: {result.returncode}"
-
-            if len(output) > 30000:
-                output = output[:30000] + "\n... [truncated]"
-            return output or "(no output)"
-        except subprocess.TimeoutExpired:
-            return "Error: Command timed out after 120s"
+            return runner.run(command).format()
+        except Exception as e:
+            return f"Error running command: {e}"
+
+    async def arun_command(command: str) -> str:
+        error = _check_allowed(command)
+        if error:
+            return error
+        try:
+            return (await runner.arun(command)).format()
         except Exception as e:
             return f"Error running command: {e}"
 
-    return [read_file, write_file, edit_file, list_directory, search_files, run_command]
+    tools = [
+        read_file,
+        write_file,
+        edit_file,
+        list_directory,
+        StructuredTool.from_function(func=search_files, coroutine=asearch_files),
+        find_symbol,
+        StructuredTool.from_function(func=run_command, coroutine=arun_command),
+    ]
+    if diagnostics is None or not diagnostics.enabled:
+        return tools
+
+    daemon = diagnostics_daemon(working_dir, diagnostics)
+
+    def check_diagnostics(files: list[str] | None = None) -> str:
+        """Type errors and lint problems in the given files (default: every file changed since HEAD).
+
+        Answers from a tsc --watch and ESLint kept running in the background, so
+        after the first build it takes about a second: use it after each edit
+        instead of running npx tsc or npx eslint.
+        """
+        try:
+            return daemon.check(files)
+        except Exception as e:
+            return f"Error checking diagnostics: {e}"
+
+    async def acheck_diagnostics(files: list[str] | None = None) -> str:
+        return await asyncio.to_thread(check_diagnostics, files)
+
+    tools.append(StructuredTool.from_function(func=check_diagnostics, coroutine=acheck_diagnostics))
+    return tools
+
+
+def _line_starts(path: Path, buf: bytes | mmap.mmap, signature: FileSignature) -> array:
+    """Byte offset of every line start, cached per file until its mtime or size changes."""
+    with _LINE_INDEX_LOCK:
+        cached = _LINE_INDEX.get(path)
+        if cached is not None and cached[:2] == signature:
+            _LINE_INDEX.move_to_end(path)
+            return cached[2]
+    starts = array("Q", [0])
+    starts.extend(m.end() for m in re.finditer(rb"\n", buf))
+    if starts[-1] == len(buf):
+        starts.pop()  # a trailing newline doesn't start another line
+    with _LINE_INDEX_LOCK:
+        _LINE_INDEX[path] = (*signature, starts)
+        _LINE_INDEX.move_to_end(path)
+        while len(_LINE_INDEX) > LINE_INDEX_ENTRIES:
+            _LINE_INDEX.popitem(last=False)
+    return starts
+
+
+@contextmanager
+def _file_buffer(path: Path) -> Iterator[tuple[bytes | mmap.mmap, FileSignature]]:
+    """A file's contents: from the file cache, or memory-mapped when large.
+
+    Large files are mapped even when they would fit in the cache, so a
+    slice of package-lock.json pages in that slice rather than the file.
+    """
+    size = path.stat().st_size
+    if size <= MMAP_READ_BYTES:
+        yield FILE_CACHE.read(path)
+        return
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        st = os.fstat(f.fileno())
+        yield mm, (st.st_mtime_ns, len(mm))
+
+
+def read_lines(
+    path: Path, offset: int = 1, limit: int = MAX_READ_LINES, *, display: str | None = None,
+) -> tuple[str, FileSignature]:
+    """Lines offset..offset+limit-1 of a file, numbered like `cat -n`, with a footer.
+
+    Also returns the (mtime_ns, size) the lines were read at. Small files
+    come from the file cache, large ones are memory-mapped so only the
+    requested slice is decoded; binary files are refused after looking at
+    their first 8 KB.
+    """
+    display = display or str(path)
+    if path.stat().st_size == 0:
+        return f"[{display} is empty]", FILE_CACHE.signature(path) or (0, 0)
+    offset, limit = max(offset, 1), max(min(limit, MAX_READ_LINES), 1)
+    with _file_buffer(path) as (buf, signature):
+        size = len(buf)
+        if b"\0" in buf[:BINARY_SNIFF_BYTES]:
+            return f"Error: {display} is a binary file ({size} bytes)", signature
+        starts = _line_starts(path.resolve(), buf, signature)
+        total = len(starts)
+        if offset > total:
+            return f"Error: offset {offset} is past the end of {display} ({total} lines)", signature
+        out: list[str] = []
+        chars = 0
+        last = min(offset + limit - 1, total)
+        for n in range(offset, last + 1):
+            end = starts[n] if n < total else size
+            line = buf[starts[n - 1]:end].decode("utf-8", errors="replace").rstrip("\r\n")
+            if len(line) > MAX_LINE_CHARS:
+                line = line[:MAX_LINE_CHARS] + f"... [{len(line)} chars]"
+            if out and chars + len(line) > MAX_READ_CHARS:
+                last = n - 1
+                break
+            out.append(f"{n:6}\t{line}")
+            chars += len(line)
+    footer = f"[lines {offset}-{last} of {total}"
+    footer += f"; continue with offset={last + 1}]" if last < total else "]"
+    return "\n".join(out) + "\n" + footer, signature
+
+
+async def arun_subprocess(
+    cmd: str | list[str], *, cwd: Path, timeout: float, shell: bool = False,
+) -> tuple[str, str, int]:
+    """Run a subprocess without blocking the event loop. Kills it on timeout."""
+    if shell:
+        proc = await asyncio.create_subprocess_shell(
+            cmd, cwd=str(cwd),
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+            env={**os.environ, "PATH": os.environ.get("PATH", "")},
+        )
+    else:
+        proc = await asyncio.create_subprocess_exec(
+            *cmd, cwd=str(cwd),
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+        )
+    try:
+        stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        raise
+    return (
+        stdout.decode("utf-8", errors="replace"),
+        stderr.decode("utf-8", errors="replace"),
+        proc.returncode,
+    )
+
+
+def is_tool_error(message: ToolMessage) -> bool:
+    """Tools report failures as a result starting with "Error"."""
+    return isinstance(message.content, str) and message.content.startswith("Error")
+
+
+def _find_tool(tools: list, name: str):
+    """Find a tool by name."""
+    for t in tools:
+        if t.name == name:
+            return t
+    return None
+
+
+def _tool_message(tool_result: Any, tool_call: dict[str, Any]) -> ToolMessage:
+    """Invoked with the whole tool call, a tool returns a ToolMessage carrying its artifact, if any."""
+    if isinstance(tool_result, ToolMessage):
+        return ToolMessage(content=str(tool_result.content), tool_call_id=tool_call["id"], artifact=tool_result.artifact)
+    return ToolMessage(content=str(tool_result), tool_call_id=tool_call["id"])
+
+
+def _invoke_tool(tools: list, tool_call: dict[str, Any]) -> ToolMessage:
+    tool_fn = _find_tool(tools, tool_call["name"])
+    if tool_fn is None:
+        tool_result = f"Error: Unknown tool '{tool_call['name']}'"
+    else:
+        try:
+            tool_result = tool_fn.invoke({**tool_call, "type": "tool_call"})
+        except Exception as e:
+            tool_result = f"Error executing {tool_call['name']}: {e}"
+    return _tool_message(tool_result, tool_call)
+
+
+async def _ainvoke_tool(tools: list, tool_call: dict[str, Any]) -> ToolMessage:
+    tool_fn = _find_tool(tools, tool_call["name"])
+    if tool_fn is None:
+        tool_result = f"Error: Unknown tool '{tool_call['name']}'"
+    else:
+        try:
+            tool_result = await tool_fn.ainvoke({**tool_call, "type": "tool_call"})
+        except Exception as e:
+            tool_result = f"Error executing {tool_call['name']}: {e}"
+    return _tool_message(tool_result, tool_call)
+
+
+def _batches(tool_calls: list[dict[str, Any]]) -> list[list[dict[str, Any]]]:
+    """Split calls into runs of consecutive read-only calls and single mutating calls.
+
+    Runs may execute concurrently; a mutating call is a barrier, so reads
+    issued after a write in the same turn still see the write.
+    """
+    batches: list[list[dict[str, Any]]] = []
+    for tool_call in tool_calls:
+        read_only = tool_call["name"] in READ_ONLY_TOOLS
+        if read_only and batches and batches[-1][0]["name"] in READ_ONLY_TOOLS:
+            batches[-1].append(tool_call)
+        else:
+            batches.append([tool_call])
+    return batches
+
+
+def _read_pool() -> ThreadPoolExecutor:
+    global _READ_POOL
+    with _READ_POOL_LOCK:
+        if _READ_POOL is None:
+            _READ_POOL = ThreadPoolExecutor(max_workers=MAX_PARALLEL_READS, thread_name_prefix="tool-read")
+        return _READ_POOL
+
+
+def run_tool_calls(tools: list, tool_calls: list[dict[str, Any]]) -> list[ToolMessage]:
+    """Execute the tool calls from one LLM response.
+
+    Read-only calls run concurrently; results keep the original call order.
+    """
+    results: list[ToolMessage] = []
+    for batch in _batches(tool_calls):
+        if len(batch) == 1:
+            results.append(_invoke_tool(tools, batch[0]))
+        else:
+            results.extend(_read_pool().map(lambda tc: _invoke_tool(tools, tc), batch))
+    return results
+
+
+async def arun_tool_calls(tools: list, tool_calls: list[dict[str, Any]]) -> list[ToolMessage]:
+    """Async variant of run_tool_calls."""
+    results: list[ToolMessage] = []
+    for batch in _batches(tool_calls):
+        results.extend(await asyncio.gather(*(_ainvoke_tool(tools, tc) for tc in batch)))
+    return results
+
+
+class ToolPrefetch:
+    """Starts read-only tool calls announced while a response is still streaming.
+
+    Pass an instance as the router's on_tool_call. Only calls ahead of the
+    first mutating call are started, so nothing is reordered around a
+    write. Results are matched to the final response by tool call id, so
+    calls announced by an attempt that later failed over are ignored.
+    """
+
+    def __init__(self, tools: list) -> None:
+        self.tools = tools
+        self.started = 0
+        self._pending: dict[str, Any] = {}
+        self._blocked = False
+
+    def __call__(self, index: int, tool_call: dict[str, Any]) -> None:
+        if index == 0:
+            self._blocked = False  # a new response, e.g. from a fallback provider
+        if self._blocked or tool_call["name"] not in READ_ONLY_TOOLS:
+            self._blocked = True
+            return
+        self._pending[tool_call["id"]] = self._start(tool_call)
+        self.started += 1
+
+    def _start(self, tool_call: dict[str, Any]) -> Future:
+        return _read_pool().submit(_invoke_tool, self.tools, tool_call)
+
+    def _split(self, tool_calls: list[dict[str, Any]]) -> tuple[list[Any], list[dict[str, Any]]]:
+        """Started results for the leading calls, and the calls still to run."""
+        n = 0
+        while n < len(tool_calls) and tool_calls[n]["id"] in self._pending:
+            n += 1
+        started = [self._pending.pop(tc["id"]) for tc in tool_calls[:n]]
+        self._pending.clear()
+        return started, tool_calls[n:]
+
+    def run(self, tool_calls: list[dict[str, Any]]) -> list[ToolMessage]:
+        """All results for a response, like run_tool_calls, reusing started calls."""
+        started, rest = self._split(tool_calls)
+        return [future.result() for future in started] + run_tool_calls(self.tools, rest)
+
+
+class AsyncToolPrefetch(ToolPrefetch):
+    """ToolPrefetch for the async path: started calls are event-loop tasks."""
+
+    def _start(self, tool_call: dict[str, Any]) -> asyncio.Task:
+        return asyncio.ensure_future(_ainvoke_tool(self.tools, tool_call))
+
+    async def arun(self, tool_calls: list[dict[str, Any]]) -> list[ToolMessage]:
+        started, rest = self._split(tool_calls)
+        return [await task for task in started] + await arun_tool_calls(self.tools, rest)
 
 
 def _resolve_path(path_str: str, working_dir: Path) -> Path:
@@ -138,3 +576,15 @@ def _resolve_path(path_str: str, working_dir: Path) -> Path:
     if p.is_absolute():
         return p
     return working_dir / p
+
+
+def _display_path(path: Path, working_dir: Path) -> str:
+    """Path as shown to the model: relative to the working directory when inside it.
+
+    Keeps tool output identical across checkouts and worktrees, so prompts
+    (and their response-cache keys) don't depend on where the repo lives.
+    """
+    try:
+        return str(path.relative_to(working_dir))
+    except ValueError:
+        return str(path)
@@ -0,0 +1,36 @@
+"""Per-task transcript archive, keeping finished transcripts out of checkpointed state."""
+
+from __future__ import annotations
+
+import json
+import logging
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+from langchain_core.messages import BaseMessage, RemoveMessage, messages_to_dict
+from langgraph.graph.message import REMOVE_ALL_MESSAGES
+
+logger = logging.getLogger("agent_runner")
+
+
+def transcript_dir(config: Any) -> Path:
+    return Path(config.checkpoint_dir) / "transcripts"
+
+
+def archive_transcript(config: Any, task_id: str, messages: list[BaseMessage]) -> Path | None:
+    """Write a task's transcript to <checkpoint_dir>/transcripts/<task>-<time>.json."""
+    if not messages:
+        return None
+    directory = transcript_dir(config)
+    directory.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S_%f")
+    path = directory / f"{task_id}-{stamp}.json"
+    path.write_text(json.dumps(messages_to_dict(messages), default=str), encoding="utf-8")
+    logger.debug("Archived %d messages for %s to %s", len(messages), task_id, path)
+    return path
+
+
+def clear_messages() -> list[RemoveMessage]:
+    """A `messages` update that empties the channel (see langgraph add_messages)."""
+    return [RemoveMessage(id=REMOVE_ALL_MESSAGES)]
@@ -0,0 +1,148 @@
+"""Per-node token and cost accounting, and spend budgets."""
+
+from __future__ import annotations
+
+import logging
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any
+
+from agent_runner.config import BudgetConfig, Price
+
+logger = logging.getLogger("agent_runner")
+
+DOWNGRADE = "downgrade"
+TOKEN_KEYS = ("input", "output", "cache_read", "cache_write")
+
+
+class BudgetExceeded(RuntimeError):
+    """Raised before an LLM call when a budget with on_*_exceeded: stop is spent."""
+
+
+def call_cost(price: Price | None, tokens: dict[str, int]) -> float:
+    """USD cost of one call; input_tokens already includes cache reads and writes."""
+    if price is None:
+        return 0.0
+    cache_read = tokens.get("cache_read", 0)
+    cache_write = tokens.get("cache_write", 0)
+    uncached = max(tokens.get("input", 0) - cache_read - cache_write, 0)
+    read_price = price.input if price.cache_read is None else price.cache_read
+    write_price = price.input if price.cache_write is None else price.cache_write
+    return (
+        uncached * price.input
+        + cache_read * read_price
+        + cache_write * write_price
+        + tokens.get("output", 0) * price.output
+    ) / 1_000_000
+
+
+def total_cost(token_usage: dict[str, dict[str, Any]] | None) -> float:
+    return sum(usage.get("cost", 0.0) for usage in (token_usage or {}).values())
+
+
+def add_usage(totals: dict[str, dict[str, Any]], provider_key: str, counts: dict[str, Any]) -> None:
+    provider = totals.setdefault(provider_key, {key: 0 for key in TOKEN_KEYS} | {"cost": 0.0})
+    for key, value in counts.items():
+        provider[key] = provider.get(key, 0) + value
+
+
+def usage_since(after: dict[str, dict[str, Any]], before: dict[str, dict[str, Any]]) -> dict[str, dict[str, Any]]:
+    """What was added to a token_usage mapping between two snapshots."""
+    delta: dict[str, dict[str, Any]] = {}
+    for provider_key, counts in after.items():
+        previous = before.get(provider_key, {})
+        changed = {key: value - previous.get(key, 0) for key, value in counts.items()}
+        if any(changed.values()):
+            delta[provider_key] = changed
+    return delta
+
+
+class UsageMeter:
+    """Usage of one node execution, plus what the run and task had spent before it."""
+
+    def __init__(self, *, run_spent: float = 0.0, task_spent: float = 0.0) -> None:
+        self.run_spent = run_spent
+        self.task_spent = task_spent
+        self.usage: dict[str, dict[str, Any]] = {}
+        self._lock = threading.Lock()  # hedged calls and probes record from other threads
+        self._closed = False
+
+    @property
+    def cost(self) -> float:
+        return total_cost(self.usage)
+
+    def add(self, provider_key: str, counts: dict[str, Any]) -> None:
+        """Count a call; once the node's update is written, it goes to the next metered node."""
+        with self._lock:
+            if not self._closed:
+                add_usage(self.usage, provider_key, counts)
+                return
+        with _late_lock:
+            add_usage(_late_usage, provider_key, counts)
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+
+    def state_update(self, result: dict | None) -> dict:
+        """Merge this node's usage into its state update, and close the meter.
+
+        task_cost is left alone when the node set it itself: the planner
+        resets it when it selects a new task.
+        """
+        self.close()
+        update = dict(result or {})
+        if self.usage:
+            update["token_usage"] = self.usage
+        if "task_cost" not in update and self.cost:
+            update["task_cost"] = self.cost
+        return update
+
+
+_meter: ContextVar[UsageMeter | None] = ContextVar("agent_runner_usage_meter", default=None)
+# Calls that finished after their node (an abandoned hedge, a background probe)
+_late_usage: dict[str, dict[str, Any]] = {}
+_late_lock = threading.Lock()
+
+
+def current_meter() -> UsageMeter | None:
+    return _meter.get()
+
+
+@contextmanager
+def metered(state: dict) -> Iterator[UsageMeter]:
+    """Collect the LLM usage of everything called inside the block."""
+    meter = UsageMeter(
+        run_spent=total_cost(state.get("token_usage")),
+        task_spent=state.get("task_cost") or 0.0,
+    )
+    with _late_lock:
+        late = dict(_late_usage)
+        _late_usage.clear()
+    for provider_key, counts in late.items():
+        meter.add(provider_key, counts)
+    token = _meter.set(meter)
+    try:
+        yield meter
+    except BaseException as e:
+        if meter.usage:
+            # The node's update is lost with it; the runner checkpoints this instead (save_failed_usage)
+            e.usage_update = meter.state_update(None)
+        raise
+    finally:
+        meter.close()
+        _meter.reset(token)
+
+
+def budget_action(budgets: BudgetConfig, meter: UsageMeter | None) -> tuple[str, str] | None:
+    """(action, reason) for the first exceeded budget; the run budget wins over the task budget."""
+    if meter is None:
+        return None
+    spent = meter.cost
+    if budgets.run_usd is not None and meter.run_spent + spent >= budgets.run_usd:
+        return budgets.on_run_exceeded, f"run budget ${budgets.run_usd:.2f} spent (${meter.run_spent + spent:.2f})"
+    if budgets.task_usd is not None and meter.task_spent + spent >= budgets.task_usd:
+        return budgets.on_task_exceeded, f"task budget ${budgets.task_usd:.2f} spent (${meter.task_spent + spent:.2f})"
+    return None